@@ -81,6 +81,7 @@ class GccFlagsTuner(opentuner.measurement.MeasurementInterface):
             self.cc_bugs = (['-ftoplevel-reorder', '-fno-unit-at-a-time'],)
 
         self.result_list = {}
+        self.source_hash = self.file_hash(args.source)
         self.parallel_compile = True
         try:
             os.stat('./tmp')
@@ -257,13 +258,26 @@ class GccFlagsTuner(opentuner.measurement.MeasurementInterface):
         tmp_dir = self.get_tmpdir(result_id)
         shutil.rmtree(tmp_dir)
 
+    def artifact_paths(self, result_id):
+        return ['%s/%s' % (self.get_tmpdir(result_id), args.output)]
+
+    def artifact_key(self, config_data):
+        # configurations with the same flags (after working around gcc bugs)
+        # compile to the same binary
+        return (args.cc, args.compile_template, self.source_hash,
+                self.cfg_to_flags(config_data))
+
     def compile_and_run(self, desired_result, input, limit):
         cfg = desired_result.configuration.data
-        compile_result = self.compile(cfg, 0)
+        compile_result = self.cached_compile(cfg, 0)
         return self.run_precompiled(desired_result, input, limit, compile_result, 0)
 
     compile_results = {'ok': 0, 'timeout': 1, 'error': 2}
 
+    def compile_failed(self, compile_result):
+        # a timeout may not recur on a less loaded machine
+        return compile_result == self.compile_results['error']
+
     def run_precompiled(self, desired_result, input, limit, compile_result,
                         result_id):
         if self.args.force_killall:
@@ -325,6 +339,8 @@ class GccFlagsTuner(opentuner.measurement.MeasurementInterface):
         except OSError:
             os.mkdir(tmp_dir)
         output_dir = '%s/%s' % (tmp_dir, args.output)
+        if os.path.exists(output_dir):
+            os.unlink(output_dir)  # left by an earlier compile
         cmd = args.compile_template.format(source=args.source, output=output_dir,
                                            flags=' '.join(flags),
                                            cc=args.cc)
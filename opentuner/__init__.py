@@ -5,13 +5,19 @@ from opentuner.resultsdb.models import Configuration
 from opentuner.resultsdb.models import DesiredResult
 from opentuner.resultsdb.models import Result
 from opentuner.resultsdb.models import TuningRun
+from opentuner.search.manipulator import Condition
 from opentuner.search.manipulator import ConfigurationManipulator
+from opentuner.search.manipulator import DivisibilityConstraint
 from opentuner.search.manipulator import EnumParameter
 from opentuner.search.manipulator import FloatParameter
+from opentuner.search.manipulator import ForbiddenCombination
+from opentuner.search.manipulator import FunctionConstraint
 from opentuner.search.manipulator import IntegerParameter
+from opentuner.search.manipulator import LinearConstraint
 from opentuner.search.manipulator import LogFloatParameter
 from opentuner.search.manipulator import LogIntegerParameter
 from opentuner.search.manipulator import PermutationParameter
+from opentuner.search.manipulator import Requires
 from opentuner.search.manipulator import ScheduleParameter
 from opentuner.search.manipulator import SwitchParameter
 from opentuner.tuningrunmain import init_logging
@@ -26,10 +32,14 @@ def argparsers():
     return a list of ArguementParser to be used as parents to the user's
     """
     return [
+        measurement.artifacts.argparser,
         measurement.driver.argparser,
+        measurement.fidelity.argparser,
         measurement.interface.argparser,
+        measurement.repeat.argparser,
         search.driver.argparser,
         search.plugin.argparser,
+        search.prescreen.argparser,
         search.technique.argparser,
         # stats.argparser,
         tuningrunmain.argparser,
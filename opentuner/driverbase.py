@@ -1,6 +1,77 @@
+import math
+from collections import defaultdict, deque
+
 from opentuner.resultsdb.models import *
 
 
+class ResultIndex(object):
+    """
+    in-process index of the Results of a single TuningRun
+
+    kept up to date by MeasurementDriver.report_result() so that drivers and
+    objectives can look up results by configuration without a flush() and a SQL
+    query, the database is only written to as a durable log
+    """
+
+    def __init__(self, objective, recent_size=100):
+        self.objective = objective
+        self.results = []
+        self.best = None
+        self.config_results = defaultdict(list)  # Configuration.hash -> [Result]
+        self.config_best = dict()  # Configuration.hash -> Result
+        self.new_results = deque()  # not yet seen by SearchDriver
+        # objective.limit_basis() of recent good results, for time limits
+        self.recent_limits = deque(maxlen=recent_size)
+
+    def add(self, result):
+        """record a newly collected result"""
+        key = result.configuration.hash
+        self.results.append(result)
+        self.config_results[key].append(result)
+        self.new_results.append(result)
+        best = self.config_best.get(key)
+        if best is None or self.objective.lt(result, best):
+            self.config_best[key] = result
+        if self.best is None or self.objective.lt(result, self.best):
+            self.best = result
+        if result.state in (None, 'OK') and self.objective.is_acceptable(result):
+            basis = self.objective.limit_basis(result)
+            if basis is not None and not math.isinf(basis):
+                self.recent_limits.append(basis)
+
+    def pop_new_results(self):
+        """return (in collection order) and forget results added since last call"""
+        rv = list(self.new_results)
+        self.new_results.clear()
+        return rv
+
+    def recent_limit_percentile(self, percentile, min_count=10):
+        """
+        the percentile (0 to 100) of recent_limits, or None until min_count
+        good results have been seen
+        """
+        if not self.recent_limits or len(self.recent_limits) < min(
+                min_count, self.recent_limits.maxlen):
+            return None
+        values = sorted(self.recent_limits)
+        index = int(round(percentile / 100.0 * (len(values) - 1)))
+        return values[min(max(index, 0), len(values) - 1)]
+
+    def results_for(self, config):
+        """all results for a resultsdb.models.Configuration"""
+        return self.config_results.get(config.hash, [])
+
+    def best_for(self, config):
+        """objective-best result for a resultsdb.models.Configuration, or None"""
+        return self.config_best.get(config.hash)
+
+    def has_results(self, config):
+        return config.hash in self.config_results
+
+    def count(self):
+        return len(self.results)
+
+
 class DriverBase(object):
     """
     shared base class between MeasurementDriver and SearchDriver
@@ -12,6 +83,7 @@ class DriverBase(object):
                  objective,
                  tuning_run_main,
                  args,
+                 result_index=None,
                  **kwargs):
         self.args = args
         self.objective = objective
@@ -19,6 +91,17 @@ class DriverBase(object):
         self.tuning_run_main = tuning_run_main
         self.tuning_run = tuning_run
         self.program = tuning_run.program
+        if result_index is None:
+            result_index = ResultIndex(objective)
+        self.result_index = result_index
+
+    def results_for(self, config):
+        """Results for config in this tuning run, served from self.result_index"""
+        return self.result_index.results_for(config)
+
+    def best_result_for(self, config):
+        """best Result for config in this tuning run, or None"""
+        return self.result_index.best_for(config)
 
     def results_query(self,
                       generation=None,
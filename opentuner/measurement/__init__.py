@@ -1,6 +1,9 @@
 from __future__ import absolute_import
 
+from . import artifacts
 from . import driver
+from . import fidelity
 from . import interface
+from . import repeat
 from .driver import MeasurementDriver
 from .interface import MeasurementInterface
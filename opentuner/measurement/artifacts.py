@@ -0,0 +1,230 @@
+"""
+content-addressed cache of compiled programs (see --artifact-cache)
+
+a MeasurementInterface that lists the files its compile() writes (see
+MeasurementInterface.artifact_paths()) has them stored under --artifact-cache
+after each compile, by the sha256 of their contents, and indexed by a key
+describing what was compiled (MeasurementInterface.artifact_key(), by default
+the configuration).  MeasurementInterface.cached_compile() restores the files
+of a known key rather than compiling.  A compile the interface reports as a
+deterministic failure (see MeasurementInterface.compile_failed()) is
+remembered too, so it is not repeated; other compiles that did not write all
+the files are not cached.  Configurations whose
+compiled files are identical share the artifact, and with --parallel-compile
+the measurement: a second test of the same artifact on the same input reuses
+the Result of the first.
+
+the least recently used artifacts are evicted once the cache directory grows
+past --artifact-cache-size, counting the artifacts of every process using it.
+Files are written under temporary names and renamed, so several processes may
+share a cache directory.
+"""
+from __future__ import division
+
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+
+from opentuner.resultsdb.models import Result
+
+log = logging.getLogger(__name__)
+
+argparser = argparse.ArgumentParser(add_help=False)
+argparser.add_argument('--artifact-cache', metavar='DIR',
+                       help="cache compiled programs in DIR, keyed by "
+                            "configuration, and skip compiling cached ones "
+                            "(needs MeasurementInterface.artifact_paths())")
+argparser.add_argument('--artifact-cache-size', type=float, default=1024,
+                       metavar='MB',
+                       help="evict the least recently used compiled programs "
+                            "beyond this size")
+
+
+class ArtifactCache(object):
+    """
+    compiled files by content hash (objects/DIGEST/N) and an index from
+    artifact keys to (digest, compile result) (keys/SHA256-OF-KEY), digest
+    None for failed compiles.  The modification time of an
+    object directory is its last use
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 2 ** 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        for sub in ('objects', 'keys'):
+            path = os.path.join(directory, sub)
+            if not os.path.isdir(path):
+                os.makedirs(path)
+        # (digest, Input or tuple of Inputs) -> Result measured for an artifact
+        self.measurements = dict()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0  # artifacts identical to one compiled from another key
+        self.shared_measurements = 0
+
+    @classmethod
+    def from_args(cls, args):
+        """an ArtifactCache for args, or None if it is disabled"""
+        if not getattr(args, 'artifact_cache', None):
+            return None
+        return cls(args.artifact_cache,
+                   int(args.artifact_cache_size * 2 ** 20))
+
+    def count(self, counter):
+        """add one to counter (e.g. 'hits'), from any thread"""
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest)
+
+    def key_path(self, key):
+        name = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, 'keys', name)
+
+    @staticmethod
+    def digest(paths):
+        """sha256 of the contents of paths, in order"""
+        m = hashlib.sha256()
+        for path in paths:
+            m.update(b'%d|' % os.path.getsize(path))
+            with open(path, 'rb') as fd:
+                for block in iter(lambda: fd.read(2 ** 20), b''):
+                    m.update(block)
+        return m.hexdigest()
+
+    def scan(self):
+        """dict from the digest of each stored artifact to (last use, bytes)"""
+        artifacts = dict()
+        objects = os.path.join(self.directory, 'objects')
+        for digest in os.listdir(objects):
+            if digest.startswith('.'):
+                continue  # unfinished store()
+            path = self.object_path(digest)
+            try:
+                artifacts[digest] = (os.path.getmtime(path), sum(
+                    os.path.getsize(os.path.join(path, name))
+                    for name in os.listdir(path)))
+            except OSError:
+                pass  # evicted by another process
+        return artifacts
+
+    def lookup(self, key):
+        """
+        (digest, compile result) cached for key, digest None if the compile
+        failed, or None if key is not cached
+        """
+        try:
+            with open(self.key_path(key), 'rb') as fd:
+                digest, compile_result = pickle.load(fd)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if digest is not None and not self.touch(digest):
+            return None  # evicted
+        return digest, compile_result
+
+    def touch(self, digest):
+        """mark artifact digest used now, False if it is gone"""
+        try:
+            os.utime(self.object_path(digest), None)
+        except OSError:
+            return False
+        return True
+
+    def restore(self, digest, paths):
+        """copy the files of artifact digest to paths, False if it is gone"""
+        source = self.object_path(digest)
+        try:
+            for i, path in enumerate(paths):
+                directory = os.path.dirname(path)
+                if directory and not os.path.isdir(directory):
+                    os.makedirs(directory)
+                shutil.copy2(os.path.join(source, str(i)), path)
+        except (IOError, OSError):
+            return False
+        return self.touch(digest)
+
+    def store(self, key, paths, compile_result, failed=False):
+        """
+        add the files at paths, compiled for key with compile_result, and
+        return their digest.  If failed (the compile failed in a way that
+        would recur) only compile_result is stored, and if some of the files
+        do not exist nothing is.  Both return None
+        """
+        if failed:
+            digest = None
+        else:
+            try:
+                digest = self.digest(paths)
+            except (IOError, OSError):
+                return None
+            if self.touch(digest):
+                self.count('shared')
+            else:
+                staging = tempfile.mkdtemp(prefix='.', dir=os.path.join(
+                    self.directory, 'objects'))
+                for i, path in enumerate(paths):
+                    shutil.copy2(path, os.path.join(staging, str(i)))
+                try:
+                    os.rename(staging, self.object_path(digest))
+                except OSError:
+                    shutil.rmtree(staging)  # stored by another thread or process
+        fd, staging = tempfile.mkstemp(prefix='.', dir=os.path.join(
+            self.directory, 'keys'))
+        with os.fdopen(fd, 'wb') as out:
+            pickle.dump((digest, compile_result), out)
+        os.rename(staging, self.key_path(key))
+        if digest is not None:
+            self.evict(keep=digest)
+        return digest
+
+    def evict(self, keep=None):
+        """
+        remove least recently used artifacts, other than keep, while the
+        cache directory holds more than max_bytes
+        """
+        artifacts = self.scan()
+        total = sum(size for _, size in artifacts.values())
+        for digest in sorted(artifacts, key=lambda d: artifacts[d][0]):
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            log.debug('evicting artifact %s', digest)
+            total -= artifacts[digest][1]
+            shutil.rmtree(self.object_path(digest), ignore_errors=True)
+
+    def shared_result(self, digest, input_key):
+        """
+        a copy of the Result measured for artifact digest on an input, or
+        None if it has not been measured
+        """
+        with self.lock:
+            result = self.measurements.get((digest, input_key))
+        if result is None:
+            return None
+        self.count('shared_measurements')
+        shared = Result(time=result.time, accuracy=result.accuracy,
+                        energy=result.energy, size=result.size,
+                        confidence=result.confidence, state=result.state,
+                        extra=dict(result.extra or {}))
+        shared.set_attribute('artifact_shared', True)
+        return shared
+
+    def add_result(self, digest, input_key, result):
+        """remember the Result of a measurement of artifact digest"""
+        if result.state not in (None, 'OK'):
+            return  # could depend on the time limit
+        with self.lock:
+            self.measurements.setdefault((digest, input_key), result)
+
+    def report(self):
+        return ('artifact cache: %d hits, %d misses, %d identical artifacts, '
+                '%d shared measurements' % (self.hits, self.misses, self.shared,
+                                            self.shared_measurements))
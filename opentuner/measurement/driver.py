@@ -3,25 +3,58 @@ from __future__ import print_function
 
 import argparse
 import logging
+import math
 import os
 import socket
 import time
 from builtins import zip
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from multiprocessing.pool import ThreadPool
+from queue import Queue, Empty
 
 from past.utils import old_div
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.orm.exc import NoResultFound
 
 from opentuner.driverbase import DriverBase
+from opentuner.measurement.fidelity import SuccessiveHalving
+from opentuner.measurement.repeat import RepeatedMeasurement
 from opentuner.resultsdb.models import *
 
 log = logging.getLogger(__name__)
 
+# seconds between warnings while workers make no progress
+REMOTE_WARNING_INTERVAL = 60.0
+
 argparser = argparse.ArgumentParser(add_help=False)
 argparser.add_argument('--machine-class',
                        help="name of the machine class being run on")
+argparser.add_argument('--parallel-run', type=int, default=1, metavar='N',
+                       help="run up to N tests of a generation at once")
+argparser.add_argument('--remote-measurement', action='store_true',
+                       help="leave all tests to opentuner-worker processes "
+                            "attached to this tuning run")
+argparser.add_argument('--poll-interval', type=float, default=0.5,
+                       help="seconds between database polls when measuring "
+                            "with opentuner-worker processes")
+argparser.add_argument('--remote-lease', type=float, default=3600.0,
+                       metavar='SECONDS',
+                       help="with --remote-measurement, requeue tests claimed "
+                            "by a worker this long ago that have not "
+                            "finished (the worker is assumed dead), should "
+                            "be longer than any test")
+argparser.add_argument('--limit-percentile', type=float, metavar='P',
+                       help="also stop tests that run past the P-th "
+                            "percentile (0-100) of recent good results")
+argparser.add_argument('--limit-window', type=int, default=100, metavar='N',
+                       help="how many recent good results --limit-percentile "
+                            "considers")
+argparser.add_argument('--pin-cpus', action='store_true',
+                       help="pin each concurrently running test (see "
+                            "--parallel-run and --async-measurement) to its "
+                            "own set of cpus")
 
 
 class MeasurementDriver(DriverBase):
@@ -46,6 +79,22 @@ class MeasurementDriver(DriverBase):
 
         self.laptime = time.time()
         self.machine = self.get_machine()
+        self.repeats = RepeatedMeasurement.from_args(self.objective, self.args)
+        self.fidelity = SuccessiveHalving.from_args(self.objective, self.args)
+
+        # used by process_async()
+        self.async_pool = None
+        self.async_completed = Queue()
+        self.in_flight = dict()  # DesiredResult.id -> DesiredResult
+        if self.args.async_measurement:
+            concurrency = self.args.parallelism
+        else:
+            concurrency = self.args.parallel_run
+        self.cpu_slots = CpuSlots(max(1, concurrency), self.args.pin_cpus)
+
+        # used by process_remote()
+        self.remote_waiting = []  # DesiredResults left to opentuner-worker
+        self.last_remote_result_id = 0
 
     def get_machine(self):
         """
@@ -72,20 +121,52 @@ class MeasurementDriver(DriverBase):
         return MachineClass.get(self.session, name=self.args.machine_class)
 
     def run_time_limit(self, desired_result, default=3600.0 * 24 * 365 * 10):
-        """return a time limit to apply to a test run (in seconds)"""
-        best = self.results_query(objective_ordered=True).first()
-        if best is None:
+        """
+        return a time limit to apply to a test run (in seconds), based on the
+        best result so far and, with --limit-percentile, on the distribution
+        of recent good results
+        """
+        basis = self.limit_basis()
+        if basis is None:
             if desired_result.limit:
                 return desired_result.limit
             else:
                 return default
 
         if desired_result.limit:
-            return min(desired_result.limit, self.upper_limit_multiplier * best.time)
-        else:
-            return self.default_limit_multiplier * best.time
-
-    def report_result(self, desired_result, result, input=None):
+            return min(desired_result.limit, self.upper_limit_multiplier * basis)
+        limit = self.default_limit_multiplier * basis
+        if self.args.limit_percentile is not None:
+            cutoff = self.result_index.recent_limit_percentile(
+                self.args.limit_percentile)
+            if cutoff is not None:
+                limit = min(limit, max(cutoff, basis))
+        return limit
+
+    def limit_basis(self):
+        """
+        the run time of the best result so far that limits are derived from,
+        None if there is none or the objective does not want slow tests cut
+        short (see SearchObjective.limit_basis)
+        """
+        best = self.result_index.best
+        if best is None or best.state not in (None, 'OK'):
+            return None
+        basis = self.objective.limit_basis(best)
+        if basis is None or math.isinf(basis) or math.isnan(basis):
+            return None
+        return basis
+
+    def report_result(self, desired_result, result, input=None,
+                      collection_cost=None):
+        if self.fidelity is not None:
+            stages = self.fidelity.pop_stages(desired_result)
+            if stages is not None:
+                input, lower = stages
+                self.store_lower_fidelity(desired_result, lower)
+        if (result.state in (None, 'OK') and result.time is not None and
+                math.isinf(result.time)):
+            result.state = 'TIMEOUT'  # killed at desired_result.limit
         result.configuration = desired_result.configuration
         result.input = input
         result.machine = self.machine
@@ -95,16 +176,31 @@ class MeasurementDriver(DriverBase):
         desired_result.result = result
         desired_result.state = 'COMPLETE'
         self.input_manager.after_run(desired_result, input)
-        result.collection_cost = self.lap_timer()
-        self.session.flush()  # populate result.id
+        if collection_cost is None:
+            collection_cost = self.lap_timer()
+        result.collection_cost = collection_cost
+        self.result_index.add(result)
         log.debug(
-            'Result(id=%d, cfg=%d, time=%.4f, accuracy=%.2f, collection_cost=%.2f)',
-            result.id,
-            result.configuration.id,
+            'Result(desired_result=%s, cfg=%s, time=%.4f, accuracy=%.2f, '
+            'collection_cost=%.2f)',
+            desired_result.id,
+            result.configuration.hash,
             result.time,
             result.accuracy if result.accuracy is not None else float('NaN'),
             result.collection_cost)
-        self.commit()
+        self.commit(results=1)
+
+    def store_lower_fidelity(self, desired_result, lower):
+        """
+        add the [(Input, Result)] measured on smaller inputs by
+        --successive-halving, outside of the tuning run
+        """
+        for input, result in lower:
+            result.configuration = desired_result.configuration
+            result.input = input
+            result.machine = self.machine
+            result.collection_date = datetime.now()
+            self.session.add(result)
 
     def run_desired_result(self, desired_result, compile_result=None,
                            exec_id=None):
@@ -115,26 +211,82 @@ class MeasurementDriver(DriverBase):
         Optional exec_id paramater can be passed to run_precompiled in case of
         locating a specific executable
         """
+        input = self.prepare_desired_result(desired_result)
+        result = self.measure(desired_result, input, compile_result, exec_id)
+        self.report_result(desired_result, result, input)
+
+    def prepare_desired_result(self, desired_result):
+        """set the time limit and select the input to run desired_result on"""
         desired_result.limit = self.run_time_limit(desired_result)
 
         input = self.input_manager.select_input(desired_result)
         self.session.add(input)
-        self.session.flush()
+        for fidelity_input in self.fidelity_inputs() or ():
+            self.session.add(fidelity_input)
 
-        log.debug('running desired result %s on input %s', desired_result.id,
-                  input.id)
+        # input.id is not set until the next commit, desired_result.id is
+        log.debug('running desired result %s (cfg=%s, limit=%.4g) on input %s',
+                  desired_result.id, desired_result.configuration.hash,
+                  desired_result.limit, input.path)
 
         self.input_manager.before_run(desired_result, input)
+        return input
 
+    def fidelity_inputs(self):
+        """the inputs to measure on in turn with --successive-halving, or None"""
+        if self.fidelity is None:
+            return None
+        return self.input_manager.fidelity_inputs()
+
+    def measure(self, desired_result, input, compile_result=None, exec_id=None):
+        """
+        produce a Result() for desired_result using the measurement interface,
+        repeated per --max-repeats and on inputs of increasing size per
+        --successive-halving.  Does not touch the database so it may be called
+        from worker threads
+        """
+        inputs = self.fidelity_inputs()
+        cache = self.interface.artifact_cache
+        digest = self.interface.artifact_digests.pop(exec_id, None)
+        if cache is not None and digest is not None:
+            # configurations compiled to identical files measure the same
+            input_key = tuple(inputs) if inputs else input
+            result = cache.shared_result(digest, input_key)
+            if result is not None:
+                return result
+        if inputs:
+            result = self.fidelity.measure(
+                desired_result, inputs,
+                lambda input: self.measure_on(desired_result, input,
+                                              compile_result, exec_id))
+        else:
+            result = self.measure_on(desired_result, input, compile_result,
+                                     exec_id)
+        if cache is not None and digest is not None:
+            cache.add_result(digest, input_key, result)
+        return result
+
+    def measure_on(self, desired_result, input, compile_result=None,
+                   exec_id=None):
+        """measure desired_result on input, repeated per --max-repeats"""
+        if self.repeats is None:
+            return self.measure_once(desired_result, input, compile_result,
+                                     exec_id)
+        return self.repeats.measure(
+            lambda: self.measure_once(desired_result, input, compile_result,
+                                      exec_id),
+            self.result_index.best)
+
+    def measure_once(self, desired_result, input, compile_result=None,
+                     exec_id=None):
+        """run desired_result once with the measurement interface"""
         if self.interface.parallel_compile:
-            result = self.interface.run_precompiled(desired_result, input,
-                                                    desired_result.limit,
-                                                    compile_result, exec_id)
+            return self.interface.run_precompiled(desired_result, input,
+                                                  desired_result.limit,
+                                                  compile_result, exec_id)
         else:
-            result = self.interface.compile_and_run(desired_result, input,
-                                                    desired_result.limit)
-
-        self.report_result(desired_result, result, input)
+            return self.interface.compile_and_run(desired_result, input,
+                                                  desired_result.limit)
 
     def lap_timer(self):
         """return the time elapsed since the last call to lap_timer"""
@@ -147,20 +299,36 @@ class MeasurementDriver(DriverBase):
         """
         claim a desired result by changing its state to running
         return True if the result was claimed for this process
+
+        when other processes share the tuning run's requests the state
+        change is a conditional UPDATE, committed at once, so concurrent
+        claimers of the same row cannot both succeed.  Otherwise it is only
+        written with the next batch of changes.
         """
-        self.commit()
+        start_date = datetime.now()
+        if not self.tuning_run_main.shared_requests:
+            if desired_result.state != 'REQUESTED':
+                return False
+            desired_result.state = 'RUNNING'
+            desired_result.start_date = start_date
+            return True
+        self.commit(force=True)
         try:
-            self.session.refresh(desired_result)
-            if desired_result.state == 'REQUESTED':
-                desired_result.state = 'RUNNING'
-                desired_result.start_date = datetime.now()
-                self.commit()
+            claimed = (self.session.query(DesiredResult)
+                       .filter_by(id=desired_result.id, state='REQUESTED')
+                       .update({'state': 'RUNNING', 'start_date': start_date},
+                               synchronize_session=False))
+            if claimed == 1:
+                set_committed_value(desired_result, 'state', 'RUNNING')
+                set_committed_value(desired_result, 'start_date', start_date)
+                self.commit(force=True)
                 return True
         except SQLAlchemyError:
             self.session.rollback()
         return False
 
     def query_pending_desired_results(self):
+        self.session.flush()  # write claims and results batched in memory
         q = (self.session.query(DesiredResult)
              .filter_by(tuning_run=self.tuning_run,
                         state='REQUESTED')
@@ -181,7 +349,7 @@ class MeasurementDriver(DriverBase):
 
             def compile_result(args):
                 interface, data, result_id = args
-                return interface.compile(data, result_id)
+                return interface.cached_compile(data, result_id)
 
             for dr in q.all():
                 if self.claim_desired_result(dr):
@@ -202,20 +370,249 @@ class MeasurementDriver(DriverBase):
                 self.interface.kill_all()
                 raise
             # print 'Running %d results' % len(thread_args)
-            for dr, compile_result in zip(desired_results, compile_results):
-                # Make sure compile was successful
-                self.run_desired_result(dr, compile_result, dr.id)
-                try:
-                    self.interface.cleanup(dr.id)
-                except RuntimeError as e:
-                    print(e)
-                    # print 'Done!'
+            if self.args.parallel_run > 1:
+                self.run_desired_results_parallel(
+                    list(zip(desired_results, compile_results)))
+            else:
+                for dr, compile_result in zip(desired_results, compile_results):
+                    # Make sure compile was successful
+                    self.run_desired_result(dr, compile_result, dr.id)
+                    try:
+                        self.interface.cleanup(dr.id)
+                    except RuntimeError as e:
+                        print(e)
+                        # print 'Done!'
             thread_pool.close()
+        elif self.args.parallel_run > 1:
+            self.run_desired_results_parallel(
+                [(dr, None) for dr in q.all() if self.claim_desired_result(dr)])
         else:
             for dr in q.all():
                 if self.claim_desired_result(dr):
                     self.run_desired_result(dr)
 
+    def run_desired_results_parallel(self, pending):
+        """
+        run a list of claimed (desired_result, compile_result) pairs with up to
+        --parallel-run of them executing at once
+        """
+        if not pending:
+            return
+        jobs = [(dr, self.prepare_desired_result(dr), compile_result)
+                for dr, compile_result in pending]
+
+        def run_job(job):
+            dr, input, compile_result = job
+            with self.cpu_slots.pinned():
+                t0 = time.time()
+                result = self.measure(dr, input, compile_result, dr.id)
+                return result, time.time() - t0
+
+        thread_pool = ThreadPool(min(self.args.parallel_run, len(jobs)))
+        try:
+            outcomes = thread_pool.map_async(run_job, jobs).get(9999999)
+        except Exception:
+            self.interface.kill_all()
+            raise
+        finally:
+            thread_pool.close()
+        for (dr, input, compile_result), (result, cost) in zip(jobs, outcomes):
+            self.report_result(dr, result, input, collection_cost=cost)
+            if self.interface.parallel_compile:
+                try:
+                    self.interface.cleanup(dr.id)
+                except RuntimeError as e:
+                    print(e)
+
+    def tests_in_flight(self):
+        """number of tests handed to workers that have not been reported yet"""
+        return len(self.in_flight) + len(self.remote_waiting)
+
+    def process_remote(self):
+        """
+        leave pending desired_results to opentuner-worker processes attached
+        to this tuning run and add the results they report to the result index,
+        waits until every outstanding test is done (or, with
+        --async-measurement, until any new result arrives)
+        """
+        self.commit(force=True)  # workers only see committed requests
+        self.remote_waiting = (self.requests_query()
+                               .filter(DesiredResult.state.in_(['REQUESTED',
+                                                                'RUNNING']))
+                               .all())
+        last_progress = last_warning = time.time()
+        while self.remote_waiting:
+            time.sleep(self.args.poll_interval)
+            self.requeue_stale_claims()
+            self.commit(force=True)  # start a new transaction to see new rows
+            new_results = self.collect_remote_results()
+            waiting = [
+                dr for dr in (self.requests_query()
+                              .filter(DesiredResult.id.in_(
+                                  [dr.id for dr in self.remote_waiting]))
+                              .populate_existing())
+                if dr.state in ('REQUESTED', 'RUNNING')]
+            now = time.time()
+            if new_results or len(waiting) < len(self.remote_waiting):
+                last_progress = now
+            elif now - max(last_progress, last_warning) > REMOTE_WARNING_INTERVAL:
+                last_warning = now
+                log.warning('no progress for %.0f seconds, %d tests requested '
+                            'and %d claimed by workers, are any workers '
+                            'attached to tuning run %s?', now - last_progress,
+                            sum(dr.state == 'REQUESTED' for dr in waiting),
+                            sum(dr.state == 'RUNNING' for dr in waiting),
+                            self.tuning_run.uuid)
+            self.remote_waiting = waiting
+            if new_results and self.args.async_measurement:
+                break
+
+    def requeue_stale_claims(self):
+        """
+        return tests claimed by workers more than --remote-lease seconds ago
+        (by a worker that died, presumably) to the REQUESTED state, so another
+        worker picks them up
+        """
+        cutoff = datetime.now() - timedelta(seconds=self.args.remote_lease)
+        requeued = (self.session.query(DesiredResult)
+                    .filter_by(tuning_run_id=self.tuning_run.id,
+                               state='RUNNING')
+                    .filter(DesiredResult.start_date < cutoff)
+                    .update({'state': 'REQUESTED', 'start_date': None},
+                            synchronize_session=False))
+        if requeued:
+            log.warning('requeued %d tests claimed more than %.0f seconds ago',
+                        requeued, self.args.remote_lease)
+        return requeued
+
+    def collect_remote_results(self):
+        """add results written by other processes to the result index"""
+        q = (self.session.query(Result)
+             .filter_by(tuning_run=self.tuning_run)
+             .filter(Result.id > self.last_remote_result_id)
+             .order_by(Result.id))
+        count = 0
+        for result in q:
+            self.result_index.add(result)
+            self.last_remote_result_id = result.id
+            count += 1
+        return count
+
+    def process_async(self):
+        """
+        hand all pending desired_results to a pool of --parallelism worker
+        threads, then report the results of tests that have completed, blocking
+        until at least one completes if any are outstanding
+
+        workers only call into the MeasurementInterface, all database access
+        stays on the calling thread
+        """
+        if self.async_pool is None:
+            self.async_pool = ThreadPool(self.args.parallelism)
+        for dr in self.query_pending_desired_results().all():
+            if self.claim_desired_result(dr):
+                self.start_desired_result(dr)
+
+        if not self.in_flight:
+            return
+        completed = [self.async_completed.get()]
+        while True:
+            try:
+                completed.append(self.async_completed.get_nowait())
+            except Empty:
+                break
+        errors = []
+        for dr, input, result, cost, error in completed:
+            del self.in_flight[dr.id]
+            if error is not None:
+                errors.append(error)
+            else:
+                self.report_result(dr, result, input, collection_cost=cost)
+        if errors:
+            # the other completed tests are reported first
+            self.interface.kill_all()
+            raise errors[0]
+
+    def close(self):
+        """
+        stop the --async-measurement worker pool, killing the programs of
+        tests still in flight (after an error elsewhere) and waiting for the
+        worker threads to return
+        """
+        if self.async_pool is None:
+            return
+        if self.in_flight:
+            self.interface.kill_all()
+        self.async_pool.close()
+        self.async_pool.join()
+        self.async_pool = None
+        self.in_flight.clear()
+
+    def start_desired_result(self, desired_result):
+        """select an input and queue desired_result on the worker pool"""
+        input = self.prepare_desired_result(desired_result)
+        # load the configuration here so workers never touch the session
+        desired_result.configuration.data
+        self.in_flight[desired_result.id] = desired_result
+        self.async_pool.apply_async(self.async_worker, (desired_result, input))
+
+    def async_worker(self, desired_result, input):
+        """runs on a worker thread, compile and run a single desired_result"""
+        t0 = time.time()
+        result = None
+        error = None
+        try:
+            with self.cpu_slots.pinned():
+                compile_result = None
+                if self.interface.parallel_compile:
+                    compile_result = self.interface.cached_compile(
+                        desired_result.configuration.data, desired_result.id)
+                result = self.measure(desired_result, input, compile_result,
+                                      desired_result.id)
+                if self.interface.parallel_compile:
+                    self.interface.cleanup(desired_result.id)
+        except Exception as e:
+            error = e
+        self.async_completed.put((desired_result, input, result,
+                                  time.time() - t0, error))
+
+
+class CpuSlots(object):
+    """
+    hands out disjoint sets of cpus to concurrently running tests, while a set
+    is held the calling thread (and any process it starts) is pinned to it
+    """
+
+    def __init__(self, count, enabled=True):
+        self.enabled = enabled and hasattr(os, 'sched_setaffinity')
+        if enabled and not self.enabled:
+            log.warning('cpu pinning is not supported on this platform')
+        self.free = Queue()
+        if not self.enabled:
+            return
+        self.all_cpus = sorted(os.sched_getaffinity(0))
+        per_slot = len(self.all_cpus) // count
+        for i in range(count):
+            if per_slot:
+                cpus = self.all_cpus[i * per_slot:(i + 1) * per_slot]
+            else:
+                # more slots than cpus, share them round robin
+                cpus = [self.all_cpus[i % len(self.all_cpus)]]
+            self.free.put(set(cpus))
+
+    @contextmanager
+    def pinned(self):
+        if not self.enabled:
+            yield None
+            return
+        cpus = self.free.get()
+        os.sched_setaffinity(0, cpus)
+        try:
+            yield cpus
+        finally:
+            os.sched_setaffinity(0, self.all_cpus)
+            self.free.put(cpus)
+
 
 def _cputype():
     try:
@@ -0,0 +1,116 @@
+"""
+successive halving over input sizes
+
+with --successive-halving and an InputManager that provides inputs of
+several sizes (see InputManager.fidelity_inputs() and SizedInputManager) each
+test is measured on the smallest input first and promoted to the next larger
+one only while it ranks in the top 1/--halving-rate of the tests measured on
+the same input so far (asynchronous successive halving, every test starts at
+the bottom rung and the first --halving-grace tests of a rung are always
+promoted).
+
+The Result of a test that reaches the largest input is reported as usual.  A
+test stopped on a smaller input is reported like one killed at its time
+limit: state TIMEOUT with an infinite time, and the rung it was stopped at in
+extra.  The measurements on smaller inputs are stored as Results against
+their Input, without a tuning run so they are never compared with
+measurements on the largest input.
+"""
+from __future__ import division
+
+import argparse
+import logging
+import math
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from functools import cmp_to_key
+
+from opentuner.resultsdb.models import Result
+
+log = logging.getLogger(__name__)
+
+argparser = argparse.ArgumentParser(add_help=False)
+argparser.add_argument('--successive-halving', action='store_true',
+                       help="measure tests on inputs of increasing size, "
+                            "promoting only the best ones to larger inputs "
+                            "(needs an InputManager with several input sizes)")
+argparser.add_argument('--halving-rate', type=float, default=3.0, metavar='ETA',
+                       help="promote the top 1/ETA of the tests measured on "
+                            "each input size")
+argparser.add_argument('--halving-grace', type=int, default=5, metavar='N',
+                       help="always promote the first N tests measured on "
+                            "each input size")
+
+
+class SuccessiveHalving(object):
+    """
+    decides on which of a list of inputs, smallest first, to measure a test
+    """
+
+    def __init__(self, objective, rate=3.0, grace=5):
+        self.objective = objective
+        self.rate = max(1.0, rate)
+        self.grace = grace
+        self.sort_key = cmp_to_key(objective.compare)
+        self.rungs = defaultdict(list)  # rung -> sorted sort_keys of Results
+        self.lock = threading.Lock()
+        # id(DesiredResult) -> (Input of the reported Result,
+        #                       [(Input, Result)] measured on smaller inputs)
+        self.stages = dict()
+        self.promoted = 0
+        self.stopped = 0
+
+    @classmethod
+    def from_args(cls, objective, args):
+        """a SuccessiveHalving for args, or None if it is disabled"""
+        if not args.successive_halving:
+            return None
+        return cls(objective, rate=args.halving_rate, grace=args.halving_grace)
+
+    def measure(self, desired_result, inputs, measure_on):
+        """
+        call measure_on(input) for each of inputs until the result is not
+        promoted, return the Result to report.  Safe to call from worker
+        threads, it does not touch the database.
+        """
+        lower = []
+        for rung, input in enumerate(inputs):
+            result = measure_on(input)
+            if (rung == len(inputs) - 1 or result.state not in (None, 'OK') or
+                    result.time is None or math.isinf(result.time)):
+                break  # failed runs are reported as they are
+            lower.append((input, result))
+            if not self.promote(rung, result):
+                stopped = Result(time=float('inf'), state='TIMEOUT')
+                stopped.update_attributes({'fidelity_rung': rung,
+                                           'fidelity_time': result.time})
+                result = stopped
+                break
+        with self.lock:
+            self.stages[id(desired_result)] = (input, lower)
+        return result
+
+    def promote(self, rung, result):
+        """True if result ranks well enough among those of rung"""
+        key = self.sort_key(result)
+        with self.lock:
+            keys = self.rungs[rung]
+            rank = bisect_left(keys, key)
+            keys.insert(rank, key)
+            promote = len(keys) <= self.grace or rank < len(keys) / self.rate
+            if promote:
+                self.promoted += 1
+            else:
+                self.stopped += 1
+        log.debug('rung %d: rank %d of %d, %s', rung, rank, len(keys),
+                  'promoted' if promote else 'stopped')
+        return promote
+
+    def pop_stages(self, desired_result):
+        """
+        (Input of the reported Result, [(Input, Result)] measured on smaller
+        inputs) for a desired_result measured by measure(), or None
+        """
+        with self.lock:
+            return self.stages.pop(id(desired_result), None)
@@ -0,0 +1,172 @@
+"""
+persistent measurement harnesses
+
+starting a new process for every test costs milliseconds, which swamps the
+signal when tuning microsecond to millisecond benchmarks.  A harness is a
+long-running child that is started once and then measures configurations sent
+to it over a pipe.  The protocol is one JSON object per line in each
+direction, the parent writes
+
+  {"id": 1, "config": {...}, "limit": 0.5}
+
+and the child answers every request with an object of Result fields, e.g.
+
+  {"time": 0.0012}
+
+python harnesses can use serve() to implement the child side.
+"""
+from __future__ import absolute_import
+
+import json
+import logging
+import os
+import selectors
+import subprocess
+import sys
+import time
+
+from opentuner.measurement.interface import (MAX_SELECT_TIMEOUT, goodkillpg,
+                                             goodwait,
+                                             preexec_setpgid_setrlimit)
+
+log = logging.getLogger(__name__)
+
+
+class PersistentProgram(object):
+    """
+    parent side of a harness, started lazily by the first request() and
+    restarted after it times out or dies
+    """
+
+    def __init__(self, cmd, memory_limit=None, **kwargs):
+        self.cmd = cmd
+        self.memory_limit = memory_limit
+        self.kwargs = kwargs
+        if isinstance(cmd, str):
+            self.kwargs['shell'] = True
+        self.process = None
+        self.buffer = b''
+        self.request_id = 0
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process is not None else None
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.process = subprocess.Popen(
+            self.cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            preexec_fn=preexec_setpgid_setrlimit(self.memory_limit),
+            **self.kwargs)
+        self.buffer = b''
+        log.debug('started harness %s, pid %d', self.cmd, self.process.pid)
+
+    def request(self, config_data, limit=None):
+        """
+        measure config_data, returns a dict of Result fields plus 'timeout'
+        and 'returncode' like MeasurementInterface.call_program()
+        """
+        if not self.alive():
+            self.start()
+        if limit == float('inf'):
+            limit = None
+        self.request_id += 1
+        message = {'id': self.request_id, 'config': config_data, 'limit': limit}
+        t0 = time.time()
+        try:
+            self.process.stdin.write(json.dumps(message).encode() + b'\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            return self.died()
+        line = self.readline(None if limit is None else t0 + limit)
+        t1 = time.time()
+        if line is None:
+            self.kill()
+            return {'time': float('inf'), 'timeout': True, 'returncode': None}
+        if not line:
+            return self.died()
+        rv = json.loads(line.decode())
+        rv.setdefault('time', t1 - t0)
+        rv.setdefault('timeout', False)
+        rv.setdefault('returncode', 0)
+        return rv
+
+    def readline(self, deadline):
+        """
+        the next line from the harness, b'' if it closed its stdout or None
+        if deadline passed first
+        """
+        fd = self.process.stdout.fileno()
+        with selectors.DefaultSelector() as sel:
+            sel.register(fd, selectors.EVENT_READ)
+            while b'\n' not in self.buffer:
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        return None
+                    if not sel.select(min(timeout, MAX_SELECT_TIMEOUT)):
+                        continue
+                elif not sel.select():
+                    continue
+                data = os.read(fd, 65536)
+                if not data:
+                    return b''
+                self.buffer += data
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        return line
+
+    def died(self):
+        returncode = self.process.wait()
+        log.warning('harness %s exited with %s', self.cmd, returncode)
+        self.process = None
+        return {'time': float('inf'), 'timeout': False, 'returncode': returncode}
+
+    def kill(self):
+        """kill the harness, the next request() will start a new one"""
+        if self.alive():
+            goodkillpg(self.process.pid)
+        if self.process is not None:
+            goodwait(self.process)
+            self.process = None
+
+    def close(self):
+        """ask the harness to exit by closing its stdin"""
+        if self.alive():
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                pass
+        self.kill()
+
+
+def serve(run, stdin=None, stdout=None):
+    """
+    child side of a harness, call run(config, limit) for each request
+
+    run() may return a dict of Result fields, a number to be used as the time,
+    or None to report the time taken by run() itself.  While run() is called
+    sys.stdout is redirected to stderr so that stray prints do not break the
+    protocol.
+    """
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout.buffer
+    real_stdout = sys.stdout
+    for line in stdin:
+        message = json.loads(line.decode())
+        sys.stdout = sys.stderr
+        try:
+            t0 = time.time()
+            rv = run(message['config'], message.get('limit'))
+            t1 = time.time()
+        finally:
+            sys.stdout = real_stdout
+        if rv is None:
+            rv = {'time': t1 - t0}
+        elif not isinstance(rv, dict):
+            rv = {'time': float(rv)}
+        stdout.write(json.dumps(rv).encode() + b'\n')
+        stdout.flush()
@@ -34,6 +34,13 @@ class InputManager(with_metaclass(abc.ABCMeta, object)):
     def get_input_class(self):
         return None
 
+    def fidelity_inputs(self):
+        """
+        Inputs of increasing size to measure tests on in turn with
+        --successive-halving, or None if there is only one
+        """
+        return None
+
 
 class FixedInputManager(InputManager):
     """
@@ -68,3 +75,51 @@ class FixedInputManager(InputManager):
         if self.the_input is None:
             self.the_input = self.create_input(desired_result)
         return self.the_input
+
+
+class SizedInputManager(InputManager):
+    """
+    an input manager with one input per size, in InputClass.size.  Tests are
+    measured on the largest size, or on each size in turn with
+    --successive-halving; the MeasurementInterface reads
+    input.input_class.size to pick the workload
+    """
+
+    def __init__(self,
+                 sizes,
+                 input_class_name='sized',
+                 path=None,
+                 extra=None):
+        self.sizes = sorted(sizes)
+        self.input_class_name = input_class_name
+        self.path = path
+        self.extra = extra
+        self.inputs = None
+        super(SizedInputManager, self).__init__()
+
+    def get_input_class(self):
+        return InputClass.get(self.session,
+                              program=self.program,
+                              name=self.input_class_name,
+                              size=self.sizes[-1])
+
+    def create_input(self, size):
+        """create the input database object of the given size"""
+        return Input(input_class=InputClass.get(self.session,
+                                                program=self.program,
+                                                name=self.input_class_name,
+                                                size=size),
+                     path=self.path,
+                     extra=self.extra)
+
+    def fidelity_inputs(self):
+        if self.inputs is None:
+            self.inputs = [self.create_input(size) for size in self.sizes]
+        if len(self.inputs) < 2:
+            return None
+        return self.inputs
+
+    def select_input(self, desired_result):
+        if self.inputs is None:
+            self.fidelity_inputs()
+        return self.inputs[-1]
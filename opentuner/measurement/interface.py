@@ -2,13 +2,16 @@ import abc
 import argparse
 import errno
 import hashlib
+import io
 import logging
 import os
+import selectors
 import signal
 import subprocess
 import threading
 import time
 from builtins import range
+from collections import defaultdict
 from multiprocessing.pool import ThreadPool
 
 from future.utils import with_metaclass
@@ -26,6 +29,7 @@ except ImportError:
 import opentuner
 from opentuner import resultsdb
 from opentuner.resultsdb.models import *
+from opentuner.measurement.artifacts import ArtifactCache
 
 log = logging.getLogger(__name__)
 
@@ -36,6 +40,9 @@ argparser.add_argument('--parallel-compile', action='store_true',
 
 the_io_thread_pool = None
 
+# longest timeout to pass to select(), epoll rejects more than ~24 days
+MAX_SELECT_TIMEOUT = 3600.0 * 24
+
 
 class MeasurementInterface(with_metaclass(abc.ABCMeta, object)):
     """
@@ -60,7 +67,12 @@ class MeasurementInterface(with_metaclass(abc.ABCMeta, object)):
 
         self.pids = []
         self.pid_lock = threading.Lock()
+        self.harnesses = []
+        self.idle_harnesses = defaultdict(list)
+        self.harness_lock = threading.Lock()
         self.parallel_compile = args.parallel_compile
+        self.artifact_cache = ArtifactCache.from_args(args)
+        self.artifact_digests = dict()  # id -> digest of the compiled files
         # If parallel_compile is False then compile_and_run() will be invoked
         # sequentially otherwise the driver first invokes compile() in parallel
         # followed by run_precompiled() sequentially
@@ -91,6 +103,64 @@ class MeasurementInterface(with_metaclass(abc.ABCMeta, object)):
                                'for parallel compilation')
         pass
 
+    def artifact_paths(self, id):
+        """
+        list of the files compile(config_data, id) writes, which
+        cached_compile() stores in (and restores from) --artifact-cache.
+        None (the default) disables the cache
+        """
+        return None
+
+    def artifact_key(self, config_data):
+        """
+        a key identifying the files compiled for config_data, by default the
+        program and configuration.  Override to map configurations that
+        compile to the same program (e.g. ones whose flags are equal after
+        canonicalization) to the same key
+        """
+        return (self.program_name(), self.program_version(),
+                sorted(config_data.items()))
+
+    def compile_failed(self, compile_result):
+        """
+        True if compile_result reports a failure that compiling again would
+        repeat (e.g. a compiler error, not a timeout), which cached_compile()
+        then remembers in --artifact-cache
+        """
+        return False
+
+    def cached_compile(self, config_data, id):
+        """
+        compile(config_data, id), restoring the compiled files from
+        --artifact-cache instead if they were compiled before.  A compile
+        that failed (see compile_failed()) is not repeated either, its
+        compile result is returned again
+        """
+        paths = self.artifact_paths(id)
+        cache = self.artifact_cache
+        if cache is None or paths is None:
+            return self.compile(config_data, id)
+        key = self.artifact_key(config_data)
+        hit = cache.lookup(key)
+        if hit is not None:
+            digest, compile_result = hit
+            if digest is None:
+                restored = self.compile_failed(compile_result)
+            else:
+                restored = cache.restore(digest, paths)
+            if restored:
+                cache.count('hits')
+                if digest is not None:
+                    self.artifact_digests[id] = digest
+                return compile_result
+        cache.count('misses')
+        compile_result = self.compile(config_data, id)
+        digest = cache.store(key, paths, compile_result,
+                             self.compile_failed(compile_result))
+        if digest is not None:
+            self.artifact_digests[id] = digest
+        return compile_result
+
     def cleanup(self, id):
         """
         Clean up any temporary files associated with the executable
@@ -180,7 +250,8 @@ class MeasurementInterface(with_metaclass(abc.ABCMeta, object)):
 
     def file_hash(self, filename):
         """helper used to generate program versions"""
-        return hashlib.sha256(open(filename).read()).hexdigest()
+        with open(filename, 'rb') as fd:
+            return hashlib.sha256(fd.read()).hexdigest()
 
     def manipulator(self):
         """
@@ -207,7 +278,7 @@ class MeasurementInterface(with_metaclass(abc.ABCMeta, object)):
         """
         called once to create the measurement.inputmanager.InputManager
         """
-        if self._objective is None:
+        if self._input_manager is None:
             from .inputmanager import FixedInputManager
 
             return FixedInputManager()
@@ -226,6 +297,8 @@ class MeasurementInterface(with_metaclass(abc.ABCMeta, object)):
             goodkillpg(pid)
         self.pids = []
         self.pid_lock.release()
+        for harness in list(self.harnesses):
+            harness.kill()
 
     def call_program(self, cmd, limit=None, memory_limit=None, **kwargs):
         """
@@ -236,12 +309,10 @@ class MeasurementInterface(with_metaclass(abc.ABCMeta, object)):
            'stdout': '', 'stderr': '',
            'timeout': False, 'time': 1.89}
         """
-        the_io_thread_pool_init(self.args.parallelism)
-        if limit is float('inf'):
+        if limit == float('inf'):
             limit = None
         if type(cmd) in (str, str):
             kwargs['shell'] = True
-        killed = False
         t0 = time.time()
         p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
                              preexec_fn=preexec_setpgid_setrlimit(memory_limit),
@@ -252,26 +323,11 @@ class MeasurementInterface(with_metaclass(abc.ABCMeta, object)):
         self.pid_lock.release()
 
         try:
-            stdout_result = the_io_thread_pool.apply_async(p.stdout.read)
-            stderr_result = the_io_thread_pool.apply_async(p.stderr.read)
-            while p.returncode is None:
-                if limit is None:
-                    goodwait(p)
-                elif limit and time.time() > t0 + limit:
-                    killed = True
-                    goodkillpg(p.pid)
-                    goodwait(p)
-                else:
-                    # still waiting...
-                    sleep_for = limit - (time.time() - t0)
-                    if not stdout_result.ready():
-                        stdout_result.wait(sleep_for)
-                    elif not stderr_result.ready():
-                        stderr_result.wait(sleep_for)
-                    else:
-                        # TODO(jansel): replace this with a portable waitpid
-                        time.sleep(0.001)
-                p.poll()
+            if os.name == 'nt':
+                # select() does not work on pipes on windows
+                stdout, stderr, killed = self.wait_threaded(p, t0, limit)
+            else:
+                stdout, stderr, killed = wait_selector(p, t0, limit)
         except:
             if p.returncode is None:
                 goodkillpg(p.pid)
@@ -287,8 +343,77 @@ class MeasurementInterface(with_metaclass(abc.ABCMeta, object)):
         return {'time': float('inf') if killed else (t1 - t0),
                 'timeout': killed,
                 'returncode': p.returncode,
-                'stdout': stdout_result.get(),
-                'stderr': stderr_result.get()}
+                'stdout': stdout,
+                'stderr': stderr}
+
+    def wait_threaded(self, p, t0, limit):
+        """
+        fallback for wait_selector() that drains the pipes of p on
+        the_io_thread_pool
+        """
+        the_io_thread_pool_init(self.args.parallelism)
+        killed = False
+        stdout_result = the_io_thread_pool.apply_async(p.stdout.read)
+        stderr_result = the_io_thread_pool.apply_async(p.stderr.read)
+        while p.returncode is None:
+            if limit is None:
+                goodwait(p)
+            elif time.time() > t0 + limit:
+                killed = True
+                goodkillpg(p.pid)
+                goodwait(p)
+            else:
+                # still waiting...
+                sleep_for = limit - (time.time() - t0)
+                if not stdout_result.ready():
+                    stdout_result.wait(sleep_for)
+                elif not stderr_result.ready():
+                    stderr_result.wait(sleep_for)
+                else:
+                    try:
+                        p.wait(max(0, t0 + limit - time.time()))
+                    except subprocess.TimeoutExpired:
+                        pass
+            p.poll()
+        return stdout_result.get(), stderr_result.get(), killed
+
+    def call_harness(self, cmd, config_data, limit=None, memory_limit=None,
+                     **kwargs):
+        """
+        measure config_data with a persistent harness started from cmd, see
+        opentuner.measurement.harness for the protocol.  Harnesses are started
+        on demand, one per concurrently running test, and reused for later
+        calls with the same arguments.
+
+        returns dictionary like
+          {'returncode': 0, 'timeout': False, 'time': 0.0012}
+        plus any other fields the harness reported
+        """
+        from opentuner.measurement.harness import PersistentProgram
+
+        key = repr((cmd, memory_limit, sorted(kwargs.items())))
+        with self.harness_lock:
+            if self.idle_harnesses[key]:
+                harness = self.idle_harnesses[key].pop()
+            else:
+                harness = PersistentProgram(cmd, memory_limit, **kwargs)
+                self.harnesses.append(harness)
+        try:
+            return harness.request(config_data, limit)
+        except:
+            harness.kill()
+            raise
+        finally:
+            with self.harness_lock:
+                self.idle_harnesses[key].append(harness)
+
+    def close_harnesses(self):
+        """stop all harnesses started by call_harness()"""
+        with self.harness_lock:
+            for harness in self.harnesses:
+                harness.close()
+            self.harnesses = []
+            self.idle_harnesses.clear()
 
     def prefix_hook(self, session):
         pass
@@ -324,6 +449,80 @@ def preexec_setpgid_setrlimit(memory_limit):
         return _preexec
 
 
+def wait_selector(p, t0, limit):
+    """
+    drain the stdout and stderr pipes of p until they close and wait for p to
+    exit, killing its process group once limit seconds after t0 have passed.
+    Event driven: blocks in select() on the pipes and, where the platform has
+    pidfds, on the exit of p.
+
+    returns (stdout, stderr, killed)
+    """
+    deadline = None if limit is None else t0 + limit
+    killed = False
+    stdout_fd, stderr_fd = p.stdout.fileno(), p.stderr.fileno()
+    output = {stdout_fd: [], stderr_fd: []}
+    pidfd = None
+    with selectors.DefaultSelector() as sel:
+        for fd in output:
+            sel.register(fd, selectors.EVENT_READ)
+        if hasattr(os, 'pidfd_open'):
+            try:
+                pidfd = os.pidfd_open(p.pid)
+                sel.register(pidfd, selectors.EVENT_READ)
+            except OSError:
+                pidfd = None
+        try:
+            while sel.get_map():
+                timeout = None
+                if deadline is not None:
+                    timeout = min(max(0, deadline - time.time()),
+                                  MAX_SELECT_TIMEOUT)
+                events = sel.select(timeout)
+                if not events:
+                    if deadline is not None and time.time() >= deadline:
+                        # if p itself exited its children are holding the pipes
+                        killed = p.poll() is None
+                        goodkillpg(p.pid)
+                        deadline = None
+                    continue
+                for key, _ in events:
+                    if key.fd == pidfd:
+                        sel.unregister(pidfd)  # p exited
+                        continue
+                    data = os.read(key.fd, 65536)
+                    if data:
+                        output[key.fd].append(data)
+                    else:
+                        sel.unregister(key.fd)
+        finally:
+            if pidfd is not None:
+                os.close(pidfd)
+
+    if deadline is not None and p.poll() is None:
+        # no pidfd and p closed its pipes without exiting
+        try:
+            p.wait(max(0, deadline - time.time()))
+        except subprocess.TimeoutExpired:
+            killed = True
+            goodkillpg(p.pid)
+    goodwait(p)
+    p.stdout.close()
+    p.stderr.close()
+    return (pipe_output(p.stdout, output[stdout_fd]),
+            pipe_output(p.stderr, output[stderr_fd]),
+            killed)
+
+
+def pipe_output(pipe, chunks):
+    """join chunks read from pipe, decoding them if it is in text mode"""
+    data = b''.join(chunks)
+    if isinstance(pipe, io.TextIOBase):
+        return io.TextIOWrapper(io.BytesIO(data), encoding=pipe.encoding,
+                                errors=pipe.errors).read()
+    return data
+
+
 def the_io_thread_pool_init(parallelism=1):
     global the_io_thread_pool
     if the_io_thread_pool is None:
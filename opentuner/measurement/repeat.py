@@ -0,0 +1,140 @@
+"""
+repeated measurement of noisy timings
+
+a single timing of a configuration can be far off its typical value.  With
+--max-repeats N > 1 each test is run until the confidence interval on its mean
+time is tight enough (--target-precision), it is clearly worse than the best
+result so far (racing), or N samples have been taken.  The samples are
+aggregated into a single Result, see RepeatedMeasurement.aggregate().
+"""
+from __future__ import division
+
+import argparse
+import logging
+import math
+from statistics import NormalDist
+
+log = logging.getLogger(__name__)
+
+argparser = argparse.ArgumentParser(add_help=False)
+argparser.add_argument('--max-repeats', type=int, default=1, metavar='N',
+                       help="run each test up to N times, until the "
+                            "confidence interval on its time is tight enough "
+                            "or it is clearly worse than the best so far")
+argparser.add_argument('--min-repeats', type=int, default=2, metavar='N',
+                       help="run each test at least N times when "
+                            "--max-repeats is above 1")
+argparser.add_argument('--confidence-level', type=float, default=0.95,
+                       help="confidence level of the interval on repeated "
+                            "times")
+argparser.add_argument('--target-precision', type=float, default=0.02,
+                       help="stop repeating once the confidence interval "
+                            "half-width is below this fraction of the mean")
+argparser.add_argument('--compare-bound', choices=('mean', 'lower', 'upper'),
+                       help="compare repeated results by mean time or by an "
+                            "end of their confidence interval")
+
+
+def t_quantile(p, df):
+    """
+    quantile p of Student's t distribution with df degrees of freedom, exact
+    for df <= 2 and a Cornish-Fisher expansion (Abramowitz and Stegun
+    26.7.5) accurate to about 1e-3 above that
+    """
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = NormalDist().inv_cdf(p)
+    return (z
+            + (z ** 3 + z) / (4 * df)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3)
+            + (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3
+               - 945 * z) / (92160 * df ** 4))
+
+
+def mean_interval(samples, confidence_level=0.95):
+    """return (mean, standard deviation, confidence interval half-width)"""
+    n = len(samples)
+    mean = sum(samples) / n
+    if n < 2:
+        return mean, None, None
+    stddev = math.sqrt(sum((x - mean) ** 2 for x in samples) / (n - 1))
+    t = t_quantile(0.5 + confidence_level / 2.0, n - 1)
+    return mean, stddev, t * stddev / math.sqrt(n)
+
+
+class RepeatedMeasurement(object):
+    """
+    decides how many times to run a test and combines the samples
+    """
+
+    def __init__(self, objective, min_repeats=2, max_repeats=1,
+                 confidence_level=0.95, target_precision=0.02):
+        self.objective = objective
+        self.max_repeats = max(1, max_repeats)
+        self.min_repeats = max(1, min(min_repeats, self.max_repeats))
+        self.confidence_level = confidence_level
+        self.target_precision = target_precision
+        self.samples_taken = 0
+        self.raced = 0
+
+    @classmethod
+    def from_args(cls, objective, args):
+        """a RepeatedMeasurement for args, or None if repeats are disabled"""
+        if args.max_repeats <= 1:
+            return None
+        return cls(objective,
+                   min_repeats=args.min_repeats,
+                   max_repeats=args.max_repeats,
+                   confidence_level=args.confidence_level,
+                   target_precision=args.target_precision)
+
+    def measure(self, measure_once, best=None):
+        """
+        call measure_once() until the aggregated Result is precise enough or
+        clearly worse than best, failed runs are returned without repeating.
+        Safe to call from worker threads, it does not touch the database.
+        """
+        first = None
+        samples = []
+        while True:
+            result = measure_once()
+            self.samples_taken += 1
+            if (result.state not in (None, 'OK') or result.time is None or
+                    math.isinf(result.time)):
+                return result
+            if first is None:
+                first = result
+            samples.append(result.time)
+            n = len(samples)
+            if n >= self.max_repeats:
+                break
+            if n < self.min_repeats or n < 2:
+                continue
+            aggregated = self.aggregate(first, samples)
+            if aggregated.confidence <= self.target_precision * aggregated.time:
+                break
+            if best is not None and self.objective.clearly_worse(aggregated,
+                                                                 best):
+                aggregated.set_attribute('raced', True)
+                self.raced += 1
+                return aggregated
+        return self.aggregate(first, samples)
+
+    def aggregate(self, result, samples):
+        """
+        record the times of repeated runs in result, the first of them, with
+        time set to the mean, confidence to the half-width of the confidence
+        interval of the mean, and the samples and their standard deviation in
+        extra
+        """
+        mean, stddev, half_width = mean_interval(samples,
+                                                 self.confidence_level)
+        result.time = mean
+        result.confidence = half_width
+        result.update_attributes({'samples': samples,
+                                  'time_stddev': stddev,
+                                  'confidence_level': self.confidence_level})
+        return result
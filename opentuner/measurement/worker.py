@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+measure the DesiredResults of an existing TuningRun from another process or
+host, so several workers can share the measurement work of one tuning run
+
+start the tuner with --remote-measurement, then one or more workers with:
+
+  opentuner-worker --database DATABASE --tuning-run UUID \
+                   --interface mytuner.py:MyMeasurementInterface
+"""
+from __future__ import absolute_import
+
+import argparse
+import importlib
+import importlib.util
+import logging
+import os
+import sys
+import time
+
+import opentuner
+from opentuner import resultsdb
+from opentuner import tuningrunmain
+from opentuner.driverbase import ResultIndex
+from opentuner.resultsdb.models import TuningRun
+
+log = logging.getLogger(__name__)
+
+argparser = argparse.ArgumentParser(
+    description='measure DesiredResults requested by an existing TuningRun')
+argparser.add_argument('--database', required=True,
+                       help='database of the tuning run')
+argparser.add_argument('--tuning-run', required=True, metavar='UUID',
+                       help='uuid of the TuningRun to attach to')
+argparser.add_argument('--interface', required=True, metavar='MODULE:CLASS',
+                       help='MeasurementInterface to measure with, MODULE is a '
+                            'module name or the path of a .py file')
+argparser.add_argument('--machine-class',
+                       help='name of the machine class being run on')
+argparser.add_argument('--poll-interval', type=float, default=0.5,
+                       help='seconds to wait between polls for new requests')
+argparser.add_argument('--idle-timeout', type=float,
+                       help='exit after this many seconds without work')
+
+
+class TuningRunWorker(tuningrunmain.TuningRunMain):
+    """
+    This class attaches to an existing TuningRun, by uuid, and measures its
+    pending DesiredResults instead of running a search.  Claims and results
+    are committed immediately so other processes see them.
+    """
+
+    shared_requests = True
+
+    def __init__(self, measurement_interface, args, tuning_run_uuid,
+                 idle_timeout=None, **kwargs):
+        super(TuningRunWorker, self).__init__(measurement_interface, args,
+                                              **kwargs)
+        self.fake_commit = False
+        self.tuning_run_uuid = tuning_run_uuid
+        self.idle_timeout = idle_timeout
+
+    def init(self):
+        if self.tuning_run is None:
+            self.tuning_run = (self.session.query(TuningRun)
+                               .filter_by(uuid=self.tuning_run_uuid).one())
+            self.result_index = ResultIndex(self.objective,
+                                            self.args.limit_window)
+            self.measurement_driver = self.measurement_driver_cls(
+                args=self.args,
+                input_manager=self.input_manager,
+                measurement_interface=self.measurement_interface,
+                objective=self.objective,
+                result_index=self.result_index,
+                session=self.session,
+                tuning_run_main=self,
+                tuning_run=self.tuning_run)
+            self.measurement_interface.set_driver(self.measurement_driver)
+            self.input_manager.set_driver(self.measurement_driver)
+            self.commit(force=True)
+
+    def main(self):
+        self.init()
+        last_work = time.time()
+        try:
+            while not self.tuning_run_finished():
+                if self.run_one():
+                    last_work = time.time()
+                elif (self.idle_timeout is not None and
+                      time.time() - last_work > self.idle_timeout):
+                    log.info('no requests for %.1f seconds, exiting',
+                             self.idle_timeout)
+                    break
+                else:
+                    time.sleep(self.args.poll_interval)
+        finally:
+            self.commit(force=True)
+            self.session.close()
+            self.measurement_interface.close_harnesses()
+
+    def tuning_run_finished(self):
+        self.session.refresh(self.tuning_run)
+        return self.tuning_run.state in ('COMPLETE', 'ABORTED')
+
+    def run_one(self):
+        """
+        claim and measure a single pending DesiredResult, returns False if
+        there was nothing left to claim
+        """
+        driver = self.measurement_driver
+        for dr in driver.query_pending_desired_results().limit(self.args.parallelism):
+            if not driver.claim_desired_result(dr):
+                continue  # another worker got it first
+            driver.lap_timer()
+            if self.measurement_interface.parallel_compile:
+                compile_result = self.measurement_interface.cached_compile(
+                    dr.configuration.data, dr.id)
+                driver.run_desired_result(dr, compile_result, dr.id)
+                self.measurement_interface.cleanup(dr.id)
+            else:
+                driver.run_desired_result(dr)
+            return True
+        return False
+
+    def results_wait(self, generation):
+        raise RuntimeError('TuningRunWorker does not run a search')
+
+
+def load_interface_class(name):
+    """import a MODULE:CLASS, where MODULE may be a path to a .py file"""
+    module_name, class_name = name.rsplit(':', 1)
+    if module_name.endswith('.py'):
+        path = os.path.abspath(module_name)
+        sys.path.insert(0, os.path.dirname(path))
+        spec = importlib.util.spec_from_file_location(
+            os.path.splitext(os.path.basename(path))[0], path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(module_name)
+    return getattr(module, class_name)
+
+
+def tuning_run_args(args):
+    """
+    the arguments the tuning run was started with, adjusted for this worker
+    """
+    engine, Session = resultsdb.connect(args.database)
+    session = Session()
+    tuning_run = session.query(TuningRun).filter_by(uuid=args.tuning_run).one()
+    run_args = vars(opentuner.default_argparser().parse_args([]))
+    run_args.update(vars(tuning_run.args))
+    session.close()
+    engine.dispose()
+
+    run_args.update(database=args.database,
+                    machine_class=args.machine_class,
+                    poll_interval=args.poll_interval,
+                    remote_measurement=False,
+                    async_measurement=False,
+                    parallel_run=1)
+    return argparse.Namespace(**run_args)
+
+
+def main(argv=None):
+    args = argparser.parse_args(argv)
+    tuningrunmain.init_logging()
+    if '://' not in args.database:
+        args.database = 'sqlite:///' + args.database
+    run_args = tuning_run_args(args)
+    interface = load_interface_class(args.interface)(run_args)
+    TuningRunWorker(interface, run_args, args.tuning_run,
+                    idle_timeout=args.idle_timeout).main()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
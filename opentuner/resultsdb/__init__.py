@@ -1,4 +1,5 @@
 from __future__ import absolute_import
 
 from . import models
+from .connect import CONNECTION_PROFILES
 from .connect import connect
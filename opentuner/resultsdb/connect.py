@@ -4,14 +4,24 @@ import logging
 import time
 from pprint import pprint
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 from .models import Base, _Meta
 
 log = logging.getLogger(__name__)
 
-DB_VERSION = "0.1"
+DB_VERSION = "0.2"
+
+# in-place upgrades: version -> ((table, column) pairs to add, next version),
+# the columns typed as in the models.  Older rows stay readable, e.g. 0.1
+# configurations keep their pickled data
+MIGRATIONS = {
+    "0.1": ([("configuration", "packed"),
+             ("configuration", "schema_id")],
+            "0.2"),
+}
 
 if False:  # profiling of queries
     import atexit
@@ -40,8 +50,92 @@ if False:  # profiling of queries
         pprint(the_query_totals.most_common(10))
 
 
-def connect(dbstr):
-    engine = create_engine(dbstr, echo=False)
+# connection profiles, selected with --db-profile.  'pragmas' are run on every
+# new sqlite connection, all sqlite profiles wait up to 'busy_timeout' seconds
+# for locks held by other processes (e.g. stats readers or opentuner-worker)
+# instead of failing with "database is locked".  Other databases get a
+# connection pool that checks connections before use.
+CONNECTION_PROFILES = {
+    # rollback journal and synchronous=FULL, as sqlite defaults to
+    'default': {
+        'pragmas': [],
+        'busy_timeout': 30.0,
+    },
+    # write-ahead log: readers do not block the writer, commits append to
+    # the log, and the database survives crashes of the process or machine
+    'wal': {
+        'pragmas': [('journal_mode', 'WAL'),
+                    ('synchronous', 'NORMAL'),
+                    ('cache_size', -64 * 1024),  # KiB
+                    ('mmap_size', 256 * 1024 * 1024),
+                    ('temp_store', 'MEMORY')],
+        'busy_timeout': 30.0,
+    },
+    # as 'wal', but commits never wait for fsync.  A power loss (not a
+    # process crash) may lose the last transactions
+    'fast': {
+        'pragmas': [('journal_mode', 'WAL'),
+                    ('synchronous', 'OFF'),
+                    ('cache_size', -64 * 1024),
+                    ('mmap_size', 256 * 1024 * 1024),
+                    ('temp_store', 'MEMORY')],
+        'busy_timeout': 30.0,
+    },
+}
+
+# create_engine() arguments for databases other than sqlite
+POOL_OPTIONS = {'pool_pre_ping': True, 'pool_recycle': 3600}
+
+
+def create_profile_engine(dbstr, profile='default'):
+    """create_engine() for dbstr, configured per CONNECTION_PROFILES[profile]"""
+    settings = CONNECTION_PROFILES[profile]
+    url = make_url(dbstr)
+    if url.get_backend_name() != 'sqlite':
+        return create_engine(url, echo=False, **POOL_OPTIONS)
+
+    engine = create_engine(url, echo=False,
+                           connect_args={'timeout': settings['busy_timeout']})
+    pragmas = settings['pragmas']
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute('PRAGMA %s=%s' % (name, value))
+        cursor.close()
+
+    return engine
+
+
+def migration_statements(version, dialect):
+    """the DDL of MIGRATIONS[version] for a database of dialect"""
+    quote = dialect.identifier_preparer.quote
+    statements = []
+    for table, name in MIGRATIONS[version][0]:
+        column = Base.metadata.tables[table].c[name]
+        statements.append('ALTER TABLE %s ADD COLUMN %s %s' % (
+            quote(table), quote(name), column.type.compile(dialect=dialect)))
+    return statements
+
+
+def migrate(connection, version):
+    """apply MIGRATIONS starting at version, return the resulting version"""
+    while version in MIGRATIONS:
+        next_version = MIGRATIONS[version][1]
+        log.info('upgrading opentuner database from version %s to %s',
+                 version, next_version)
+        for statement in migration_statements(version, connection.dialect):
+            connection.execute(text(statement))
+        connection.execute(text('UPDATE _meta SET db_version = :version'),
+                           {'version': next_version})
+        connection.commit()
+        version = next_version
+    return version
+
+
+def connect(dbstr, profile='default'):
+    engine = create_profile_engine(dbstr, profile)
     connection = engine.connect()
 
     # handle case that the db was initialized before a version table existed yet
@@ -58,15 +152,26 @@ def connect(dbstr):
                                               autoflush=False,
                                               bind=engine))
         version = _Meta.get_version(Session)
+        Session.remove()
+        if version in MIGRATIONS:
+            version = migrate(connection, version)
         if not DB_VERSION == version:
             raise Exception(
                 'Your opentuner database version {} is out of date with the current version {}'.format(version,
                                                                                                        DB_VERSION))
 
+    connection.close()
     Base.metadata.create_all(engine)
+    # create_all() skips existing tables, add indexes defined after them
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
+    # objects are not expired on commit: drivers keep using loaded rows (and
+    # --async-measurement worker threads read them) after each commit
     Session = scoped_session(sessionmaker(autocommit=False,
                                           autoflush=False,
+                                          expire_on_commit=False,
                                           bind=engine))
     # mark database with current version
     _Meta.add_version(Session, DB_VERSION)
@@ -8,8 +8,10 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import relationship
 from sqlalchemy import (
     Column, Integer, String, DateTime, Boolean, Enum,
-    Float, PickleType, ForeignKey, Text, func, Index)
+    Float, PickleType, ForeignKey, Text, LargeBinary, func, Index)
+from sqlalchemy.ext.hybrid import hybrid_property
 import sqlalchemy
+import hashlib
 import re
 
 from pickle import dumps, loads
@@ -18,10 +20,17 @@ from sqlalchemy.ext.mutable import MutableDict
 
 
 class CompressedPickler(object):
+    # only larger pickles are compressed, at a cheap level, since this runs
+    # on every insert.  loads() still reads data written with level 9
+    compress_threshold = 1024
+    compress_level = 1
+
     @classmethod
     def dumps(cls, obj, protocol=2):
         s = dumps(obj, protocol)
-        sz = zlib.compress(s, 9)
+        if len(s) < cls.compress_threshold:
+            return s
+        sz = zlib.compress(s, cls.compress_level)
         if len(sz) < len(s):
             return sz
         else:
@@ -123,24 +132,112 @@ class ProgramVersion(Base):
             return t
 
 
-class Configuration(Base):
+class ConfigurationSchema(Base):
+    """
+    parameter layout and reference configuration that Configuration.packed
+    is encoded against, see opentuner.resultsdb.packing
+    """
     program_id = Column(ForeignKey(Program.id))
     program = relationship(Program)
     hash = Column(String(64))
-    data = Column(PickleType(pickler=CompressedPickler))
+    schema = Column(PickleType(pickler=CompressedPickler))  # (entries, reference)
+
+    def codec(self):
+        try:
+            return self._codec
+        except AttributeError:
+            from opentuner.resultsdb.packing import ConfigurationCodec
+            self._codec = ConfigurationCodec(*self.schema)
+            return self._codec
 
     @classmethod
-    def get(cls, session, program, hashv, datav):
+    def get(cls, session, program, schema):
+        hashv = hashlib.sha256(dumps(schema, 2)).hexdigest()
         try:
             session.flush()
-            return (session.query(Configuration)
+            return (session.query(ConfigurationSchema)
                     .filter_by(program=program, hash=hashv).one())
         except sqlalchemy.orm.exc.NoResultFound:
-            t = Configuration(program=program, hash=hashv, data=datav)
+            t = ConfigurationSchema(program=program, hash=hashv, schema=schema)
             session.add(t)
             return t
 
 
+class Configuration(Base):
+    program_id = Column(ForeignKey(Program.id))
+    program = relationship(Program)
+    hash = Column(String(64))
+    # data is either pickled in the data column or packed against a schema
+    _data = Column('data', PickleType(pickler=CompressedPickler))
+    packed = Column(LargeBinary)
+    schema_id = Column(ForeignKey(ConfigurationSchema.id))
+    schema = relationship(ConfigurationSchema)
+
+    @hybrid_property
+    def data(self):
+        if self._data is not None or self.packed is None:
+            return self._data
+        unpacked = self.__dict__.get('_unpacked')
+        if unpacked is None:
+            unpacked = self._unpacked = self.schema.codec().decode(self.packed)
+        return unpacked
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self.packed = None
+        self._unpacked = None
+
+    @data.expression
+    def data(cls):
+        return cls._data
+
+    @classmethod
+    def get(cls, session, program, hashv, datav, schema=None):
+        """
+        get (or create) the configuration with hash hashv, new configurations
+        are packed against schema, a ConfigurationSchema, if given
+        """
+        try:
+            session.flush()
+            return (session.query(Configuration)
+                    .filter_by(program=program, hash=hashv).one())
+        except sqlalchemy.orm.exc.NoResultFound:
+            return cls.create(session, program, hashv, datav, schema)
+
+    @classmethod
+    def get_many(cls, session, program, items, schema=None):
+        """
+        get() for a list of distinct (hashv, datav) pairs, with one query
+        per chunk of hashes
+        """
+        session.flush()
+        found = dict()
+        hashes = [hashv for hashv, _ in items]
+        for i in range(0, len(hashes), 500):
+            for config in (session.query(Configuration)
+                           .filter_by(program=program)
+                           .filter(Configuration.hash.in_(hashes[i:i + 500]))):
+                found[config.hash] = config
+        return [found.get(hashv) or
+                cls.create(session, program, hashv, datav, schema)
+                for hashv, datav in items]
+
+    @classmethod
+    def create(cls, session, program, hashv, datav, schema=None):
+        """add a new Configuration, packed against schema if possible"""
+        t = Configuration(program=program, hash=hashv)
+        packed = schema.codec().encode(datav) if schema is not None else None
+        if packed is None:
+            t.data = datav
+        else:
+            t.packed = packed
+            t.schema = schema
+            t._unpacked = datav
+        session.add(t)
+        return t
+
+
 Index('ix_configuration_custom1', Configuration.program_id, Configuration.hash)
 
 
@@ -237,6 +334,10 @@ class TuningRun(Base):
         return self.program_version.program
 
 
+Index('ix_tuning_run_custom1', TuningRun.program_version_id,
+      TuningRun.machine_class_id)
+
+
 class Result(Base):
     # set by MeasurementDriver:
     configuration_id = Column(ForeignKey(Configuration.id))
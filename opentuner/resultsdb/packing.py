@@ -0,0 +1,173 @@
+"""
+compact binary encoding of Configuration.data
+
+a configuration is packed against a schema, one entry per top-level key of
+the configuration dict, and a reference configuration (typically the
+manipulator's seed).  Only values that differ from the reference are stored:
+
+  version byte
+  bitmap of entries that differ from the reference
+  bitmap of those entries stored pickled (values that do not fit the kind)
+  the differing values in schema order:
+    'i' int     -> int64
+    'f' float   -> float64
+    'e' choice  -> uint32 index into the entry's options
+    'p' permutation -> uint16 (or uint32) index of each item
+    'o' other   -> uint32 length + pickle
+  uint32 length + pickle of keys not in the schema (length 0 if none)
+
+see ConfigurationManipulator.packing_schema() for how the schema is derived
+from the manipulator's parameters.
+"""
+from __future__ import absolute_import
+
+import copy
+import pickle
+import struct
+
+VERSION = 1
+
+_int = struct.Struct('<q')
+_float = struct.Struct('<d')
+_uint = struct.Struct('<I')
+
+
+class ConfigurationCodec(object):
+    """
+    encodes configuration dicts against entries [(name, kind, options), ...]
+    and a reference configuration
+    """
+
+    def __init__(self, entries, reference):
+        self.entries = []
+        self.reference = reference
+        self.lookups = []  # (type(value), value) -> index, per entry
+        self.item_structs = []
+        for name, kind, options in entries:
+            lookup = None
+            item_struct = None
+            if kind in ('e', 'p'):
+                try:
+                    lookup = dict()
+                    for i, option in enumerate(options):
+                        lookup.setdefault((type(option), option), i)
+                except TypeError:
+                    kind, lookup = 'o', None  # unhashable options
+            if kind == 'p':
+                item_struct = struct.Struct('<%d%s' % (
+                    len(options), 'H' if len(options) < 2 ** 16 else 'I'))
+            self.entries.append((name, kind, options))
+            self.lookups.append(lookup)
+            self.item_structs.append(item_struct)
+        self.name_set = set(name for name, _, _ in self.entries)
+        self.decoders = [
+            (1 << i, name, kind, options, reference[name], self.item_structs[i])
+            for i, (name, kind, options) in enumerate(self.entries)]
+        self.pickled_reference = [
+            _dumps(reference[name]) if kind in ('p', 'o') else None
+            for name, kind, _ in self.entries]
+        self.bitmap_bytes = (len(self.entries) + 7) // 8
+
+    def encode(self, config):
+        """bytes for config, or None if it cannot be packed"""
+        if type(config) is not dict or not self.name_set.issubset(config):
+            return None
+        present = 0
+        pickled = 0
+        parts = []
+        for i, (name, kind, options) in enumerate(self.entries):
+            value = config[name]
+            if kind in ('i', 'f', 'e'):
+                reference = self.reference[name]
+                if type(value) is type(reference) and value == reference:
+                    continue
+            elif _dumps(value) == self.pickled_reference[i]:
+                # exact comparison, 0 == 0.0 and numpy arrays do not compare
+                continue
+            present |= 1 << i
+            packed = self.encode_value(i, kind, value)
+            if packed is None:
+                pickled |= 1 << i
+                packed = _pickled(value)
+            parts.append(packed)
+        rest = dict((k, v) for k, v in config.items() if k not in self.name_set)
+        parts.append(_pickled(rest) if rest else _uint.pack(0))
+        return b''.join([bytes([VERSION]),
+                         present.to_bytes(self.bitmap_bytes, 'little'),
+                         pickled.to_bytes(self.bitmap_bytes, 'little')] + parts)
+
+    def encode_value(self, i, kind, value):
+        """fixed width bytes for value, or None if it does not fit kind"""
+        try:
+            if kind == 'i' and type(value) is int:
+                return _int.pack(value)
+            if kind == 'f' and type(value) is float:
+                return _float.pack(value)
+            if kind == 'e':
+                index = self.lookups[i].get((type(value), value))
+                if index is not None:
+                    return _uint.pack(index)
+            if kind == 'p' and type(value) is list:
+                lookup = self.lookups[i]
+                indices = [lookup[(type(v), v)] for v in value]
+                return self.item_structs[i].pack(*indices)
+        except (KeyError, TypeError, struct.error):
+            pass  # out of range or unhashable
+        return None
+
+    def decode(self, blob):
+        """the configuration dict packed in blob by encode()"""
+        if blob[0] != VERSION:
+            raise ValueError('unknown packed configuration version %d' % blob[0])
+        pos = 1
+        present = int.from_bytes(blob[pos:pos + self.bitmap_bytes], 'little')
+        pos += self.bitmap_bytes
+        pickled = int.from_bytes(blob[pos:pos + self.bitmap_bytes], 'little')
+        pos += self.bitmap_bytes
+        config = dict()
+        int_from = _int.unpack_from
+        float_from = _float.unpack_from
+        uint_from = _uint.unpack_from
+        for bit, name, kind, options, reference, item_struct in self.decoders:
+            if not present & bit:
+                if kind == 'p':
+                    reference = list(reference)
+                elif kind == 'o':
+                    reference = copy.deepcopy(reference)
+                config[name] = reference
+            elif pickled & bit:
+                config[name], pos = _unpickled(blob, pos)
+            elif kind == 'f':
+                config[name] = float_from(blob, pos)[0]
+                pos += 8
+            elif kind == 'i':
+                config[name] = int_from(blob, pos)[0]
+                pos += 8
+            elif kind == 'e':
+                config[name] = options[uint_from(blob, pos)[0]]
+                pos += 4
+            else:
+                config[name] = [options[j]
+                                for j in item_struct.unpack_from(blob, pos)]
+                pos += item_struct.size
+        rest, pos = _unpickled(blob, pos)
+        if rest:
+            config.update(rest)
+        return config
+
+
+def _dumps(value):
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _pickled(value):
+    data = _dumps(value)
+    return _uint.pack(len(data)) + data
+
+
+def _unpickled(blob, pos):
+    size, = _uint.unpack_from(blob, pos)
+    pos += 4
+    if size == 0:
+        return None, pos
+    return pickle.loads(blob[pos:pos + size]), pos + size
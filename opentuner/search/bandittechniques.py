@@ -9,6 +9,7 @@ import random
 from builtins import object
 from builtins import range
 from builtins import str
+from bisect import bisect_left, insort
 from collections import deque
 
 from past.utils import old_div
@@ -20,6 +21,14 @@ log = logging.getLogger(__name__)
 
 
 class BanditQueue(object):
+    """
+    orders keys by bandit_score().  Scores are cached in a sorted list and
+    only recomputed for keys whose history changed, and for all keys while
+    the history (and so the exploration term) is still growing, so
+    bandit_score(key) may only depend on the history of key and
+    len(self.history)
+    """
+
     def __init__(self, keys, C=0.05, window=500, **kwargs):
         """
         C is exploration/exploitation tradeoff
@@ -32,6 +41,10 @@ class BanditQueue(object):
         self.use_counts = dict(((k, 0) for k in keys))
         self.window = window
         self.request_count = 0
+        self.order = []  # sorted (-bandit_score, random tie breaker, key)
+        self.entries = dict()  # key -> its entry in self.order
+        self.dirty = set(keys)  # keys whose entries are out of date
+        self.scored_history = None  # len(self.history) at the last rescore
 
     @abc.abstractmethod
     def exploitation_term(self, key):
@@ -53,20 +66,36 @@ class BanditQueue(object):
         return (self.exploitation_term(key) +
                 self.C * self.exploration_term(key))
 
+    def entry(self, key):
+        return (-self.bandit_score(key), random.random(), key)
+
+    def update_order(self):
+        """bring self.order up to date with the history"""
+        if self.scored_history != len(self.history):
+            # the exploration term of every key changed
+            self.scored_history = len(self.history)
+            self.entries = dict((k, self.entry(k)) for k in self.keys)
+            self.order = sorted(self.entries.values())
+        else:
+            for key in self.dirty:
+                old = self.entries[key]
+                del self.order[bisect_left(self.order, old)]
+                self.entries[key] = self.entry(key)
+                insort(self.order, self.entries[key])
+        self.dirty.clear()
+
     def ordered_keys(self):
         """select the next technique to use"""
-
-        keys = list(self.keys)
-        random.shuffle(keys)  # break ties randomly
-        keys.sort(key=self.bandit_score)
+        self.update_order()
 
         self.request_count += 1
         if log.isEnabledFor(logging.DEBUG) and (self.request_count % 1000) == 0:
             log.debug(str([
                 (t, self.exploitation_term(t), self.C * self.exploration_term(t))
-                for t in keys]))
+                for _, _, t in self.order]))
 
-        return reversed(keys)
+        # a snapshot, results may arrive while the caller iterates
+        return (key for _, _, key in list(self.order))
 
     def on_result(self, key, value):
         self.history.append((key, value))
@@ -76,9 +105,11 @@ class BanditQueue(object):
 
     def on_push_history(self, key, value):
         self.use_counts[key] += 1
+        self.dirty.add(key)
 
     def on_pop_history(self, key, value):
         self.use_counts[key] -= 1
+        self.dirty.add(key)
 
 
 class AUCBanditQueue(BanditQueue):
@@ -91,8 +122,8 @@ class AUCBanditQueue(BanditQueue):
     """
 
     def __init__(self, *args, **kwargs):
+        self.debug = kwargs.pop('debug', False)
         super(AUCBanditQueue, self).__init__(*args, **kwargs)
-        self.debug = kwargs.get('debug', False)
         self.auc_sum = dict(((t, 0) for t in self.keys))
         self.auc_decay = dict(((t, 0) for t in self.keys))
 
@@ -101,7 +132,8 @@ class AUCBanditQueue(BanditQueue):
         value 0 to 1.0 to represent quality of key
 
         computes the area under the curve where finding a new
-        global best results in adding 1 to a cumulative total
+        global best results in adding 1 (or the value of a weighted result)
+        to a cumulative total
         """
         score = 0.0
         pos = 0
@@ -109,7 +141,7 @@ class AUCBanditQueue(BanditQueue):
             if t is key:
                 pos += 1
                 if value:
-                    score += pos
+                    score += pos * value
         if pos:
             return score * 2.0 / (pos * (pos + 1.0))
         else:
@@ -132,34 +164,64 @@ class AUCBanditQueue(BanditQueue):
         v1 = self.exploitation_term_fast(key)
         if self.debug:
             v2 = self.exploitation_term_slow(key)
-            assert v1 == v2
+            assert abs(v1 - v2) < 1e-9
         return v1
 
     def on_push_history(self, key, value):
         super(AUCBanditQueue, self).on_push_history(key, value)
         if value:
-            self.auc_sum[key] += self.use_counts[key]
-            self.auc_decay[key] += 1
+            self.auc_sum[key] += self.use_counts[key] * value
+            self.auc_decay[key] += value
 
     def on_pop_history(self, key, value):
         super(AUCBanditQueue, self).on_pop_history(key, value)
         self.auc_sum[key] -= self.auc_decay[key]
         if value:
-            self.auc_decay[key] -= 1
+            self.auc_decay[key] -= value
 
 
 class AUCBanditMetaTechnique(MetaSearchTechnique):
-    def __init__(self, techniques, bandit_kwargs=dict(), **kwargs):
+    def __init__(self, techniques, bandit_kwargs=dict(), cost_aware=False,
+                 **kwargs):
+        """
+        with cost_aware (or --bandit-cost-aware) a new best is credited less
+        the more its test cost (Result.collection_cost) exceeds the average,
+        rewarding techniques by improvements per second of measurement
+        rather than per test
+        """
         super(AUCBanditMetaTechnique, self).__init__(techniques, **kwargs)
         self.bandit = AUCBanditQueue([t.name for t in techniques], **bandit_kwargs)
         self.name_to_technique = dict(((t.name, t) for t in self.techniques))
+        self.cost_aware = cost_aware
+        self.mean_cost = None
+
+    def set_driver(self, driver):
+        super(AUCBanditMetaTechnique, self).set_driver(driver)
+        args = getattr(driver, 'args', None)
+        if args is not None and getattr(args, 'bandit_cost_aware', False):
+            self.cost_aware = True
 
     def select_technique_order(self):
         """select the next technique to use"""
         return (self.name_to_technique[k] for k in self.bandit.ordered_keys())
 
     def on_technique_result(self, technique, result):
-        self.bandit.on_result(technique.name, result.was_new_best)
+        self.bandit.on_result(technique.name, self.credit(result))
+
+    def credit(self, result):
+        """bandit value of result, see cost_aware"""
+        if not self.cost_aware:
+            return result.was_new_best
+        cost = result.collection_cost
+        if cost is None or not cost > 0 or math.isinf(cost):
+            return result.was_new_best
+        if self.mean_cost is None:
+            self.mean_cost = cost
+        else:
+            self.mean_cost += 0.05 * (cost - self.mean_cost)
+        if not result.was_new_best:
+            return 0
+        return min(1.0, self.mean_cost / cost)
 
     def on_technique_no_desired_result(self, technique):
         """treat not providing a configuration as not a best"""
@@ -230,7 +292,8 @@ class AUCBanditMutationTechnique(SearchTechnique):
 
         cfg = self.manipulator.copy(seed)
         hash1 = self.manipulator.hash_config(cfg)
-        params = self.manipulator.parameters_dict(cfg)
+        params = dict((p.name, p)
+                      for p in self.manipulator.active_parameters(cfg))
         for name, index in self.bandit.ordered_keys():
             if name in params:
                 param = params[name]
@@ -270,6 +333,7 @@ from . import patternsearch
 from . import simulatedannealing
 from .pso import PSO
 from . import globalGA
+from . import bayesopt
 
 register(AUCBanditMutationTechnique())
 
@@ -287,6 +351,11 @@ register(AUCBanditMetaTechnique([
     differentialevolution.DifferentialEvolutionAlt(),
     patternsearch.PatternSearch(),
 ], name="AUCBanditMetaTechniqueC"))
+register(AUCBanditMetaTechnique([
+    bayesopt.BayesianOptimization(),
+    differentialevolution.DifferentialEvolutionAlt(),
+    evolutionarytechniques.UniformGreedyMutation(),
+], name="AUCBanditBayesOpt"))
 register(AUCBanditMetaTechnique([
     PSO(crossover='op3_cross_OX3'),
     PSO(crossover='op3_cross_OX1'),
@@ -0,0 +1,162 @@
+from __future__ import absolute_import
+from __future__ import division
+
+import logging
+import random
+from collections import OrderedDict
+
+import numpy
+
+from .manipulator import _numpy_random
+from .surrogate import ConfigurationEncoder, GaussianProcess
+from .surrogate import expected_improvement, rank_targets
+from .technique import SearchTechnique
+from .technique import register
+
+log = logging.getLogger(__name__)
+
+
+class BayesianOptimization(SearchTechnique):
+    """
+    model-based search: fit a Gaussian process to the results of the
+    configurations this technique requested (see surrogate.py) and test the
+    candidate with the highest expected improvement.  Candidates are random
+    configurations and mutations of the best ones seen so far.  Configurations
+    still being tested are added to the model at its own prediction ("kriging
+    believer") so that parallel requests spread out
+    """
+
+    def __init__(self,
+                 initial_samples=10,  # random configurations before modeling
+                 candidates=200,  # candidates scored per request
+                 max_points=200,  # best results the model is fit to
+                 mutation_rate=0.2,  # of the parameters of mutated candidates
+                 xi=0.01,  # minimum improvement worth exploring for
+                 *pargs, **kwargs):
+        self.initial_samples = initial_samples
+        self.candidates = candidates
+        self.max_points = max_points
+        self.mutation_rate = mutation_rate
+        self.xi = xi
+        self.encoder = None
+        self.observed = []  # (features, cfg, result)
+        self.pending = OrderedDict()  # hash -> features
+        self.model = None
+        self.train = None
+        super(BayesianOptimization, self).__init__(*pargs, **kwargs)
+
+    @classmethod
+    def get_hyper_parameters(cls):
+        return ['initial_samples', 'candidates', 'max_points', 'mutation_rate',
+                'xi']
+
+    def handle_requested_result(self, result):
+        """add the result to the training data of the model"""
+        cfg = result.configuration.data
+        if self.encoder is None:
+            self.encoder = ConfigurationEncoder(self.manipulator)
+        self.pending.pop(result.configuration.hash, None)
+        self.observed.append((self.encoder.encode(cfg), cfg, result))
+        self.model = None
+
+    def on_warm_start(self, results):
+        """pre-train the model on the results of earlier tuning runs"""
+        if self.encoder is None:
+            self.encoder = ConfigurationEncoder(self.manipulator)
+        for result in results:
+            cfg = result.configuration.data
+            self.observed.append((self.encoder.encode(cfg), cfg, result))
+        self.model = None
+
+    def desired_configuration(self):
+        """
+        a random configuration until there are initial_samples results, then
+        the candidate with the highest expected improvement
+        """
+        if self.encoder is None:
+            self.encoder = ConfigurationEncoder(self.manipulator)
+        if (len(self.observed) < self.initial_samples or
+                len(self.encoder) == 0):
+            return self.manipulator.random()
+
+        try:
+            model, train = self.fit()
+        except numpy.linalg.LinAlgError:
+            log.warning('%s: surrogate fit failed, testing a random '
+                        'configuration', self.name)
+            return self.manipulator.random()
+
+        cfgs = self.candidate_configurations(train)
+        if getattr(self.manipulator, 'constraints', None):
+            feasible = self.manipulator.feasible(cfgs)
+            if feasible.any():
+                cfgs = [cfg for cfg, ok in zip(cfgs, feasible) if ok]
+        x = self.encoder.encode_all(cfgs)
+        mu, sigma = model.predict(x)
+        ei = expected_improvement(mu, sigma, numpy.min(self.model.y), self.xi)
+        cfg = cfgs[int(numpy.argmax(ei))]
+
+        self.pending[self.manipulator.hash_config(cfg)] = self.encoder.encode(cfg)
+        while len(self.pending) > max(1, self.initial_samples):
+            # abandoned requests (e.g. duplicates) never get results
+            self.pending.popitem(last=False)
+        return cfg
+
+    def fit(self):
+        """
+        the model of the best max_points results (refit only when new results
+        arrive) conditioned on the pending configurations, and the
+        configurations it was fit to in order of rank
+        """
+        if self.model is None:
+            ranks = rank_targets(self.driver.objective,
+                                 [result for _, _, result in self.observed])
+            order = numpy.argsort(ranks, kind='stable')[:self.max_points]
+            x = numpy.array([self.observed[i][0] for i in order])
+            self.model = GaussianProcess().fit(x, ranks[order])
+            self.train = [self.observed[i][1] for i in order]
+        if not self.pending:
+            return self.model, self.train
+
+        pending = numpy.array(list(self.pending.values()))
+        believed, _ = self.model.predict(pending)
+        model = GaussianProcess().fit(numpy.vstack((self.model.x, pending)),
+                                      numpy.concatenate((self.model.y, believed)))
+        return model, self.train
+
+    def candidate_configurations(self, train):
+        """random configurations and mutations of the best of train"""
+        n_random = self.candidates // 2
+        cfgs = [self.manipulator.random() for _ in range(n_random)]
+        parents = train[:5]
+        for i in range(self.candidates - n_random):
+            cfg = self.manipulator.copy(parents[i % len(parents)])
+            self.mutate(cfg, sigma=0.05 + 0.2 * random.random())
+            cfgs.append(cfg)
+        return cfgs
+
+    def mutate(self, cfg, sigma):
+        """mutate about mutation_rate of the parameters of cfg in place"""
+        vector_space = self.manipulator.vector_space()
+        if vector_space is not None:
+            params = vector_space.other_params
+            if len(vector_space):
+                rng = _numpy_random()
+                mask = rng.random(len(vector_space)) < self.mutation_rate
+                mask[rng.integers(len(vector_space))] = True
+                vector_space.normal_mutation(cfg, sigma, mask)
+        else:
+            params = self.manipulator.parameters(cfg)
+        inactive = set(p.name for p in params) - set(
+            p.name for p in self.manipulator.active_parameters(cfg))
+        for param in params:
+            if param.name in inactive:
+                continue
+            if random.random() < self.mutation_rate:
+                if param.is_primitive():
+                    param.op1_normal_mutation(cfg, sigma)
+                else:
+                    param.op1_randomize(cfg)
+
+
+register(BayesianOptimization())
@@ -46,7 +46,9 @@ class BinaryGA(SequentialSearchTechnique):
             param.copy_value(other_parent, cfg)
 
         # some mutation
-        for param in random.sample(params, k=self.mutate_count):
+        params = self.manipulator.active_parameters(cfg)
+        for param in random.sample(params, k=min(self.mutate_count,
+                                                 len(params))):
             param.op1_randomize(cfg)
 
         # submit it for testing
@@ -10,6 +10,7 @@ from builtins import range
 
 from past.utils import old_div
 
+from .manipulator import _numpy_random
 from .technique import SearchTechnique
 from .technique import register
 
@@ -33,6 +34,8 @@ class DifferentialEvolution(SearchTechnique):
     based on http://cci.lbl.gov/cctbx_sources/scitbx/differential_evolution.py
     """
 
+    batch_requests = True
+
     def __init__(self,
                  population_size=30,
                  cr=0.9,  # crossover rate
@@ -104,6 +107,13 @@ class DifferentialEvolution(SearchTechnique):
             oldest_pop_member.config)
         return oldest_pop_member.candidate_replacement
 
+    def desired_configurations(self, count):
+        """
+        the unsubmitted initial population, then replacement candidates for
+        the oldest members without one
+        """
+        return self.next_configurations(count)
+
     def create_new_configuration(self, parent_pop_member):
         cfg = self.manipulator.copy(parent_pop_member.config.data)
         cfg_params = self.manipulator.proxy(cfg)
@@ -121,6 +131,11 @@ class DifferentialEvolution(SearchTechnique):
 
         use_f = old_div(random.random(), 2.0) + 0.5
 
+        vector_space = self.manipulator.vector_space()
+        if vector_space is not None:
+            self.vector_crossover(vector_space, cfg, x1, x2, x3, use_f)
+            return cfg
+
         params = self.manipulator.param_names(cfg, x1, x2, x3)
         random.shuffle(params)
         for i, k in enumerate(params):
@@ -130,6 +145,23 @@ class DifferentialEvolution(SearchTechnique):
 
         return cfg
 
+    def vector_crossover(self, vector_space, cfg, x1, x2, x3, use_f):
+        """
+        create_new_configuration() for the numeric parameters in one step,
+        other parameters are crossed over one at a time
+        """
+        params = vector_space.params + vector_space.other_params
+        rng = _numpy_random()
+        cross = rng.random(len(params)) < self.cr
+        cross[rng.permutation(len(params))[:self.n_cross]] = True
+        vector_space.set_unit(cfg,
+                              vector_space.linear(1.0, x1, use_f, x2, -use_f, x3),
+                              cross[:len(vector_space)])
+        for param, crossed in zip(vector_space.other_params,
+                                  cross[len(vector_space):]):
+            if crossed:
+                param.op4_set_linear(cfg, x1, x2, x3, 1.0, use_f, -use_f)
+
     def handle_requested_result(self, result):
         """called when new results are added"""
         for p in self.population:
@@ -7,16 +7,21 @@ import os
 import sys
 from builtins import object
 from builtins import range
+from collections import OrderedDict
 from datetime import datetime
+from functools import cmp_to_key
 
 from opentuner.driverbase import DriverBase
 from opentuner.resultsdb.models import BanditInfo
 from opentuner.resultsdb.models import BanditSubTechnique
 from opentuner.resultsdb.models import Configuration
+from opentuner.resultsdb.models import ConfigurationSchema
 from opentuner.resultsdb.models import DesiredResult
 from opentuner.resultsdb.models import Result
+from opentuner.resultsdb.models import TuningRun
 from opentuner.search import plugin
 from opentuner.search import technique
+from opentuner.search.prescreen import PreScreen
 from opentuner.search.bandittechniques import AUCBanditMetaTechnique
 
 log = logging.getLogger(__name__)
@@ -30,16 +35,103 @@ argparser.add_argument('--parallelism', type=int, default=4,
                        help='how many tests to support at once')
 argparser.add_argument('--pipelining', type=int, default=0,
                        help='how long a delay (in generations) before results are available')
+argparser.add_argument('--async-measurement', action='store_true',
+                       help='run tests in a worker pool and request a new test '
+                            'as soon as any test finishes, rather than in '
+                            'generations (--parallelism bounds tests in flight)')
 argparser.add_argument('--bail-threshold', type=int, default=500,
                        help='abort if no requests have been made in X generations')
 argparser.add_argument('--no-dups', action='store_true',
                        help='don\'t print out warnings for duplicate requests')
+argparser.add_argument('--configuration-cache-size', type=int, default=10000,
+                       help='how many Configurations to keep in the hash cache')
 argparser.add_argument('--seed-configuration', action='append', default=[],
                        metavar='FILENAME', help="""
                            Start search at a given configuration.  Can be
                            specified multiple times.  Configurations are loaded
                            with ConfigurationManipulator.load_from_file()
                            and file format is detected from extension.""")
+argparser.add_argument('--legacy-config-hash', action='store_true',
+                       help='hash configurations as earlier versions did, to '
+                            'match Configurations in an existing database')
+argparser.add_argument('--no-config-packing', action='store_true',
+                       help='store Configurations as pickles rather than '
+                            'packed against the manipulator\'s parameters')
+argparser.add_argument('--warm-start', type=int, default=0, metavar='N',
+                       help='seed the search with the N best configurations '
+                            'of earlier tuning runs of this program version on '
+                            'this machine class, and train model-based '
+                            'techniques on their results')
+argparser.add_argument('--warm-start-history', type=int, default=500,
+                       metavar='N',
+                       help='how many recent results of earlier tuning runs '
+                            '--warm-start hands to techniques')
+
+
+class ConfigurationCache(object):
+    """
+    bounded LRU map from configuration hash to resultsdb.models.Configuration
+    for a single program, avoids the flush() and SELECT in Configuration.get()
+    for configurations requested repeatedly
+    """
+
+    def __init__(self, session, program, max_size=10000, schema=None):
+        self.session = session
+        self.program = program
+        self.schema = schema
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, hashv, data):
+        """get (or create) the Configuration with the given hash"""
+        config = self.cache.get(hashv)
+        if config is not None:
+            self.cache.move_to_end(hashv)
+            self.hits += 1
+            return config
+        self.misses += 1
+        config = Configuration.get(self.session, self.program, hashv, data,
+                                   self.schema)
+        self.cache[hashv] = config
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        return config
+
+    def get_many(self, items):
+        """get() for a list of (hash, data) pairs"""
+        configs = [None] * len(items)
+        missing = OrderedDict()  # hash -> (data, [indices])
+        for i, (hashv, data) in enumerate(items):
+            config = self.cache.get(hashv)
+            if config is not None:
+                self.cache.move_to_end(hashv)
+                self.hits += 1
+                configs[i] = config
+            elif hashv in missing:
+                missing[hashv][1].append(i)
+            else:
+                missing[hashv] = (data, [i])
+        if missing:
+            self.misses += len(missing)
+            new_configs = Configuration.get_many(
+                self.session, self.program,
+                [(hashv, data) for hashv, (data, _) in missing.items()],
+                self.schema)
+            for (hashv, (_, indices)), config in zip(missing.items(),
+                                                     new_configs):
+                for i in indices:
+                    configs[i] = config
+                self.cache[hashv] = config
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+        return configs
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.cache)}
 
 
 class SearchDriver(DriverBase):
@@ -53,14 +145,31 @@ class SearchDriver(DriverBase):
         if extra_seeds is None:
             extra_seeds = []
         self.manipulator = manipulator
+        if self.args.legacy_config_hash:
+            manipulator.legacy_hash = True
         self.wait_for_results = self.tuning_run_main.results_wait
         self.commit = self.tuning_run_main.commit
         self.extra_criteria = extra_criteria
 
         self.generation = 0
         self.test_count = 0
+        # configurations violating the manipulator's constraints
+        self.infeasible_count = 0
+        self.unrepaired_count = 0  # of those still infeasible after repair
         self.plugins = plugin.get_enabled(self.args)
+        self.prescreen = None
+        if self.args.prescreen:
+            self.prescreen = PreScreen(self.args)
+            self.plugins.append(self.prescreen)
         self.pending_result_callbacks = list()  # (DesiredResult, function) tuples
+        schema = None
+        if (not self.args.no_config_packing and
+                hasattr(manipulator, 'packing_schema')):
+            schema = ConfigurationSchema.get(self.session, self.program,
+                                             manipulator.packing_schema())
+        self.configuration_cache = ConfigurationCache(
+            self.session, self.program, self.args.configuration_cache_size,
+            schema)
         # deepcopy is required to have multiple tuning runs in a single process
         if self.args.list_techniques:
             techniques, generators = technique.all_techniques()
@@ -87,7 +196,11 @@ class SearchDriver(DriverBase):
 
         self.objective.set_driver(self)
         self.pending_config_ids = set()
+        # Configuration.hash -> first DesiredResult requesting it this tuning run
+        self.requested_configs = dict()
         self.best_result = None
+        # non-dominated results, for objectives that trade off several values
+        self.pareto_front = self.objective.pareto_front()
         self.new_results = []
 
         for t in self.plugins:
@@ -147,9 +260,10 @@ class SearchDriver(DriverBase):
             if dr.result is not None:
                 callback(dr.result)
                 continue
-            elif self.generation - dr.generation > self.args.pipelining:
+            elif (not self.args.async_measurement and
+                  self.generation - dr.generation > self.args.pipelining):
                 # see if we can find a result
-                results = self.results_query(config=dr.configuration).all()
+                results = self.results_for(dr.configuration)
                 log.warning("Result callback %d (requestor=%s) pending for "
                             "%d generations %d results available",
                             dr.id, dr.requestor, self.generation - dr.generation,
@@ -162,64 +276,81 @@ class SearchDriver(DriverBase):
             self.pending_result_callbacks.append((dr, callback))
 
     def has_results(self, config):
-        return self.results_query(config=config).count() > 0
-
-    def run_generation_techniques(self):
+        return self.result_index.has_results(config)
+
+    def requests_wanted(self):
+        """how many tests run_generation_techniques() should request"""
+        if self.args.async_measurement:
+            return max(0, self.args.parallelism -
+                       self.tuning_run_main.tests_in_flight())
+        return self.args.parallelism
+
+    def run_generation_techniques(self, count=None):
+        if count is None:
+            count = self.args.parallelism
         tests_this_generation = 0
         self.plugin_proxy.before_techniques()
-        for z in range(self.args.parallelism):
-            if self.seed_cfgs:
-                config = self.get_configuration(self.seed_cfgs.pop())
-                dr = DesiredResult(configuration=config,
-                                   requestor='seed',
-                                   generation=self.generation,
-                                   request_date=datetime.now(),
-                                   tuning_run=self.tuning_run)
-            else:
-                dr = self.root_technique.desired_result()
-            if dr is None or dr is False:
-                log.debug("no desired result, skipping to testing phase")
-                break
-            self.session.flush()  # populate configuration_id
-            duplicates = (self.session.query(DesiredResult)
-                          .filter_by(tuning_run=self.tuning_run,
-                                     configuration_id=dr.configuration_id)
-                          .filter(DesiredResult.id != dr.id)
-                          .order_by(DesiredResult.request_date)
-                          .limit(1).all())
-            self.session.add(dr)
-            if len(duplicates):
+        seeds = [self.seed_cfgs.pop()
+                 for z in range(min(count, len(self.seed_cfgs)))]
+        drs = [DesiredResult(configuration=config,
+                             requestor='seed',
+                             generation=self.generation,
+                             request_date=datetime.now())
+               for config in self.get_configurations(seeds)]
+        if len(drs) < count:
+            drs.extend(self.root_technique.desired_results(count - len(drs))
+                       or [])
+        if len(drs) < count:
+            log.debug("no desired result, skipping to testing phase")
+        self.session.add_all(drs)
+        # set only now, the tuning_run.desired_results backref would make
+        # flushes while techniques run warn about drs not yet in the session
+        for dr in drs:
+            dr.tuning_run = self.tuning_run
+        requested = []
+        for dr in drs:
+            duplicate = self.requested_configs.get(dr.configuration.hash)
+            if duplicate is not None:
                 if not self.args.no_dups:
                     log.warning("duplicate configuration request #%d %s/%s %s",
                                 self.test_count,
                                 dr.requestor,
-                                duplicates[0].requestor,
-                                'OLD' if duplicates[0].result else 'PENDING')
-                self.session.flush()
-                desired_result_id = dr.id
+                                duplicate.requestor,
+                                'OLD' if duplicate.result else 'PENDING')
 
-                def callback(result):
-                    dr = self.session.query(DesiredResult).get(desired_result_id)
+                def callback(result, dr=dr):
                     dr.result = result
                     dr.state = 'COMPLETE'
                     dr.start_date = datetime.now()
 
-                self.register_result_callback(duplicates[0], callback)
+                self.register_result_callback(duplicate, callback)
             else:
-                log.debug("desired result id=%d, cfg=%d", dr.id, dr.configuration_id)
+                log.debug("desired result requestor=%s, cfg=%s",
+                          dr.requestor, dr.configuration.hash)
                 dr.state = 'REQUESTED'
+                self.requested_configs[dr.configuration.hash] = dr
+                if dr.requestor != 'seed':
+                    requested.append(dr)
             self.test_count += 1
             tests_this_generation += 1
+        if self.prescreen is not None:
+            self.prescreen.screen(requested)
+        # insert the whole generation at once
+        self.session.flush()
         self.plugin_proxy.after_techniques()
         return tests_this_generation
 
     def process_new_results(self):
         self.new_results = []
-        for result in (self.results_query()
-                .filter_by(was_new_best=None)
-                .order_by(Result.collection_date)):
+        for result in self.result_index.pop_new_results():
+            if result.was_new_best is not None:
+                continue
             self.plugin_proxy.on_result(result)
             self.new_results.append(result)
+            if (self.pareto_front is not None and result.state == 'OK' and
+                    self.objective.is_acceptable(result) and
+                    self.pareto_front.add(result)):
+                self.plugin_proxy.on_pareto_front_change(self.pareto_front)
             if self.best_result is None:
                 self.best_result = result
                 result.was_new_best = True
@@ -257,16 +388,114 @@ class SearchDriver(DriverBase):
 
         return PluginProxy()
 
+    def prune_infeasible(self, cfgs):
+        """
+        repair (or resample) the configuration dicts in cfgs that violate the
+        manipulator's constraints in place, before they are hashed
+        """
+        if not getattr(self.manipulator, 'constraints', None) or not cfgs:
+            return
+        for cfg, ok in zip(cfgs, self.manipulator.feasible(cfgs)):
+            if not ok:
+                self.infeasible_count += 1
+                if not self.manipulator.repair(cfg):
+                    self.unrepaired_count += 1
+                    log.warning('no configuration satisfying the constraints '
+                                'found, testing an infeasible one')
+
+    def log_pruned(self):
+        if self.infeasible_count:
+            log.info('constraints: pruned %d infeasible configurations before '
+                     'testing, %d could not be repaired',
+                     self.infeasible_count, self.unrepaired_count)
+
     def get_configuration(self, cfg):
         """called by SearchTechniques to create Configuration objects"""
+        if type(cfg) is Configuration:
+            # already normalized and hashed
+            return cfg
+        self.prune_infeasible([cfg])
         self.manipulator.normalize(cfg)
         hashv = self.manipulator.hash_config(cfg)
-        config = Configuration.get(self.session, self.program, hashv, cfg)
-        return config
+        return self.configuration_cache.get(hashv, cfg)
+
+    def get_configurations(self, cfgs):
+        """
+        get_configuration() for a list of cfgs, new Configurations are looked
+        up in the database together
+        """
+        configs = list(cfgs)
+        self.prune_infeasible([cfg for cfg in configs
+                               if type(cfg) is not Configuration])
+        items = []
+        indices = []
+        for i, cfg in enumerate(configs):
+            if type(cfg) is not Configuration:
+                self.manipulator.normalize(cfg)
+                items.append((self.manipulator.hash_config(cfg), cfg))
+                indices.append(i)
+        for i, config in zip(indices, self.configuration_cache.get_many(items)):
+            configs[i] = config
+        return configs
+
+    def historical_runs(self, limit=100):
+        """
+        ids of the limit most recent other tuning runs of this program version
+        on this machine class
+        """
+        q = (self.session.query(TuningRun.id)
+             .filter_by(program_version_id=self.tuning_run.program_version_id,
+                        machine_class_id=self.tuning_run.machine_class_id)
+             .filter(TuningRun.id != self.tuning_run.id)
+             .order_by(TuningRun.id.desc())
+             .limit(limit))
+        return [run_id for run_id, in q]
+
+    def warm_start(self):
+        """
+        queue the --warm-start best configurations of earlier tuning runs as
+        seeds (after any --seed-configuration) and hand their recent results
+        to the plugins and techniques (see SearchPlugin.on_warm_start())
+        """
+        self.session.flush()
+        runs = self.historical_runs()
+        if not runs:
+            log.info('warm start: no earlier tuning runs found')
+            return
+        q = (self.session.query(Result)
+             .filter(Result.tuning_run_id.in_(runs))
+             .filter_by(was_new_best=True, state='OK'))
+        best = sorted(self.objective.filter_acceptable(q),
+                      key=cmp_to_key(self.objective.compare))
+        seeds = []
+        hashes = set()
+        for result in best:
+            if len(seeds) >= self.args.warm_start:
+                break
+            if result.configuration.hash not in hashes:
+                hashes.add(result.configuration.hash)
+                seeds.append(self.manipulator.copy(result.configuration.data))
+        # seed_cfgs are popped from the end, best first
+        self.seed_cfgs[:0] = reversed(seeds)
+
+        history = []
+        if self.args.warm_start_history > 0:
+            history = (self.session.query(Result)
+                       .filter(Result.tuning_run_id.in_(runs))
+                       .filter_by(state='OK')
+                       .order_by(Result.id.desc())
+                       .limit(self.args.warm_start_history)
+                       .all())
+            history.reverse()
+            self.plugin_proxy.on_warm_start(history)
+        log.info('warm start from %d earlier tuning runs: %d seeds, '
+                 '%d results', len(runs), len(seeds), len(history))
 
     def main(self):
         self.plugin_proxy.set_driver(self)
         self.plugin_proxy.before_main()
+        if self.args.warm_start:
+            self.warm_start()
 
         no_tests_generations = 0
 
@@ -276,8 +505,10 @@ class SearchDriver(DriverBase):
             self.generation += 1
 
         while not self.convergence_criteria():
-            if self.run_generation_techniques() > 0:
+            if self.run_generation_techniques(self.requests_wanted()) > 0:
                 no_tests_generations = 0
+            elif self.args.async_measurement and self.tuning_run_main.tests_in_flight():
+                pass  # workers are busy, wait for one to finish
             elif no_tests_generations <= self.args.bail_threshold:
                 no_tests_generations += 1
             else:
@@ -285,11 +516,20 @@ class SearchDriver(DriverBase):
             self.run_generation_results(offset=-self.args.pipelining)
             self.generation += 1
 
+        if self.args.async_measurement:
+            # collect the tests still running
+            while self.tuning_run_main.tests_in_flight():
+                self.run_generation_results()
+
         self.plugin_proxy.after_main()
+        self.log_pruned()
+        log.debug("configuration cache %s", self.configuration_cache.stats())
 
     def external_main_begin(self):
         self.plugin_proxy.set_driver(self)
         self.plugin_proxy.before_main()
+        if self.args.warm_start:
+            self.warm_start()
 
     def external_main_generation(self):
         if self.generation > 0:
@@ -301,3 +541,4 @@ class SearchDriver(DriverBase):
 
     def external_main_end(self):
         self.plugin_proxy.after_main()
+        self.log_pruned()
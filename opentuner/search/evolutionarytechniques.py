@@ -55,7 +55,7 @@ class EvolutionaryTechnique(SearchTechnique):
         """
         mutate cfg in place
         """
-        params = self.manipulator.parameters(cfg)
+        params = self.manipulator.active_parameters(cfg)
         random.shuffle(params)
         for param in params[:self.must_mutate_count]:
             self.mutate_param(cfg, param)
@@ -89,11 +89,14 @@ class EvolutionaryTechnique(SearchTechnique):
 class GreedySelectionMixin(object):
     """
     EvolutionaryTechnique mixin for greedily selecting the best known
-    configuration
+    configuration, or a member of the Pareto front in a multi-objective search
     """
 
     def select(self):
         """return a single random parent configuration"""
+        front = getattr(self.driver, 'pareto_front', None)
+        if front:
+            return front.select().configuration.data
         if (self.driver.best_result is not None and
                 self.driver.best_result.state == 'OK'):
             return self.driver.best_result.configuration.data
@@ -54,7 +54,7 @@ class GlobalEvolutionaryTechnique(SearchTechnique):
         """
         mutate cfg in place
         """
-        params = self.manipulator.parameters(cfg)
+        params = self.manipulator.active_parameters(cfg)
         random.shuffle(params)
         for param in params[:self.must_mutate_count]:
             self.mutate_param(cfg, param)
@@ -8,7 +8,10 @@ import hashlib
 import inspect
 import json
 import logging
+import marshal
 import math
+import numbers
+import operator
 import os
 import pickle
 import random
@@ -62,6 +65,10 @@ class ConfigurationManipulatorBase(with_metaclass(abc.ABCMeta, object)):
         """convert self.parameters() to a dictionary by name"""
         return dict([(p.name, p) for p in self.parameters(config)])
 
+    def active_parameters(self, config):
+        """the parameters that affect config, those worth mutating"""
+        return list(self.parameters(config))
+
     def param_names(self, *args):
         """return union of parameter names in args"""
         return sorted(reduce(set.union,
@@ -109,6 +116,10 @@ class ConfigurationManipulatorBase(with_metaclass(abc.ABCMeta, object)):
     def proxy(self, cfg):
         return ManipulatorProxy(self, cfg)
 
+    def vector_space(self):
+        """a VectorSpace for vectorized operators, or None if not supported"""
+        return None
+
     @abc.abstractmethod
     def random(self):
         """produce a random initial configuration"""
@@ -131,35 +142,228 @@ class ConfigurationManipulator(ConfigurationManipulatorBase):
     configs in a dict-like object
     """
 
-    def __init__(self, params=None, config_type=dict, seed_config=None, **kwargs):
+    # hash configurations as earlier versions did, see hash_config()
+    legacy_hash = False
+
+    def __init__(self, params=None, config_type=dict, seed_config=None,
+                 constraints=None, conditions=None, **kwargs):
         if params is None:
             params = []
         self.params = list(params)
+        self.constraints = list(constraints or [])
+        # parameter name -> Condition under which it is active
+        self.conditions = dict(conditions or {})
         self.config_type = config_type
         self.search_driver = None
         self._seed_config = seed_config
+        self._vector_space = None
+        self._copier = None
+        self._hash_plan = None
+        self._constraint_plan = None
+        self._condition_plan = None
         super(ConfigurationManipulator, self).__init__(**kwargs)
         for p in self.params:
             p.parent = self
 
-    def add_parameter(self, p):
+    def add_parameter(self, p, condition=None):
+        """
+        add p (and its sub-parameters), if a Condition is given p is only
+        active in configurations satisfying it
+        """
         p.set_parent(self)
         self.params.append(p)
-
-        # TODO sub parameters should be recursed on
-        # not currently an issue since no doubly-nested sub-parameters
-        sub_params = p.sub_parameters()
-        for sp in sub_params:
+        self._vector_space = None
+        self._copier = None
+        self._hash_plan = None
+        self._constraint_plan = None
+        self._condition_plan = None
+        if condition is not None:
+            self.conditions[p.name] = condition
+        self.add_sub_parameters(p)
+
+    def add_sub_parameters(self, p):
+        """add the sub-parameters of p, recursively"""
+        for sp in p.sub_parameters():
             sp.set_parent(p)
-        self.params.extend(sub_params)
+            self.params.append(sp)
+            self.add_sub_parameters(sp)
+
+    def add_constraint(self, constraint):
+        """restrict configurations to those satisfying a Constraint"""
+        self.constraints.append(constraint)
+        self._constraint_plan = None
 
     def set_search_driver(self, search_driver):
         self.search_driver = search_driver
 
+    def condition_plan(self):
+        """
+        (conditional, inactive_values) for active_parameters(): (parameter,
+        Condition, parent parameter) for each conditional parameter, parents
+        before their children, and the fixed value each takes while inactive
+        (see inactive_value())
+        """
+        params = dict((p.name, p) for p in self.params)
+        depth = dict()
+
+        def depth_of(name, seen=()):
+            if name not in self.conditions:
+                return 0
+            if name in seen:
+                raise ValueError('cyclic conditions on parameter %r' % name)
+            if name not in depth:
+                parent = self.conditions[name].parent
+                if parent not in params:
+                    raise KeyError('condition on unknown parameter %r' % parent)
+                depth[name] = 1 + depth_of(parent, seen + (name,))
+            return depth[name]
+
+        for name in self.conditions:
+            if name not in params:
+                raise KeyError('condition for unknown parameter %r' % name)
+            p = params[name]
+            if p.parent is not self or (isinstance(name, str) and '/' in name):
+                raise ValueError('only top-level parameters can be conditional, '
+                                 'not %r' % name)
+        names = sorted(self.conditions, key=lambda name: (depth_of(name),
+                                                         repr(name)))
+        return ([(params[name], self.conditions[name],
+                  params[self.conditions[name].parent]) for name in names],
+                dict((name, self.inactive_value(params[name]))
+                     for name in names))
+
+    def inactive_value(self, p):
+        """
+        the value of conditional parameter p while inactive: its value in the
+        seed configuration given to the constructor, or else a fixed legal
+        value (see _fixed_value())
+        """
+        if self._seed_config and p.name in self._seed_config:
+            return _copy_value(self._seed_config[p.name])
+        return _fixed_value(p)
+
+    def inactive_names(self, config):
+        """set of the names of the parameters inactive in config"""
+        if not self.conditions:
+            return set()
+        if getattr(self, '_condition_plan', None) is None:
+            self._condition_plan = self.condition_plan()
+        inactive = set()
+        for p, condition, parent in self._condition_plan[0]:
+            if (parent.name in inactive or
+                    not condition.satisfied(parent.get_value(config))):
+                inactive.add(p.name)
+        return inactive
+
+    def active_parameters(self, config):
+        """the parameters of config whose conditions (if any) hold"""
+        params = self.parameters(config)
+        if not self.conditions:
+            return list(params)
+        inactive = self.inactive_names(config)
+        return [p for p in params if p.name not in inactive]
+
+    def deactivate(self, config):
+        """
+        set the inactive parameters of config to fixed values in place, so
+        configurations differing only in those hash (and store) the same
+        """
+        inactive = self.inactive_names(config)
+        if inactive:
+            values = self._condition_plan[1]
+            for name in inactive:
+                config[name] = _copy_value(values[name])
+
+    def normalize(self, config):
+        """mutate config into canonical form"""
+        super(ConfigurationManipulator, self).normalize(config)
+        if self.conditions:
+            self.deactivate(config)
+
+    def validate(self, config):
+        """is the given config valid (including the constraints)???"""
+        return (super(ConfigurationManipulator, self).validate(config) and
+                (not self.constraints or bool(self.feasible([config])[0])))
+
+    def constraint_plan(self):
+        """
+        (getters, params) for feasible(): (name, parameter, stored directly)
+        for each parameter read by the constraints, and all parameters by name
+        """
+        params = dict((p.name, p) for p in self.params)
+        getters = []
+        for constraint in self.constraints:
+            for name in constraint.names:
+                if name not in params:
+                    raise KeyError('constraint on unknown parameter %r' % name)
+                if name not in [g[0] for g in getters]:
+                    p = params[name]
+                    getters.append((name, p, p.parent is self and
+                                    _stored_directly_anywhere(p)))
+            constraint.prepare(self, params)
+        return getters, params
+
+    def constraint_columns(self, cfgs):
+        """dict from each parameter the constraints read to an array of its values in cfgs"""
+        if getattr(self, '_constraint_plan', None) is None:
+            self._constraint_plan = self.constraint_plan()
+        getters, _ = self._constraint_plan
+        columns = dict()
+        for name, p, direct in getters:
+            if direct:
+                columns[name] = _column([cfg[name] for cfg in cfgs])
+            else:
+                columns[name] = _column([_stored_value(p, cfg)
+                                         for cfg in cfgs])
+        return columns
+
+    def feasible(self, cfgs):
+        """boolean array, True for each of cfgs satisfying all the constraints"""
+        ok = numpy.ones(len(cfgs), dtype=bool)
+        if not self.constraints or not len(cfgs):
+            return ok
+        columns = self.constraint_columns(cfgs)
+        for constraint in self.constraints:
+            ok &= constraint.check(columns)
+        return ok
+
+    def violated_constraints(self, cfg):
+        """the constraints cfg does not satisfy"""
+        if not self.constraints:
+            return []
+        columns = self.constraint_columns([cfg])
+        return [c for c in self.constraints if not c.check(columns)[0]]
+
+    def repair(self, cfg, tries=10):
+        """
+        make cfg satisfy the constraints in place: let each violated
+        constraint repair it (changing as few values as it can), up to tries
+        times, and failing that replace it with the first feasible random
+        configuration, drawn in up to tries batches of 10 * tries (each
+        checked together).  True if cfg is feasible in the end
+        """
+        for _ in range(tries):
+            violated = self.violated_constraints(cfg)
+            if not violated:
+                return True
+            _, params = self._constraint_plan
+            for constraint in violated:
+                constraint.repair(cfg, params)
+        if not self.violated_constraints(cfg):
+            return True
+        for _ in range(tries):
+            candidates = [self.random() for _ in range(10 * tries)]
+            ok = numpy.flatnonzero(self.feasible(candidates))
+            if len(ok):
+                cfg.clear()
+                cfg.update(candidates[ok[0]])
+                return True
+        return False
+
     def seed_config(self):
         """produce a fixed seed configuration"""
         if self._seed_config:
-            cfg = copy.deepcopy(self._seed_config)
+            cfg = self.copy(self._seed_config)
         else:
             cfg = self.config_type()
             for p in self.params:
@@ -167,13 +371,86 @@ class ConfigurationManipulator(ConfigurationManipulatorBase):
                     cfg[p.name] = p.seed_value()
         return cfg
 
+    def copy(self, config):
+        """
+        produce copy of config, values that cannot be mutated in place are
+        shared with config rather than deepcopied
+        """
+        if type(config) is not dict:
+            return copy.deepcopy(config)
+        if getattr(self, '_copier', None) is None:
+            self._copier = self.config_copier()
+        copiers, known = self._copier
+        cfg = dict(config)
+        for name, copy_value in copiers:
+            if name in cfg:
+                cfg[name] = copy_value(cfg[name])
+        if not known.issuperset(cfg):
+            for name in set(cfg) - known:
+                cfg[name] = _copy_value(cfg[name])
+        return cfg
+
+    def config_copier(self):
+        """
+        (copiers, known) for copy(): (name, function) pairs copying the
+        top-level values that are mutable, and the set of the names of all
+        top-level parameters (immutable values are shared, not copied)
+        """
+        immutable = set()
+        copiers = []
+        for p in self.params:
+            if p.parent is not self or (isinstance(p.name, str) and
+                                        '/' in p.name):
+                continue  # stored inside another value
+            if isinstance(p, (NumericParameter, BooleanParameter,
+                              SwitchParameter)):
+                immutable.add(p.name)
+            elif (isinstance(p, EnumParameter) and
+                  all(type(o) in _IMMUTABLE_TYPES for o in p.options)):
+                immutable.add(p.name)
+            elif isinstance(p, PermutationParameter):
+                copiers.append((p.name, _copy_list))
+            else:
+                copiers.append((p.name, _copy_value))
+        known = frozenset(immutable) | frozenset(name for name, _ in copiers)
+        return copiers, known
+
+    def vector_space(self):
+        """VectorSpace over the numeric parameters, None if there are none"""
+        if getattr(self, '_vector_space', None) is None:
+            self._vector_space = VectorSpace(self)
+        if len(self._vector_space) == 0:
+            return None
+        return self._vector_space
+
     def random(self):
         """produce a random configuration"""
         cfg = self.seed_config()
-        for p in self.parameters(cfg):
-            p.op1_randomize(cfg)
+        vector_space = self.vector_space()
+        if vector_space is None:
+            for p in self.parameters(cfg):
+                p.op1_randomize(cfg)
+        else:
+            vector_space.randomize(cfg)
+            for p in vector_space.other_params:
+                p.op1_randomize(cfg)
+        if self.conditions:
+            self.deactivate(cfg)
         return cfg
 
+    def linear_config(self, a, cfg_a, b, cfg_b, c, cfg_c):
+        """return a configuration that is a linear combination of 3 other configs"""
+        vector_space = self.vector_space()
+        if vector_space is None:
+            return super(ConfigurationManipulator, self).linear_config(
+                a, cfg_a, b, cfg_b, c, cfg_c)
+        dst = self.copy(cfg_a)
+        vector_space.set_unit(dst, vector_space.linear(a, cfg_a, b, cfg_b,
+                                                       c, cfg_c))
+        for p in vector_space.other_params:
+            p.op4_set_linear(dst, cfg_a, cfg_b, cfg_c, a, b, c)
+        return dst
+
     def parameters(self, config):
         """return a list of Parameter objects"""
         if type(config) is not self.config_type:
@@ -231,7 +508,75 @@ class ConfigurationManipulator(ConfigurationManipulatorBase):
         return param_info_to_json(self, params)
 
     def hash_config(self, config):
-        """produce unique hash value for the given config"""
+        """
+        produce unique hash value for the given config
+
+        a single sha256 over the stored parameter values, in a precomputed
+        order, encoded with marshal (or repr() for other types).  Set
+        legacy_hash (--legacy-config-hash) to match hashes stored by earlier
+        versions, see legacy_hash_config()
+        """
+        if self.legacy_hash:
+            return self.legacy_hash_config(config)
+        self.parameters(config)  # type check
+        if getattr(self, '_hash_plan', None) is None:
+            self._hash_plan = self.config_hash_plan()
+        prefix, normalizers, get_direct, indirect, arrays = self._hash_plan
+        for p in normalizers:
+            p.normalize(config)
+        if self.conditions:
+            self.deactivate(config)
+        values = [get_direct(config) if get_direct is not None else ()]
+        values.extend(p._get(config) for p in indirect)
+        for name in arrays:
+            value = config[name]
+            if type(value) is numpy.ndarray:
+                # repr() elides the middle of large arrays
+                value = (value.dtype.str, value.shape, value.tobytes())
+            values.append(value)
+        m = prefix.copy()
+        try:
+            # version 2 has binary floats and, unlike later versions, no
+            # back-references that depend on object identity
+            m.update(marshal.dumps(values, 2))
+        except ValueError:
+            m.update(b'repr|' + repr(values).encode('utf-8'))
+        return m.hexdigest()
+
+    def config_hash_plan(self):
+        """
+        (prefix, normalizers, get_direct, indirect, arrays) for hash_config():
+        a sha256 of the parameter names, parameters overriding normalize(),
+        an itemgetter for values stored at top-level keys, the parameters
+        read with _get(), and the names of Array parameters
+        """
+        params = list(self.params)
+        try:
+            params.sort(key=lambda x: x.name)
+        except TypeError:
+            params.sort(key=lambda x: repr(x.name))
+        normalizers = [p for p in params
+                       if type(p).normalize is not Parameter.normalize]
+        direct = []
+        indirect = []
+        arrays = []
+        for p in params:
+            if isinstance(p, Array) and p.parent is self:
+                arrays.append(p.name)
+            elif ((not isinstance(p.name, str) or '/' not in p.name) and
+                  type(p)._get is Parameter._get and
+                  type(p)._from_storage_type is Parameter._from_storage_type):
+                direct.append(p.name)
+            else:
+                indirect.append(p)
+        get_direct = operator.itemgetter(*direct) if direct else None
+        prefix = hashlib.sha256(b'opentuner-config-hash-2|')
+        prefix.update(repr([direct, [p.name for p in indirect],
+                            arrays]).encode('utf-8'))
+        return prefix, normalizers, get_direct, indirect, arrays
+
+    def legacy_hash_config(self, config):
+        """hash_config() as computed by earlier versions"""
         m = hashlib.sha256()
         params = list(self.parameters(config))
         params.sort(key = lambda x: x.name)
@@ -242,9 +587,70 @@ class ConfigurationManipulator(ConfigurationManipulatorBase):
             m.update(b"|")
         return m.hexdigest()
 
+    def packing_schema(self):
+        """
+        (entries, reference) describing the top-level values of configurations
+        for compact storage, see opentuner.resultsdb.packing
+        """
+        reference = self.seed_config()
+        if self.conditions:
+            # inactive parameters always take these values, never store them
+            if getattr(self, '_condition_plan', None) is None:
+                self._condition_plan = self.condition_plan()
+            reference.update(self._condition_plan[1])
+        entries = []
+        for p in self.params:
+            if p.parent is not self or p.name not in reference:
+                continue  # stored inside another parameter's value
+            value = reference[p.name]
+            if isinstance(p, PermutationParameter):
+                entries.append((p.name, 'p', list(p._items)))
+            elif isinstance(p, EnumParameter):
+                entries.append((p.name, 'e', list(p.options)))
+            elif isinstance(p, SwitchParameter):
+                entries.append((p.name, 'e', list(range(p.option_count))))
+            elif isinstance(p, BooleanParameter):
+                entries.append((p.name, 'e', [False, True]))
+            elif type(value) is int:
+                entries.append((p.name, 'i', None))
+            elif type(value) is float:
+                entries.append((p.name, 'f', None))
+            else:
+                entries.append((p.name, 'o', None))
+        return entries, reference
+
     def search_space_size(self):
-        """estimate the size of the search space, not precise"""
-        return reduce(lambda a, b: a * b, [x.search_space_size() for x in self.params])
+        """
+        estimate the size of the search space, not precise.  The parameters
+        conditional on a value of a parameter count only for that value
+        """
+        if not self.conditions:
+            return reduce(lambda a, b: a * b,
+                          [x.search_space_size() for x in self.params])
+        children = collections.defaultdict(list)
+        for name, condition in self.conditions.items():
+            children[condition.parent].append((name, condition))
+        params = dict((p.name, p) for p in self.params)
+
+        def subtree_size(p):
+            size = p.search_space_size()
+            values = []  # values of p that activate children
+            for _, condition in children[p.name]:
+                values.extend(v for v in condition.values if v not in values)
+            if not values:
+                return size
+            total = max(0, size - len(values))
+            for value in values:
+                branch = 1
+                for name, condition in children[p.name]:
+                    if condition.satisfied(value):
+                        branch *= subtree_size(params[name])
+                total += branch
+            return total
+
+        return reduce(lambda a, b: a * b,
+                      [subtree_size(x) for x in self.params
+                       if x.name not in self.conditions], 1)
 
     def difference(self, cfg1, cfg2):
         cfg = self.copy(cfg1)
@@ -272,6 +678,53 @@ class ConfigurationManipulator(ConfigurationManipulatorBase):
             getattr(param, sv_map[pname])(cfg, *args[pname], **kwargs[pname])
 
 
+_IMMUTABLE_TYPES = frozenset([int, float, bool, str, bytes, complex,
+                              type(None), numpy.int64, numpy.float64,
+                              numpy.bool_])
+
+
+def _copy_value(value):
+    """copy a configuration value, sharing immutable and copying numpy arrays"""
+    if type(value) in _IMMUTABLE_TYPES:
+        return value
+    if type(value) is numpy.ndarray and value.dtype != object:
+        return value.copy()
+    return copy.deepcopy(value)
+
+
+def _fixed_value(p):
+    """
+    a legal value of parameter p that is the same in every process (unlike
+    seed_value() of some parameters), built from minimums and first options
+    """
+    if isinstance(p, BooleanParameter):
+        return False
+    if isinstance(p, SwitchParameter):
+        return 0
+    if isinstance(p, EnumParameter):
+        return p.options[0]
+    if isinstance(p, ScheduleParameter):
+        return p.topologically_sorted(list(p._items))
+    if isinstance(p, BooleanArray):
+        return numpy.zeros((1, p.size), dtype=bool)
+    if isinstance(p, FloatArray):
+        return numpy.full((1, p.size), p.fmin, dtype=float)
+    if isinstance(p, ParameterArray):
+        return [_fixed_value(sub) for sub in p.sub_params]
+    if isinstance(p, SelectorParameter):
+        return {'order': _fixed_value(p.order_param),
+                'offsets': [_fixed_value(co) for co in p.offset_params]}
+    # minimum of numeric parameters, items of permutations
+    return p.seed_value()
+
+
+def _copy_list(value):
+    """copy a PermutationParameter value, items are never mutated"""
+    if type(value) is list:
+        return list(value)
+    return _copy_value(value)
+
+
 class Parameter(with_metaclass(abc.ABCMeta, object)):
     """
     abstract base class for parameters in a ConfigurationManipulator
@@ -771,7 +1224,13 @@ class ScaledNumericParameter(NumericParameter):
         return v
 
     def set_value(self, config, value):
-        NumericParameter.set_value(self, config, self._unscale(value))
+        # _unscale(_scale(x)) may round to just outside the legal range
+        value = self._unscale(value)
+        if value > self.max_value:
+            value = self.max_value
+        elif value < self.min_value:
+            value = self.min_value
+        NumericParameter.set_value(self, config, value)
 
     def get_value(self, config):
         return self._scale(NumericParameter.get_value(self, config))
@@ -838,6 +1297,205 @@ class PowerOfTwoParameter(ScaledNumericParameter, IntegerParameter):
         return int(math.log(self.max_value, 2) - math.log(self.min_value, 2)) + 1
 
 
+##################
+
+class VectorSpace(object):
+    """
+    array view of the top-level NumericParameters of a ConfigurationManipulator
+
+    configurations stay dicts, the remaining parameters (complex, nested, or
+    with custom storage) act as side storage and are left to their own
+    operators.  Vectors are numpy arrays in self.params order, either in
+    unit scale (as get_unit_value) or value scale (as get_value)
+    """
+
+    def __init__(self, manipulator):
+        self.manipulator = manipulator
+        self.params = []
+        self.other_params = []
+        for p in manipulator.params:
+            if (isinstance(p, NumericParameter) and p.parent is manipulator and
+                    (not isinstance(p.name, str) or '/' not in p.name) and
+                    type(p).legal_range in _STATIC_RANGES):
+                self.params.append(p)
+            else:
+                self.other_params.append(p)
+        ranges = [p.legal_range(None) for p in self.params]
+        self.low = numpy.array([low for low, _ in ranges], dtype=float)
+        self.high = numpy.array([high for _, high in ranges], dtype=float)
+        self.integer = numpy.array([p.is_integer_type() for p in self.params],
+                                   dtype=bool)
+        # get_unit_value() widens integer ranges to account for rounding
+        self.unit_low = self.low - 0.4999 * self.integer
+        self.span = (self.high + 0.4999 * self.integer) - self.unit_low
+        self.span[self.span < 0] = 0.0
+        # values stored as-is in cfg[name] are read and written in bulk
+        direct = numpy.array([_stored_directly(p) for p in self.params],
+                             dtype=bool)
+        self.direct = numpy.flatnonzero(direct)
+        self.direct_names = [self.params[i].name for i in self.direct]
+        self.direct_int = numpy.flatnonzero(direct & self.integer)
+        self.direct_int_names = [self.params[i].name for i in self.direct_int]
+        self.direct_float = numpy.flatnonzero(direct & ~self.integer)
+        self.direct_float_names = [self.params[i].name
+                                   for i in self.direct_float]
+        self.indirect = [(i, self.params[i])
+                         for i in numpy.flatnonzero(~direct).tolist()]
+        conditions = getattr(manipulator, 'conditions', None) or {}
+        self.conditional = [(i, p.name) for i, p in enumerate(self.params)
+                            if p.name in conditions]
+
+    def __len__(self):
+        return len(self.params)
+
+    def active(self, cfg):
+        """boolean array of the parameters active in cfg, None if all always are"""
+        if not self.conditional:
+            return None
+        inactive = self.manipulator.inactive_names(cfg)
+        mask = numpy.ones(len(self.params), dtype=bool)
+        for i, name in self.conditional:
+            if name in inactive:
+                mask[i] = False
+        return mask
+
+    def values(self, cfg):
+        """value scale vector of cfg"""
+        values = numpy.empty(len(self.params))
+        values[self.direct] = [cfg[name] for name in self.direct_names]
+        for i, p in self.indirect:
+            values[i] = p.get_value(cfg)
+        return values
+
+    def set_values(self, cfg, values, mask=None):
+        """
+        assign a value scale vector to cfg, rounding integers and clipping to
+        the legal ranges.  If given, only entries where the boolean array
+        mask is set are assigned
+        """
+        values = numpy.where(self.integer, numpy.round(values), values)
+        values = numpy.clip(values, self.low, self.high)
+        direct_int, int_names = self.direct_int, self.direct_int_names
+        direct_float, float_names = self.direct_float, self.direct_float_names
+        indirect = self.indirect
+        if mask is not None:
+            direct_int = direct_int[mask[direct_int]]
+            int_names = [self.params[i].name for i in direct_int]
+            direct_float = direct_float[mask[direct_float]]
+            float_names = [self.params[i].name for i in direct_float]
+            indirect = [(i, p) for i, p in indirect if mask[i]]
+        for name, v in zip(int_names,
+                           values[direct_int].astype(numpy.int64).tolist()):
+            cfg[name] = v
+        for name, v in zip(float_names, values[direct_float].tolist()):
+            cfg[name] = v
+        for i, p in indirect:
+            p.set_value(cfg, p.value_type(values[i]))
+
+    def unit(self, cfg):
+        """unit scale vector of cfg, see PrimitiveParameter.get_unit_value"""
+        return self.to_unit(self.values(cfg))
+
+    def set_unit(self, cfg, unit, mask=None):
+        """assign a unit scale vector to cfg, clipping it to [0, 1]"""
+        self.set_values(cfg, self.from_unit(numpy.clip(unit, 0.0, 1.0)), mask)
+
+    def to_unit(self, values):
+        return numpy.divide(values - self.unit_low, self.span,
+                            out=numpy.zeros(len(self.params)),
+                            where=self.span > 0)
+
+    def from_unit(self, unit):
+        return unit * self.span + self.unit_low
+
+    def randomize(self, cfg):
+        """uniformly random values, see NumericParameter.op1_randomize"""
+        n = len(self.params)
+        rng = _numpy_random()
+        values = numpy.where(
+            self.integer,
+            numpy.floor(rng.uniform(self.low, self.high + 1.0, n)),
+            rng.uniform(self.low, self.high, n))
+        self.set_values(cfg, values)
+
+    def linear(self, a, cfg_a, b, cfg_b, c, cfg_c):
+        """unit scale a*cfg_a + b*cfg_b + c*cfg_c, clipped to [0, 1]"""
+        return numpy.clip(a * self.unit(cfg_a) + b * self.unit(cfg_b) +
+                          c * self.unit(cfg_c), 0.0, 1.0)
+
+    def normal_mutation(self, cfg, sigma=0.1, mask=None):
+        """
+        add normally distributed noise (on a unit scale) to the parameters
+        selected by the boolean array mask (default all), reflecting off the
+        bounds as PrimitiveParameter.op1_normal_mutation.  Inactive
+        parameters are not mutated
+        """
+        active = self.active(cfg)
+        if active is not None:
+            mask = active if mask is None else mask & active
+        unit = self.unit(cfg)
+        unit = numpy.abs(unit + _numpy_random().normal(0.0, sigma, len(unit)))
+        unit = numpy.where(unit > 1.0, 1.0 - unit % 1, unit)
+        self.set_unit(cfg, unit, mask)
+
+    def swarm(self, cfg, cfg1, cfg2, c=1, c1=0.5, c2=0.5, velocity=0,
+              sigma=0.2):
+        """
+        particle swarm update of cfg in place, as Integer/FloatParameter.op3_swarm
+
+        :return: the new velocity vector
+        """
+        x = self.values(cfg)
+        n = len(self.params)
+        rng = _numpy_random()
+        v = (velocity * c +
+             (self.values(cfg1) - x) * c1 * rng.random(n) +
+             (self.values(cfg2) - x) * c2 * rng.random(n))
+        k = self.high - self.low
+        # integers move to a sigmoid of the velocity plus gaussian noise
+        s = k / (1 + numpy.exp(-v)) + self.low
+        integer_position = rng.normal(s, sigma * k)
+        self.set_values(cfg, numpy.where(self.integer, integer_position, x + v))
+        return v
+
+
+def _numpy_random():
+    """
+    a numpy Generator for vectorized draws, seeded from the random module so
+    random.seed() makes them reproducible like the draws of the parameters
+    """
+    return numpy.random.default_rng(random.getrandbits(64))
+
+
+# legal_range() implementations that do not depend on the configuration
+_STATIC_RANGES = (NumericParameter.legal_range,
+                  ScaledNumericParameter.legal_range,
+                  LogIntegerParameter.legal_range,
+                  PowerOfTwoParameter.legal_range)
+
+
+def _stored_directly_anywhere(param):
+    """True if param.get_value(cfg) is cfg[param.name], for any Parameter"""
+    cls = type(param)
+    if isinstance(param, NumericParameter):
+        return _stored_directly(param)
+    return ((not isinstance(param.name, str) or '/' not in param.name) and
+            cls.get_value in (ComplexParameter.get_value,
+                              BooleanParameter.get_value) and
+            cls._get is Parameter._get and
+            cls._from_storage_type is Parameter._from_storage_type)
+
+
+def _stored_directly(param):
+    """True if param.get_value(cfg) is cfg[param.name]"""
+    cls = type(param)
+    return (cls.get_value is NumericParameter.get_value and
+            cls.set_value is NumericParameter.set_value and
+            cls._get is Parameter._get and cls._set is Parameter._set and
+            cls._from_storage_type is Parameter._from_storage_type and
+            cls._to_storage_type is Parameter._to_storage_type)
+
+
 ##################
 
 class ComplexParameter(Parameter):
@@ -1737,6 +2395,237 @@ class FloatArray(Array):
         return vs
 
 
+##################
+
+class Condition(object):
+    """
+    a parameter is active only while parameter parent takes one of values (a
+    value or a list of values), and parent is itself active
+    """
+
+    def __init__(self, parent, values):
+        self.parent = parent
+        if not isinstance(values, (list, tuple, set, frozenset)):
+            values = [values]
+        self.values = list(values)
+
+    def satisfied(self, value):
+        """True if a value of parent activates the parameter"""
+        return value in self.values
+
+
+class Constraint(with_metaclass(abc.ABCMeta, object)):
+    """
+    a declarative restriction on the values of some parameters of a
+    ConfigurationManipulator (see add_constraint()), checked for many
+    configurations at once.  Constraints see stored values, not the search
+    scale of e.g. LogIntegerParameter
+    """
+
+    def __init__(self, names):
+        self.names = list(names)  # parameters the constraint reads
+
+    @abc.abstractmethod
+    def check(self, columns):
+        """
+        boolean array, True where the constraint holds, given columns: a dict
+        from each of self.names to an array of its values in several
+        configurations
+        """
+        return
+
+    def prepare(self, manipulator, params):
+        """
+        called with the manipulator and its parameters by name before the
+        constraint is checked, raises ValueError if it cannot apply to them
+        """
+        pass
+
+    def repair(self, cfg, params):
+        """
+        change cfg in place towards satisfying the constraint, params maps
+        parameter names to Parameters.  Randomizes one of the parameters read
+        """
+        params[random.choice(self.names)].op1_randomize(cfg)
+
+
+class LinearConstraint(Constraint):
+    """
+    lower <= sum(coefficient * value) <= upper over numeric parameters,
+    coefficients maps parameter names to coefficients
+    """
+
+    def __init__(self, coefficients, lower=None, upper=None):
+        super(LinearConstraint, self).__init__(sorted(coefficients))
+        self.coefficients = [coefficients[name] for name in self.names]
+        self.lower = lower
+        self.upper = upper
+
+    def check(self, columns):
+        total = sum(c * columns[name].astype(float)
+                    for name, c in zip(self.names, self.coefficients))
+        ok = numpy.ones(len(total), dtype=bool)
+        if self.lower is not None:
+            ok &= total >= self.lower
+        if self.upper is not None:
+            ok &= total <= self.upper
+        return ok
+
+
+class DivisibilityConstraint(Constraint):
+    """
+    the value of integer parameter name divides dividend, a number or the name
+    of another integer parameter (e.g. a tile size dividing a dimension)
+    """
+
+    def __init__(self, name, dividend):
+        names = [name]
+        if isinstance(dividend, str):
+            names.append(dividend)
+        super(DivisibilityConstraint, self).__init__(names)
+        self.name = name
+        self.dividend = dividend
+
+    def dividends(self, columns):
+        if isinstance(self.dividend, str):
+            return columns[self.dividend].astype(numpy.int64)
+        return numpy.int64(self.dividend)
+
+    def check(self, columns):
+        divisor = columns[self.name].astype(numpy.int64)
+        safe = numpy.where(divisor == 0, 1, divisor)
+        return (divisor != 0) & (self.dividends(columns) % safe == 0)
+
+    def repair(self, cfg, params):
+        """set name to the divisor of dividend closest to its value"""
+        param = params[self.name]
+        if not (isinstance(param, LogIntegerParameter) or
+                (isinstance(param, IntegerParameter) and
+                 not isinstance(param, ScaledNumericParameter))):
+            return super(DivisibilityConstraint, self).repair(cfg, params)
+        if isinstance(self.dividend, str):
+            dividend = _stored_value(params[self.dividend], cfg)
+        else:
+            dividend = self.dividend
+        value = _stored_value(param, cfg)
+        divisors = [d for d in _divisors(abs(int(dividend)))
+                    if param.min_value <= d <= param.max_value]
+        if not divisors:
+            return super(DivisibilityConstraint, self).repair(cfg, params)
+        _set_stored_value(param, cfg,
+                          min(divisors, key=lambda d: abs(d - value)))
+
+
+class ForbiddenCombination(Constraint):
+    """
+    the parameters in values (a dict from names to values) do not all take
+    the given values at once
+    """
+
+    def __init__(self, values):
+        super(ForbiddenCombination, self).__init__(sorted(values))
+        self.values = [values[name] for name in self.names]
+
+    def check(self, columns):
+        forbidden = numpy.ones(len(columns[self.names[0]]), dtype=bool)
+        for name, value in zip(self.names, self.values):
+            forbidden &= columns[name] == value
+        return ~forbidden
+
+
+class Requires(Constraint):
+    """
+    parameter name keeps the value inactive_value unless parameter
+    condition has the value condition_value (e.g. a --param value that only
+    matters when an optimization flag is on).  Without an inactive_value,
+    name keeps the fixed value ConfigurationManipulator.inactive_value()
+    (e.g. the minimum of a numeric parameter)
+    """
+
+    def __init__(self, name, condition, condition_value=True,
+                 inactive_value=None):
+        super(Requires, self).__init__([name, condition])
+        self.name = name
+        self.condition = condition
+        self.condition_value = condition_value
+        self.inactive_value = inactive_value
+        self.value = inactive_value  # inactive_value or the default, see prepare()
+
+    def prepare(self, manipulator, params):
+        p = params[self.name]
+        if self.inactive_value is None:
+            self.value = manipulator.inactive_value(p)
+        if isinstance(p, NumericParameter):
+            legal = p.min_value <= self.value <= p.max_value
+        elif isinstance(p, EnumParameter):
+            legal = self.value in p.options
+        elif isinstance(p, BooleanParameter):
+            legal = self.value in (True, False)
+        else:
+            legal = True
+        if not legal:
+            raise ValueError('inactive value %r of %r is out of range' %
+                             (self.value, self.name))
+
+    def check(self, columns):
+        return ((columns[self.condition] == self.condition_value) |
+                (columns[self.name] == self.value))
+
+    def repair(self, cfg, params):
+        """set name back to its inactive value"""
+        _set_stored_value(params[self.name], cfg, self.value)
+
+
+class FunctionConstraint(Constraint):
+    """
+    function(*values) is true, for the values of parameters names.  If
+    vectorized, function is called once with an array per parameter and
+    returns a boolean array
+    """
+
+    def __init__(self, names, function, vectorized=False):
+        super(FunctionConstraint, self).__init__(names)
+        self.function = function
+        self.vectorized = vectorized
+
+    def check(self, columns):
+        values = [columns[name] for name in self.names]
+        if self.vectorized:
+            return numpy.asarray(self.function(*values), dtype=bool)
+        return numpy.array([bool(self.function(*row)) for row in zip(*values)],
+                           dtype=bool)
+
+
+def _divisors(n):
+    """the positive divisors of n > 0, by trial division up to sqrt(n)"""
+    small = [d for d in range(1, math.isqrt(n) + 1) if n % d == 0]
+    return small + [n // d for d in reversed(small) if d * d != n]
+
+
+def _stored_value(p, cfg):
+    """the value of p in cfg as stored, not on its search scale"""
+    if isinstance(p, NumericParameter):
+        return NumericParameter.get_value(p, cfg)
+    return p.get_value(cfg)
+
+
+def _set_stored_value(p, cfg, value):
+    """set p to value in cfg, value as stored (see _stored_value())"""
+    if isinstance(p, NumericParameter):
+        NumericParameter.set_value(p, cfg, value)
+    else:
+        p.set_value(cfg, value)
+
+
+def _column(values):
+    """values as a numeric array if they are all numbers, else an object array"""
+    if all(isinstance(v, numbers.Number) for v in values):
+        return numpy.array(values)
+    column = numpy.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
 ##################
 
 class ManipulatorProxy(object):
@@ -40,20 +40,48 @@ class MetaSearchTechnique(SearchTechniqueBase):
         self.driver = driver
 
     def desired_result(self):
+        drs = self.next_batch(1)
+        return drs[0] if drs else None
+
+    def desired_results(self, count):
+        """
+        as desired_result() repeated up to count times, but sub-techniques
+        with batch_requests set are asked for the rest of the batch at once
+        """
+        rv = []
+        while len(rv) < count:
+            drs = self.next_batch(count - len(rv))
+            if not drs:
+                break
+            rv.extend(drs)
+        return rv or None
+
+    def next_batch(self, count):
+        """
+        DesiredResults from the first technique in select_technique_order()
+        that has any, one unless it has batch_requests set
+        """
         techniques = self.select_technique_order()
         for technique in techniques:
-            dr = technique.desired_result()
-            if dr is not None:
-                if dr is False:
+            if technique.batch_requests:
+                drs = technique.desired_results(count)
+            else:
+                drs = technique.desired_result()
+                if drs:
+                    drs = [drs]
+            if drs is not None:
+                if drs is False or not drs:
                     # technique is waiting for results
                     continue
-                self.driver.register_result_callback(dr,
-                                                     lambda result: self.on_technique_result(technique, result))
+                for dr in drs:
+                    self.driver.register_result_callback(
+                        dr, lambda result, technique=technique:
+                        self.on_technique_result(technique, result))
                 if self.log_freq:
-                    self.logging_use_counters[technique.name] += 1
+                    self.logging_use_counters[technique.name] += len(drs)
                     self.debug_log()
-                self.request_count += 1
-                return dr
+                self.request_count += len(drs)
+                return drs
             else:
                 self.on_technique_no_desired_result(technique)
         return None
@@ -2,6 +2,7 @@ from __future__ import division
 
 import abc
 import logging
+import math
 from builtins import map
 
 from future.utils import with_metaclass
@@ -11,6 +12,7 @@ from sqlalchemy import text
 
 import opentuner
 from opentuner.resultsdb.models import *
+from opentuner.search.pareto import ParetoFront
 
 log = logging.getLogger(__name__)
 
@@ -32,8 +34,8 @@ class SearchObjective(with_metaclass(abc.ABCMeta, object)):
 
     def config_compare(self, config1, config2):
         """cmp() compatible comparison of resultsdb.models.Configuration"""
-        return self.result_compare(self.driver.results_query(config=config1).one(),
-                                   self.driver.results_query(config=config2).one())
+        return self.result_compare(self.driver.best_result_for(config1),
+                                   self.driver.best_result_for(config2))
 
     @abc.abstractmethod
     def result_relative(self, result1, result2):
@@ -42,12 +44,33 @@ class SearchObjective(with_metaclass(abc.ABCMeta, object)):
 
     def config_relative(self, config1, config2):
         """return None, or a relative goodness of resultsdb.models.Configuration"""
-        return self.result_relative(self.driver.results_query(config=config1).one(),
-                                    self.driver.results_query(config=config2).one())
+        return self.result_relative(self.driver.best_result_for(config1),
+                                    self.driver.best_result_for(config2))
 
     def __init__(self):
         self.driver = None
 
+    # which time to compare results aggregated from repeated measurements by
+    # (see opentuner.measurement.repeat): 'mean', or the 'lower' or 'upper'
+    # end of the confidence interval on it
+    time_bound = 'mean'
+
+    def result_time(self, result):
+        """result.time, moved to an end of its confidence interval per time_bound"""
+        if self.time_bound == 'mean' or not result.confidence:
+            return result.time
+        if self.time_bound == 'lower':
+            return result.time - result.confidence
+        return result.time + result.confidence
+
+    def clearly_worse(self, result1, result2):
+        """
+        True if result1 is worse than result2 even when comparing the lower
+        bound on the time of result1 with the upper bound on that of result2
+        """
+        return self.result_compare(_at_bound(result1, -1),
+                                   _at_bound(result2, 1)) > 0
+
     def set_driver(self, driver):
         self.driver = driver
 
@@ -103,11 +126,19 @@ class SearchObjective(with_metaclass(abc.ABCMeta, object)):
         """
         a time limit to kill a result after such that it can be compared to config
         """
-        results = self.driver.results_query(config=config)
-        if results.count() == 0:
+        results = self.driver.results_for(config)
+        if len(results) == 0:
             return None
         else:
-            return max(list(map(lambda x: x.time, self.driver.results_query(config=config))))
+            return max(list(map(lambda x: x.time, results)))
+
+    def limit_basis(self, result):
+        """
+        the run time to derive time limits for later tests from, given a good
+        result, or None if run time does not decide this objective and slow
+        tests should not be cut short
+        """
+        return result.time
 
     def project_compare(self, a1, a2, b1, b2, factor=1.0):
         """
@@ -148,6 +179,25 @@ class SearchObjective(with_metaclass(abc.ABCMeta, object)):
         else:
             return result.time
 
+    def pareto_front(self):
+        """
+        a new search.pareto.ParetoFront for the driver to maintain, or None
+        if the objective does not trade off several values
+        """
+        return None
+
+
+def _at_bound(result, direction):
+    """a copy of result with its time moved direction * result.confidence"""
+    rv = Result(time=result.time,
+                accuracy=result.accuracy,
+                energy=result.energy,
+                size=result.size,
+                extra=dict(result.extra or {}))
+    if result.time is not None and result.confidence:
+        rv.time += direction * result.confidence
+    return rv
+
 
 def _project(a1, a2, factor):
     if a1 is None or a2 is None:
@@ -164,20 +214,26 @@ class MinimizeTime(SearchObjective):
         """return database columns required to order by the objective"""
         return [Result.time]
 
+    def __init__(self, time_bound='mean'):
+        super(MinimizeTime, self).__init__()
+        self.time_bound = time_bound
+
     def result_compare(self, result1, result2):
         """cmp() compatible comparison of resultsdb.models.Result"""
-        return cmp(result1.time, result2.time)
+        return cmp(self.result_time(result1), self.result_time(result2))
 
     def config_compare(self, config1, config2):
         """cmp() compatible comparison of resultsdb.models.Configuration"""
-        return cmp(min(list(map(lambda x: x.time, self.driver.results_query(config=config1)))),
-                   min(list(map(lambda x: x.time, self.driver.results_query(config=config2)))))
+        return cmp(min(list(map(self.result_time, self.driver.results_for(config1)))),
+                   min(list(map(self.result_time, self.driver.results_for(config2)))))
 
     def result_relative(self, result1, result2):
         """return None, or a relative goodness of resultsdb.models.Result"""
-        if result2.time == 0:
-            return float('inf') * result1.time
-        return old_div(result1.time, result2.time)
+        time1 = self.result_time(result1)
+        time2 = self.result_time(result2)
+        if time2 == 0:
+            return float('inf') * time1
+        return old_div(time1, time2)
 
 
 class MaximizeAccuracy(SearchObjective):
@@ -201,6 +257,10 @@ class MaximizeAccuracy(SearchObjective):
             return float('inf') * result2.accuracy
         return old_div(result2.accuracy, result1.accuracy)
 
+    def limit_basis(self, result):
+        """accuracy does not improve by stopping slow tests"""
+        return None
+
     def stats_quality_score(self, result, worst_result, best_result):
         """return a score for statistics"""
         if not self.is_acceptable(result):
@@ -262,21 +322,21 @@ class ThresholdAccuracyMinimizeTime(SearchObjective):
     def result_compare(self, result1, result2):
         """cmp() compatible comparison of resultsdb.models.Result"""
         return cmp((-min(self.accuracy_target, result1.accuracy),
-                    result1.time),
-                   (-min(self.accuracy_target, result2.accuracy), result2.time))
+                    self.result_time(result1)),
+                   (-min(self.accuracy_target, result2.accuracy),
+                    self.result_time(result2)))
 
     def config_compare(self, config1, config2):
         """cmp() compatible comparison of resultsdb.models.Configuration"""
-        return self.result_compare(
-            self.driver.results_query(config=config1, objective_ordered=True)[0],
-            self.driver.results_query(config=config2, objective_ordered=True)[0])
+        return self.result_compare(self.driver.best_result_for(config1),
+                                   self.driver.best_result_for(config2))
 
     def limit_from_config(self, config):
         """
         a time limit to kill a result after such that it can be compared to config
         """
-        results = self.driver.results_query(config=config)
-        if results.count() == 0:
+        results = self.driver.results_for(config)
+        if len(results) == 0:
             return None
         if self.accuracy_target > min(list(map(lambda x: x.accuracy, results))):
             m = self.low_accuracy_limit_multiplier
@@ -284,6 +344,15 @@ class ThresholdAccuracyMinimizeTime(SearchObjective):
             m = 1.0
         return m * max(list(map(lambda x: x.time, results)))
 
+    def limit_basis(self, result):
+        """
+        time of result, scaled by low_accuracy_limit_multiplier while it is
+        below the accuracy target
+        """
+        if result.time is None or self.is_acceptable(result):
+            return result.time
+        return self.low_accuracy_limit_multiplier * result.time
+
     def filter_acceptable(self, query):
         """Return a Result() query that only returns acceptable results"""
         return query.filter(opentuner.resultsdb.models.Result.accuracy
@@ -323,6 +392,12 @@ class MinimizeAttribute(SearchObjective):
         return (result.get_attribute(self.attribute_name, self.missing_value)
                 if hasattr(result, 'get_attribute') else self.missing_value)
 
+    def limit_basis(self, result):
+        """run time only matters when the attribute is the time"""
+        if self.attribute_name == 'time':
+            return result.time
+        return None
+
     def result_compare(self, result1, result2):
         return cmp(self._value_of(result1), self._value_of(result2))
 
@@ -359,6 +434,10 @@ class MaximizeAttribute(SearchObjective):
         return (result.get_attribute(self.attribute_name, self.missing_value)
                 if hasattr(result, 'get_attribute') else self.missing_value)
 
+    def limit_basis(self, result):
+        """stopping slow tests never helps to maximize an attribute"""
+        return None
+
     def result_compare(self, result1, result2):
         # note opposite order for maximize
         return cmp(self._value_of(result2), self._value_of(result1))
@@ -373,3 +452,90 @@ class MaximizeAttribute(SearchObjective):
             return old_div(v2, v1)
         except Exception:
             return None
+
+
+# ParetoObjective.scalar_key() continues the log linearly below this value
+LOG_LINEAR_BELOW = 1e-12
+
+
+def _extended_log(value):
+    """log(value), continued linearly below LOG_LINEAR_BELOW"""
+    if value >= LOG_LINEAR_BELOW:
+        return math.log(value)
+    return math.log(LOG_LINEAR_BELOW) + (value - LOG_LINEAR_BELOW) / LOG_LINEAR_BELOW
+
+
+class ParetoObjective(SearchObjective):
+    """
+    minimize several attributes of Result at once (by default time, energy
+    and size), looking for the trade-offs between them: the driver maintains
+    the non-dominated front of the results (SearchDriver.pareto_front, see
+    search.pareto).  Attributes that are not database columns are read from
+    Result.extra, a missing value counts as infinite.
+
+    Techniques still need a total order, results are ordered by the product
+    (sum of logs) of their values, which is consistent with dominance and
+    does not depend on the units of each attribute
+    """
+
+    def __init__(self, attributes=('time', 'energy', 'size'), reference=None,
+                 missing_value=None):
+        super(ParetoObjective, self).__init__()
+        self.attributes = tuple(attributes)
+        self.reference = reference
+        self.missing_value = missing_value
+
+    def result_order_by_terms(self):
+        """return database columns required to order by the objective"""
+        # the order of scalar_key() cannot be expressed in SQL
+        return []
+
+    def values(self, result):
+        """the minimized values of result, in the order of attributes"""
+        values = []
+        for name in self.attributes:
+            if hasattr(result, name):
+                value = getattr(result, name)
+            else:
+                value = result.get_attribute(name, self.missing_value)
+            if name == 'time' and value is not None:
+                value = self.result_time(result)
+            values.append(float('inf') if value is None else value)
+        return tuple(values)
+
+    def scalar_key(self, result):
+        """
+        (count of infinite values, sum of the logs of the others, values),
+        smaller is better and a dominating result always has a smaller key.
+        Below LOG_LINEAR_BELOW (so for zero and negative values) the log is
+        continued linearly, keeping every term finite and increasing
+        """
+        values = self.values(result)
+        finite = [v for v in values if not math.isinf(v)]
+        return len(values) - len(finite), sum(map(_extended_log, finite)), values
+
+    def result_compare(self, result1, result2):
+        """cmp() compatible comparison of resultsdb.models.Result"""
+        return cmp(self.scalar_key(result1), self.scalar_key(result2))
+
+    def result_relative(self, result1, result2):
+        """ratio of the geometric means of the values of the results"""
+        infinite1, logs1, values1 = self.scalar_key(result1)
+        infinite2, logs2, values2 = self.scalar_key(result2)
+        if infinite1 or infinite2 or min(values1 + values2) <= 0:
+            return None
+        return math.exp((logs1 - logs2) / len(self.attributes))
+
+    def limit_basis(self, result):
+        """a slow test may still be on the front, never cut tests short"""
+        return None
+
+    def display(self, result):
+        """
+        produce a string version of a resultsdb.models.Result()
+        """
+        return ', '.join('%s=%.4f' % (name, float(value)) for name, value in
+                         zip(self.attributes, self.values(result)))
+
+    def pareto_front(self):
+        return ParetoFront(self.values, self.reference)
@@ -0,0 +1,166 @@
+"""
+the non-dominated (Pareto) front of the results of a multi-objective tuning
+run (see objective.ParetoObjective)
+
+every objective is minimized.  The front is kept as a numpy array of the
+objective values of its members, so adding a result compares it with the
+current front only, in a few vectorized operations, rather than with every
+earlier result.  The hypervolume the front dominates (up to a reference
+point) grows whenever the front improves and measures the progress of the
+search; it is recomputed only when the front changes.
+"""
+from __future__ import absolute_import
+from __future__ import division
+
+import random
+
+import numpy
+
+
+def dominates(a, b):
+    """True if objective vector a is no worse than b everywhere and better somewhere"""
+    a = numpy.asarray(a, dtype=float)
+    b = numpy.asarray(b, dtype=float)
+    return bool(numpy.all(a <= b) and numpy.any(a < b))
+
+
+def hypervolume(points, reference):
+    """
+    volume of the region dominated by points (an n by d array) and bounded by
+    the reference point, exact; d > 2 is sliced along the last objective,
+    about O(n^(d-1) log n)
+    """
+    points = numpy.asarray(points, dtype=float)
+    reference = numpy.asarray(reference, dtype=float)
+    if len(points):
+        points = points[numpy.all(points < reference, axis=1)]
+    if not len(points):
+        return 0.0
+    if points.shape[1] == 1:
+        return float(reference[0] - numpy.min(points[:, 0]))
+    if points.shape[1] == 2:
+        points = points[numpy.lexsort((points[:, 1], points[:, 0]))]
+        lowest = numpy.minimum.accumulate(points[:, 1])
+        above = numpy.concatenate(([reference[1]], lowest[:-1]))
+        return float(numpy.sum((reference[0] - points[:, 0]) * (above - lowest)))
+    points = points[numpy.argsort(points[:, -1], kind='stable')]
+    bounds = numpy.append(points[1:, -1], reference[-1])
+    volume = 0.0
+    for i in range(len(points)):
+        depth = bounds[i] - points[i, -1]
+        if depth > 0:
+            volume += depth * hypervolume(points[:i + 1, :-1], reference[:-1])
+    return volume
+
+
+def default_reference(values):
+    """a reference point for a front whose first member has objective values"""
+    values = numpy.asarray(values, dtype=float)
+    return numpy.where(values != 0, values + numpy.abs(values), 1.0)
+
+
+class ParetoFront(object):
+    """
+    the Results not dominated by any other Result added so far, under the
+    objective vectors given by values(result).  Results with a missing or
+    infinite objective value are never on the front.  Without an explicit
+    reference point one is fixed from the first Result added (twice each of
+    its values), so hypervolume() never decreases
+    """
+
+    def __init__(self, values, reference=None):
+        self.values = values
+        self.reference = reference
+        self.points = None  # array with a row of values per member
+        self.results = []
+        self.added = 0  # Results that joined the front
+        self.rejected = 0  # Results dominated when added
+        self._hypervolume = None
+        self._crowding = None
+
+    def __len__(self):
+        return len(self.results)
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def vector(self, result):
+        """objective values of result as an array, None if any is not finite"""
+        values = [float('inf') if v is None else v for v in self.values(result)]
+        vector = numpy.array(values, dtype=float)
+        if not numpy.all(numpy.isfinite(vector)):
+            return None
+        return vector
+
+    def add(self, result):
+        """add result, True if it joined the front (the front changed)"""
+        vector = self.vector(result)
+        if vector is None:
+            return False
+        if self.points is None:
+            self.points = numpy.empty((0, len(vector)))
+            if self.reference is None:
+                self.reference = default_reference(vector)
+            self.reference = numpy.asarray(self.reference, dtype=float)
+        elif numpy.any(numpy.all(self.points <= vector, axis=1)):
+            # dominated by (or equal to) a member
+            self.rejected += 1
+            return False
+        keep = ~numpy.all(self.points >= vector, axis=1)
+        self.results = [r for r, k in zip(self.results, keep) if k]
+        self.results.append(result)
+        self.points = numpy.vstack((self.points[keep], vector))
+        self.added += 1
+        self._hypervolume = None
+        self._crowding = None
+        return True
+
+    def dominated(self, result):
+        """True if a member of the front dominates (or equals) result"""
+        vector = self.vector(result)
+        if vector is None:
+            return True
+        if self.points is None:
+            return False
+        return bool(numpy.any(numpy.all(self.points <= vector, axis=1)))
+
+    def hypervolume(self):
+        """volume dominated by the front up to the reference point"""
+        if self._hypervolume is None:
+            if self.points is None:
+                return 0.0
+            self._hypervolume = hypervolume(self.points, self.reference)
+        return self._hypervolume
+
+    def crowding(self):
+        """
+        crowding distance of each member: the normalized size of the box
+        between its neighbours along each objective, infinite at the extremes
+        """
+        if self._crowding is None:
+            n, d = self.points.shape
+            distance = numpy.zeros(n)
+            for j in range(d):
+                order = numpy.argsort(self.points[:, j], kind='stable')
+                column = self.points[order, j]
+                span = column[-1] - column[0]
+                distance[order[0]] = distance[order[-1]] = float('inf')
+                if n > 2 and span > 0:
+                    distance[order[1:-1]] += (column[2:] - column[:-2]) / span
+            self._crowding = distance
+        return self._crowding
+
+    def select(self):
+        """
+        a member of the front to derive new configurations from, picked by a
+        binary tournament on crowding distance so sparse parts of the front
+        are explored more, or None while the front is empty
+        """
+        if not self.results:
+            return None
+        i = random.randrange(len(self.results))
+        j = random.randrange(len(self.results))
+        crowding = self.crowding()
+        if crowding[j] > crowding[i]:
+            i = j
+        return self.results[i]
@@ -2,6 +2,9 @@ from opentuner.search import technique
 
 
 class PatternSearch(technique.SequentialSearchTechnique):
+    # the stencil around the center is requested as one batch
+    batch_requests = True
+
     def __init__(self, initial_step_size=0.4):
         super(PatternSearch, self).__init__()
         self.initial_step_size = initial_step_size
@@ -20,11 +23,11 @@ class PatternSearch(technique.SequentialSearchTechnique):
             center = driver.get_configuration(manipulator.random())
         else:
             center = driver.best_result.configuration
-            self.yield_nonblocking(center)
+        self.yield_nonblocking(center)
 
         while True:
             points = list()
-            for param in manipulator.parameters(center.data):
+            for param in manipulator.active_parameters(center.data):
                 if param.is_primitive():
                     # get current value of param, scaled to be in range [0.0, 1.0]
                     unit_value = param.get_unit_value(center.data)
@@ -33,26 +36,23 @@ class PatternSearch(technique.SequentialSearchTechnique):
                         # produce new config with param set step_size lower
                         down_cfg = manipulator.copy(center.data)
                         param.set_unit_value(down_cfg, max(0.0, unit_value - step_size))
-                        down_cfg = driver.get_configuration(down_cfg)
-                        self.yield_nonblocking(down_cfg)
                         points.append(down_cfg)
 
                     if unit_value < 1.0:
                         # produce new config with param set step_size higher
                         up_cfg = manipulator.copy(center.data)
                         param.set_unit_value(up_cfg, min(1.0, unit_value + step_size))
-                        up_cfg = driver.get_configuration(up_cfg)
-                        self.yield_nonblocking(up_cfg)
                         points.append(up_cfg)
 
                 else:  # ComplexParameter
                     for mutate_function in param.manipulators(center.data):
                         cfg = manipulator.copy(center.data)
                         mutate_function(cfg)
-                        cfg = driver.get_configuration(cfg)
-                        self.yield_nonblocking(cfg)
                         points.append(cfg)
 
+            for cfg in driver.get_configurations(points):
+                self.yield_nonblocking(cfg)
+
             yield None  # wait for all results
 
             if objective.lt(driver.best_result.configuration, center):
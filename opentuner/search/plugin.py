@@ -65,6 +65,21 @@ class SearchPlugin(object):
         """
         pass
 
+    def on_pareto_front_change(self, front):
+        """
+        called whenever a new result joins the SearchDriver.pareto_front of a
+        multi-objective search, front.hypervolume() measures the progress
+        """
+        pass
+
+    def on_warm_start(self, results):
+        """
+        called once before the search with Results of earlier tuning runs of
+        the same program version and machine class, oldest first (see
+        --warm-start)
+        """
+        pass
+
 
 class DisplayPlugin(with_metaclass(abc.ABCMeta, SearchPlugin)):
     def __init__(self, display_period=5):
@@ -92,8 +107,8 @@ class LogDisplayPlugin(DisplayPlugin):
     def display(self, t=None):
         if not t:
             t = time.time()
-        count = self.driver.results_query().count()
-        best = self.driver.results_query(objective_ordered=True).first()
+        count = self.driver.result_index.count()
+        best = self.driver.result_index.best
         if best is None:
             log.warning("no results yet")
             return
@@ -104,6 +119,10 @@ class LogDisplayPlugin(DisplayPlugin):
                          self.driver.objective.display(best),
                          requestor,
                          )
+        front = self.driver.pareto_front
+        if front is not None:
+            display_log.info("pareto front of %d results, hypervolume %.4g",
+                             len(front), front.hypervolume())
 
 
 class FileDisplayPlugin(SearchPlugin):
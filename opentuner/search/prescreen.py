@@ -0,0 +1,153 @@
+"""
+optional surrogate-based pre-screening of requested tests (see --prescreen)
+
+a model of the results of the tuning run so far (see surrogate.py) scores
+each generation's requests before they are measured.  Requests predicted to
+be bad are given a tight time limit, so they are cut short unless they beat
+the best result, and all requests are ordered by predicted quality through
+DesiredResult.priority.  Predicted-bad requests are still measured (the
+requesting techniques wait for a result for each of them), only for less
+time.
+"""
+from __future__ import absolute_import
+from __future__ import division
+
+import argparse
+import logging
+import math
+import random
+
+import numpy
+
+from .plugin import SearchPlugin
+from .surrogate import ConfigurationEncoder, GaussianProcess, rank_targets
+
+log = logging.getLogger(__name__)
+
+argparser = argparse.ArgumentParser(add_help=False)
+argparser.add_argument('--prescreen', action='store_true',
+                       help="score requested tests with a model of past "
+                            "results and give the ones predicted to be bad a "
+                            "tight time limit")
+argparser.add_argument('--prescreen-action', choices=('limit', 'priority'),
+                       default='limit',
+                       help="what to do with tests predicted to be bad: "
+                            "limit their run time (and order them last), or "
+                            "only order them last")
+argparser.add_argument('--prescreen-exploration', type=float, default=0.1,
+                       metavar='RATE',
+                       help="fraction of tests predicted to be bad to "
+                            "measure normally anyway")
+argparser.add_argument('--prescreen-min-results', type=int, default=20,
+                       metavar='N',
+                       help="results needed before the model is used")
+argparser.add_argument('--prescreen-quantile', type=float, default=0.5,
+                       metavar='Q',
+                       help="tests are predicted to be bad if they confidently "
+                            "rank below this quantile of past results "
+                            "(0 is the best, 1 the worst)")
+argparser.add_argument('--prescreen-limit-multiplier', type=float,
+                       default=1.0, metavar='M',
+                       help="time limit of tests predicted to be bad, as a "
+                            "multiple of the best time so far")
+
+
+class PreScreen(SearchPlugin):
+    """
+    scores the requests of SearchDriver.run_generation_techniques() with a
+    Gaussian process fit to the most recent max_points results of the run
+    """
+
+    def __init__(self, args, max_points=300):
+        super(PreScreen, self).__init__()
+        self.args = args
+        self.max_points = max_points
+        self.encoder = None
+        self.observed = []  # (features, result)
+        self.model = None
+        self.screened = 0  # requests scored
+        self.predicted_bad = 0
+        self.limited = dict()  # Configuration.hash -> tight limit
+        self.cut_short = 0  # limited tests that timed out at the tight limit
+
+    @property
+    def priority(self):
+        # learn from results before the techniques see them
+        return -10
+
+    def set_driver(self, driver):
+        super(PreScreen, self).set_driver(driver)
+        self.encoder = ConfigurationEncoder(driver.manipulator)
+
+    def on_result(self, result):
+        self.observed.append((self.encoder.encode(result.configuration.data),
+                              result))
+        if len(self.observed) > self.max_points:
+            del self.observed[0]
+        self.model = None
+        tight = self.limited.pop(result.configuration.hash, None)
+        if tight is not None and result.state == 'TIMEOUT':
+            self.cut_short += 1
+
+    def on_warm_start(self, results):
+        """train on the results of earlier tuning runs as well"""
+        for result in results:
+            self.on_result(result)
+
+    def fit(self):
+        """the model of the recent results, None if there are too few"""
+        if (len(self.observed) < max(2, self.args.prescreen_min_results) or
+                len(self.encoder) == 0):
+            return None
+        if self.model is None:
+            targets = rank_targets(self.driver.objective,
+                                   [result for _, result in self.observed])
+            x = numpy.array([features for features, _ in self.observed])
+            try:
+                self.model = GaussianProcess().fit(x, targets)
+            except numpy.linalg.LinAlgError:
+                log.warning('prescreen model fit failed')
+                return None
+        return self.model
+
+    def tight_limit(self):
+        """time limit for tests predicted to be bad, or None"""
+        best = self.driver.best_result
+        if (self.args.prescreen_action != 'limit' or best is None or
+                best.state not in (None, 'OK')):
+            return None
+        basis = self.driver.objective.limit_basis(best)
+        if basis is None or math.isinf(basis) or math.isnan(basis):
+            return None
+        return self.args.prescreen_limit_multiplier * basis
+
+    def screen(self, drs):
+        """set priority (and for predicted-bad tests limit) of drs in place"""
+        model = self.fit()
+        if model is None or not drs:
+            return
+        x = self.encoder.encode_all([dr.configuration.data for dr in drs])
+        mu, sigma = model.predict(x)
+        tight = self.tight_limit()
+        for dr, rank, sd in zip(drs, mu, sigma):
+            self.screened += 1
+            dr.priority = 1.0 - float(rank)
+            if (rank - 2.0 * sd <= self.args.prescreen_quantile or
+                    random.random() < self.args.prescreen_exploration):
+                continue
+            self.predicted_bad += 1
+            dr.priority -= 1.0
+            if tight is not None:
+                if dr.limit is None or dr.limit > tight:
+                    dr.limit = tight
+                self.limited[dr.configuration.hash] = dr.limit
+            log.debug('prescreen: %s predicted rank %.2f +- %.2f',
+                      dr.configuration.hash, rank, 2.0 * sd)
+
+    def report(self):
+        return ('prescreen: %d of %d screened tests predicted bad, '
+                '%d cut short at a tight limit' % (
+                    self.predicted_bad, self.screened, self.cut_short))
+
+    def after_main(self):
+        log.info(self.report())
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 
+import numpy
+
 from opentuner.search import technique
 from .manipulator import *
 
@@ -8,6 +10,9 @@ from .manipulator import *
 class PSO(technique.SequentialSearchTechnique):
     """ Particle Swarm Optimization """
 
+    # each step moves the whole swarm, requested as one batch
+    batch_requests = True
+
     def __init__(self, crossover, N=30, init_pop=None, *pargs, **kwargs):
         """
         crossover: name of crossover operator function
@@ -31,17 +36,22 @@ class PSO(technique.SequentialSearchTechnique):
         if not population:
             population = [HybridParticle(m, self.crossover) for i in range(self.N)]
 
-        for p in population:
-            yield driver.get_configuration(p.position)
+        for p in driver.get_configurations([p.position for p in population]):
+            self.yield_nonblocking(p)
+        yield None  # wait for all results
 
         while True:
+            g = driver.best_result.configuration.data
             for particle in population:
-                g = driver.best_result.configuration.data
-                old = m.copy(particle.position)
                 particle.move(g)
-                yield config(particle.position)
+            positions = driver.get_configurations([particle.position
+                                                   for particle in population])
+            for position in positions:
+                self.yield_nonblocking(position)
+            yield None  # wait for the whole swarm
+            for particle, position in zip(population, positions):
                 # update individual best
-                if objective.lt(config(particle.position), config(particle.best)):
+                if objective.lt(position, config(particle.best)):
                     particle.best = particle.position
 
 
@@ -62,8 +72,15 @@ class HybridParticle(object):
         self.phi_l = phi_l
         self.phi_g = phi_g
         self.crossover_choice = crossover_choice
+        # numeric parameters move together, see VectorSpace.swarm()
+        self.vector_space = self.manipulator.vector_space()
+        self.params = self.manipulator.params
+        self.vector_velocity = None
+        if self.vector_space is not None:
+            self.params = self.vector_space.other_params
+            self.vector_velocity = numpy.zeros(len(self.vector_space))
         self.velocity = {}
-        for p in self.manipulator.params:
+        for p in self.params:
             # Velocity as a continous value
             self.velocity[p.name] = 0
 
@@ -72,8 +89,13 @@ class HybridParticle(object):
         Update parameter values using corresponding operators.
         TODO: introduce operator choice map
         """
-        m = self.manipulator
-        for p in m.params:
+        # earlier positions are referenced by Configurations, move a copy
+        self.position = self.manipulator.copy(self.position)
+        if self.vector_space is not None:
+            self.vector_velocity = self.vector_space.swarm(
+                self.position, global_best, self.best, c=self.omega,
+                c1=self.phi_g, c2=self.phi_l, velocity=self.vector_velocity)
+        for p in self.params:
             self.velocity[p.name] = p.op3_swarm(self.position, global_best, self.best, c=self.omega, c1=self.phi_g,
                                                 c2=self.phi_l, xchoice=self.crossover_choice,
                                                 velocity=self.velocity[p.name])
@@ -11,6 +11,7 @@ from builtins import str
 from collections import defaultdict
 from functools import cmp_to_key
 
+import numpy
 from past.utils import old_div
 
 from .manipulator import Parameter
@@ -38,6 +39,19 @@ class SimplexTechnique(SequentialSearchTechnique):
         average of all the PrimitiveParameters in self.simplex_points
         ComplexParameters are copied from self.simplex_points[0]
         """
+        vector_space = self.manipulator.vector_space()
+        if vector_space is not None:
+            centroid = self.manipulator.copy(self.simplex_points[0].data)
+            vector_space.set_unit(centroid, numpy.mean(
+                [vector_space.unit(config.data)
+                 for config in self.simplex_points], axis=0))
+            for param in vector_space.other_params:
+                if param.is_primitive():
+                    param.set_unit_value(centroid, numpy.mean(
+                        [param.get_unit_value(config.data)
+                         for config in self.simplex_points]))
+            return centroid
+
         sums = defaultdict(float)
         counts = defaultdict(int)
 
@@ -62,7 +62,7 @@ class PseudoAnnealingSearch(technique.SequentialSearchTechnique):
             # get candidate neighbors using manipulator
             points = list()
             points.append(state)
-            for param in manipulator.parameters(state.data):
+            for param in manipulator.active_parameters(state.data):
                 if param.is_primitive():
                     # get current value of param, scaled to be in range [0.0, 1.0]
                     unit_value = param.get_unit_value(state.data)
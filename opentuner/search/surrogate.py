@@ -0,0 +1,153 @@
+"""
+cheap surrogate models of the objective over configurations, for
+model-based search (see bayesopt.py)
+
+configurations are encoded as points in the unit hypercube by
+ConfigurationEncoder and results as their rank under the objective, so the
+same model serves any SearchObjective
+"""
+from __future__ import absolute_import
+from __future__ import division
+
+import math
+from functools import cmp_to_key
+
+import numpy
+
+from .manipulator import BooleanParameter, EnumParameter, SwitchParameter
+
+_erf = numpy.frompyfunc(math.erf, 1, 1)
+
+
+class ConfigurationEncoder(object):
+    """
+    feature vectors of configurations: the unit value (get_unit_value) of
+    each primitive parameter and the option index of each boolean, switch and
+    enum parameter scaled to [0, 1].  Other complex parameters (permutations,
+    schedules, ...) are not encoded
+    """
+
+    def __init__(self, manipulator):
+        self.vector_space = manipulator.vector_space()
+        if self.vector_space is not None:
+            params = self.vector_space.other_params
+        else:
+            params = manipulator.parameters(manipulator.random())
+        self.params = [p for p in params if p.is_primitive() or
+                       isinstance(p, (BooleanParameter, SwitchParameter,
+                                      EnumParameter))]
+
+    def __len__(self):
+        n = len(self.params)
+        if self.vector_space is not None:
+            n += len(self.vector_space)
+        return n
+
+    def encode(self, cfg):
+        """feature vector of the configuration dict cfg"""
+        features = [self.param_feature(p, cfg) for p in self.params]
+        if self.vector_space is not None:
+            return numpy.concatenate((self.vector_space.unit(cfg), features))
+        return numpy.array(features, dtype=float)
+
+    def encode_all(self, cfgs):
+        """feature matrix with a row per configuration dict in cfgs"""
+        if not cfgs:
+            return numpy.empty((0, len(self)))
+        return numpy.array([self.encode(cfg) for cfg in cfgs])
+
+    @staticmethod
+    def param_feature(param, cfg):
+        if param.is_primitive():
+            return param.get_unit_value(cfg)
+        value = param.get_value(cfg)
+        if isinstance(param, BooleanParameter):
+            return float(bool(value))
+        if isinstance(param, SwitchParameter):
+            return value / max(1, param.option_count - 1)
+        try:
+            return param.options.index(value) / max(1, len(param.options) - 1)
+        except ValueError:
+            return 0.5
+
+
+def rank_targets(objective, results):
+    """
+    the rank of each of results under objective scaled to [0, 1] (0 is the
+    best), with ties given the same rank
+    """
+    n = len(results)
+    order = sorted(range(n), key=cmp_to_key(
+        lambda a, b: objective.compare(results[a], results[b])))
+    targets = numpy.empty(n)
+    rank = 0
+    for i, index in enumerate(order):
+        if i and objective.compare(results[order[i - 1]], results[index]) < 0:
+            rank = i
+        targets[index] = rank
+    return targets / max(1, n - 1)
+
+
+class GaussianProcess(object):
+    """
+    Gaussian process regression with a squared exponential kernel, the
+    lengthscale picked from a small grid by marginal likelihood
+    """
+
+    lengthscales = (0.05, 0.1, 0.2, 0.4, 0.8)
+
+    def __init__(self, noise=1e-2):
+        self.noise = noise
+        self.x = None
+
+    def kernel(self, a, b, lengthscale):
+        sq = (numpy.sum(a * a, axis=1)[:, None] +
+              numpy.sum(b * b, axis=1)[None, :] - 2.0 * a.dot(b.T))
+        return numpy.exp(-0.5 * numpy.maximum(sq, 0.0) / lengthscale ** 2)
+
+    def fit(self, x, y):
+        """
+        condition on points x (n by d, in the unit hypercube) with targets y,
+        raises numpy.linalg.LinAlgError if no lengthscale is usable
+        """
+        self.y = y
+        self.mean = numpy.mean(y)
+        self.std = numpy.std(y) or 1.0
+        y = (y - self.mean) / self.std
+        scale = math.sqrt(max(1, x.shape[1]))
+        best = None
+        for lengthscale in self.lengthscales:
+            lengthscale *= scale
+            k = self.kernel(x, x, lengthscale)
+            k[numpy.diag_indices_from(k)] += self.noise
+            try:
+                chol = numpy.linalg.cholesky(k)
+            except numpy.linalg.LinAlgError:
+                continue
+            alpha = numpy.linalg.solve(chol.T, numpy.linalg.solve(chol, y))
+            likelihood = (-0.5 * y.dot(alpha) -
+                          numpy.sum(numpy.log(numpy.diag(chol))))
+            if best is None or likelihood > best[0]:
+                best = (likelihood, lengthscale, chol, alpha)
+        if best is None:
+            raise numpy.linalg.LinAlgError('no usable GP lengthscale')
+        _, self.lengthscale, self.chol, self.alpha = best
+        self.x = x
+        return self
+
+    def predict(self, x):
+        """mean and standard deviation of the model at points x"""
+        ks = self.kernel(self.x, x, self.lengthscale)
+        mu = ks.T.dot(self.alpha)
+        v = numpy.linalg.solve(self.chol, ks)
+        var = numpy.maximum(1.0 + self.noise - numpy.sum(v * v, axis=0), 1e-12)
+        return mu * self.std + self.mean, numpy.sqrt(var) * self.std
+
+
+def expected_improvement(mu, sigma, best, xi=0.0):
+    """expected amount predictions (mu, sigma) fall below best (minimizing)"""
+    improvement = best - mu - xi
+    z = improvement / sigma
+    cdf = 0.5 * (1.0 + _erf(z / math.sqrt(2.0)).astype(float))
+    pdf = numpy.exp(-0.5 * z * z) / math.sqrt(2.0 * math.pi)
+    return improvement * cdf + sigma * pdf
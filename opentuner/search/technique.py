@@ -28,6 +28,9 @@ argparser.add_argument('--list-techniques', '-lt', action='store_true',
                        help="list techniques available and exit")
 argparser.add_argument('--generate-bandit-technique', '-gbt', action='store_true',
                        help="randomly generate a bandit to use")
+argparser.add_argument('--bandit-cost-aware', action='store_true',
+                       help="credit AUC bandit techniques by new bests per "
+                            "second of measurement rather than per test")
 
 
 class SearchTechniqueBase(with_metaclass(abc.ABCMeta, object)):
@@ -35,6 +38,11 @@ class SearchTechniqueBase(with_metaclass(abc.ABCMeta, object)):
     abstract base class for search techniques, with minimal interface
     """
 
+    # True if desired_results(count) produces a whole batch (e.g. a
+    # population or stencil) at once, meta techniques then ask for the rest
+    # of the generation rather than one result
+    batch_requests = False
+
     def __init__(self, name=None):
         super(SearchTechniqueBase, self).__init__()
         if name:
@@ -67,6 +75,19 @@ class SearchTechniqueBase(with_metaclass(abc.ABCMeta, object)):
         """
         return
 
+    def desired_results(self, count):
+        """
+        return a list of up to count resultsdb.models.DesiredResult objects,
+        or desired_result()'s None/False if there are none
+        """
+        rv = []
+        while len(rv) < count:
+            dr = self.desired_result()
+            if dr is None or dr is False:
+                return rv or dr
+            rv.append(dr)
+        return rv
+
 
 class SearchTechnique(SearchPlugin, SearchTechniqueBase):
     """
@@ -96,15 +117,27 @@ class SearchTechnique(SearchPlugin, SearchTechniqueBase):
             return None
         if cfg is False:
             return False
-        if type(cfg) is Configuration:
-            config = cfg
-        else:
-            config = self.driver.get_configuration(cfg)
+        return self.new_desired_result(self.driver.get_configuration(cfg))
+
+    def desired_results(self, count):
+        """
+        DesiredResults for a batch from desired_configurations(), hashed and
+        looked up together, or as desired_result() if it returns None
+        """
+        cfgs = self.desired_configurations(count)
+        if cfgs is None:
+            return super(SearchTechnique, self).desired_results(count)
+        if not cfgs:
+            return cfgs
+        return list(map(self.new_desired_result,
+                        self.driver.get_configurations(cfgs)))
+
+    def new_desired_result(self, config):
+        """a DesiredResult requested by this technique for a Configuration"""
         desired = DesiredResult(configuration=config,
                                 requestor=self.name,
                                 generation=self.driver.generation,
-                                request_date=datetime.now(),
-                                tuning_run=self.driver.tuning_run)
+                                request_date=datetime.now())
         if hasattr(self, 'limit'):
             desired.limit = self.limit
         self.driver.register_result_callback(desired, self.handle_requested_result)
@@ -121,6 +154,26 @@ class SearchTechnique(SearchPlugin, SearchTechniqueBase):
         """
         return dict()
 
+    def desired_configurations(self, count):
+        """
+        return a list of up to count cfgs (or Configurations) to test, or
+        None to request them one at a time from desired_configuration()
+        """
+        return None
+
+    def next_configurations(self, count):
+        """
+        up to count results of desired_configuration(), or its None/False
+        if there are none (helper for desired_configurations())
+        """
+        cfgs = []
+        while len(cfgs) < count:
+            cfg = self.desired_configuration()
+            if cfg is None or cfg is False:
+                return cfgs or cfg
+            cfgs.append(cfg)
+        return cfgs
+
     def handle_requested_result(self, result):
         """called for each new Result(), regardless of who requested it"""
         pass
@@ -196,6 +249,10 @@ class AsyncProceduralSearchTechnique(SearchTechnique):
         """passthrough (used in subclasses)"""
         return self.main_generator()
 
+    def desired_configurations(self, count):
+        """drain the generator until it stalls or count cfgs are yielded"""
+        return self.next_configurations(count)
+
     def desired_configuration(self):
         if self.gen is None:
             log.debug("%s: creating generator", self.name)
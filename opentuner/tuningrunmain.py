@@ -10,6 +10,7 @@ import uuid
 from datetime import datetime
 
 from opentuner import resultsdb
+from opentuner.driverbase import ResultIndex
 from opentuner.measurement.driver import MeasurementDriver
 from opentuner.search.driver import SearchDriver
 
@@ -22,6 +23,21 @@ argparser.add_argument('--print-search-space-size', action='store_true',
 argparser.add_argument('--database', help="database to store tuning results in")
 argparser.add_argument('--print-params', '-pp', action='store_true',
                        help='show parameters of the configuration being tuned')
+argparser.add_argument('--commit-every', type=int, metavar='N',
+                       help="commit results to the database after every N "
+                            "results")
+argparser.add_argument('--commit-interval', type=float, default=30.0,
+                       metavar='SECONDS',
+                       help="commit results to the database at least this "
+                            "often, 0 to only commit every --commit-every "
+                            "results and on shutdown")
+argparser.add_argument('--db-profile', default='default',
+                       choices=sorted(resultsdb.CONNECTION_PROFILES),
+                       help="database connection settings, 'wal' and 'fast' "
+                            "use write-ahead logging and larger caches for "
+                            "sqlite (see resultsdb.connect.CONNECTION_PROFILES)")
+argparser.add_argument('--sqlite-wal', dest='db_profile', action='store_const',
+                       const='wal', help="same as --db-profile wal")
 
 
 class CleanStop(Exception):
@@ -63,6 +79,10 @@ def init_logging():
 
 
 class TuningRunMain:
+    # True if other processes may claim this run's DesiredResults, in which
+    # case claims must be committed at once
+    shared_requests = False
+
     def __init__(self, measurement_interface, args, search_driver=SearchDriver, measurement_driver=MeasurementDriver):
         init_logging()
         manipulator = measurement_interface.manipulator()
@@ -85,6 +105,8 @@ class TuningRunMain:
 
         input_manager = measurement_interface.input_manager()
         objective = measurement_interface.objective()
+        if args.compare_bound:
+            objective.time_bound = args.compare_bound
 
         if not args.database:
             args.database = 'sqlite:///' + os.path.join('opentuner.db', socket.gethostname() + '.db')
@@ -95,7 +117,8 @@ class TuningRunMain:
 
         self.fake_commit = True
         self.args = args
-        self.engine, self.Session = resultsdb.connect(args.database)
+        self.engine, self.Session = resultsdb.connect(args.database,
+                                                      args.db_profile)
         self.session = self.Session()
         self.tuning_run = None
         self.search_driver_cls = search_driver
@@ -106,6 +129,7 @@ class TuningRunMain:
         self.objective = objective
         self.objective_copy = copy.copy(objective)
         self.last_commit_time = time.time()
+        self.uncommitted_results = 0
 
     def init(self):
         if self.tuning_run is None:
@@ -121,6 +145,8 @@ class TuningRunMain:
                 objective=self.objective_copy,
             )
             self.session.add(self.tuning_run)
+            self.result_index = ResultIndex(self.objective,
+                                            self.args.limit_window)
 
             driver_kwargs = {
                 'args': self.args,
@@ -128,6 +154,7 @@ class TuningRunMain:
                 'manipulator': self.manipulator,
                 'measurement_interface': self.measurement_interface,
                 'objective': self.objective,
+                'result_index': self.result_index,
                 'session': self.session,
                 'tuning_run_main': self,
                 'tuning_run': self.tuning_run,
@@ -142,18 +169,32 @@ class TuningRunMain:
             self.tuning_run.machine_class = self.measurement_driver.get_machine_class()
             self.tuning_run.input_class = self.input_manager.get_input_class()
 
-    def commit(self, force=False):
-        if force or not self.fake_commit or time.time() - self.last_commit_time > 30:
+    def commit(self, force=False, results=0):
+        """
+        commit the session if forced, every --commit-every results (counted
+        by the results argument) or every --commit-interval seconds.  Other
+        calls leave changes pending in the session, to be written in a single
+        transaction with later ones.
+        """
+        self.uncommitted_results += results
+        if (force or not self.fake_commit or
+                (self.args.commit_every and
+                 self.uncommitted_results >= self.args.commit_every) or
+                (self.args.commit_interval > 0 and
+                 time.time() - self.last_commit_time > self.args.commit_interval)):
             self.session.commit()
             self.last_commit_time = time.time()
-        else:
-            self.session.flush()
+            self.uncommitted_results = 0
 
     def main(self):
         self.init()
         try:
             self.tuning_run.state = 'RUNNING'
             self.commit(force=True)
+            if self.args.remote_measurement:
+                log.info('waiting for workers, start them with: opentuner-worker '
+                         '--database %s --tuning-run %s --interface MODULE:CLASS',
+                         self.args.database, self.tuning_run.uuid)
             self.search_driver.main()
             if self.search_driver.best_result:
                 self.measurement_interface.save_final_config(self.search_driver.best_result.configuration)
@@ -163,15 +204,28 @@ class TuningRunMain:
             self.tuning_run.state = 'ABORTED'
             raise
         finally:
+            self.measurement_driver.close()
             self.tuning_run.end_date = datetime.now()
             self.commit(force=True)
             self.session.close()
+            self.measurement_interface.close_harnesses()
+            if self.measurement_interface.artifact_cache is not None:
+                log.info(self.measurement_interface.artifact_cache.report())
 
     def results_wait(self, generation):
         self.measurement_interface.pre_process()
-        self.measurement_driver.process_all()
+        if self.args.remote_measurement:
+            self.measurement_driver.process_remote()
+        elif self.args.async_measurement:
+            self.measurement_driver.process_async()
+        else:
+            self.measurement_driver.process_all()
         self.measurement_interface.post_process()
 
+    def tests_in_flight(self):
+        """tests started by --async-measurement that have no result yet"""
+        return self.measurement_driver.tests_in_flight()
+
 
 def main(interface, args, *pargs, **kwargs):
     if inspect.isclass(interface):
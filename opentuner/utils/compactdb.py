@@ -34,11 +34,13 @@ def main(args):
              .filter(~Configuration.id.in_(session.query(Result.configuration_id)
                                            .filter_by(was_new_best=True)
                                            .subquery()))
-             .filter(Configuration.data != None))
+             .filter((Configuration._data != None) |
+                     (Configuration.packed != None)))
 
         log.info("%s: compacted %d of %d Configurations",
                  args.database,
-                 q.update({'data': None}, False),
+                 q.update({Configuration._data: None,
+                           Configuration.packed: None}, False),
                  config_count)
         session.commit()
 
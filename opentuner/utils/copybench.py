@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+benchmark ConfigurationManipulator.copy() against copy.deepcopy() on
+configurations of --params numeric parameters plus a few permutations
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import argparse
+import copy
+import timeit
+
+from opentuner.search import manipulator
+
+argparser = argparse.ArgumentParser()
+argparser.add_argument('--params', type=int, default=2000,
+                       help='numeric parameters in the configuration')
+argparser.add_argument('--permutations', type=int, default=4,
+                       help='permutation parameters of 100 items each')
+argparser.add_argument('--number', type=int, default=1000,
+                       help='copies per measurement')
+
+
+def build_manipulator(params, permutations):
+    m = manipulator.ConfigurationManipulator()
+    for i in range(params):
+        if i % 2:
+            m.add_parameter(manipulator.IntegerParameter('i%d' % i, 0, 100))
+        else:
+            m.add_parameter(manipulator.FloatParameter('f%d' % i, 0.0, 1.0))
+    for i in range(permutations):
+        m.add_parameter(manipulator.PermutationParameter('p%d' % i,
+                                                         list(range(100))))
+    return m
+
+
+def main(args):
+    m = build_manipulator(args.params, args.permutations)
+    cfg = m.random()
+    for name, fn in (('deepcopy', copy.deepcopy), ('copy', m.copy)):
+        elapsed = min(timeit.repeat(lambda: fn(cfg), number=args.number,
+                                    repeat=3))
+        print('%-10s %8.1fus' % (name, elapsed / args.number * 1e6))
+
+
+if __name__ == '__main__':
+    main(argparser.parse_args())
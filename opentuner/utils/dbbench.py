@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+benchmark the database connection profiles (see --db-profile) on an
+insert-heavy workload: a Configuration, DesiredResult and Result per test,
+committed every --commit-every tests, as TuningRunMain writes them
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+import opentuner
+from opentuner.resultsdb.models import *
+
+log = logging.getLogger('opentuner.utils.dbbench')
+
+argparser = argparse.ArgumentParser()
+argparser.add_argument('--tests', type=int, default=2000,
+                       help='tests to write per profile')
+argparser.add_argument('--commit-every', type=int, default=1,
+                       help='tests per transaction')
+argparser.add_argument('--profile', action='append',
+                       choices=sorted(opentuner.resultsdb.CONNECTION_PROFILES),
+                       help='profiles to run, default all')
+argparser.add_argument('--directory',
+                       help='where to create the databases, default a '
+                            'temporary directory')
+
+
+def run_profile(path, profile, tests, commit_every):
+    """write tests results to a new database at path, return elapsed seconds"""
+    engine, Session = opentuner.resultsdb.connect('sqlite:///' + path, profile)
+    session = Session()
+    program = Program.get(session, 'dbbench', 'dbbench')
+    version = ProgramVersion.get(session, 'dbbench', 'dbbench', 'v1')
+    tuning_run = TuningRun(uuid=uuid.uuid4().hex, name='dbbench',
+                           program_version=version, state='RUNNING')
+    session.add(tuning_run)
+    session.commit()
+
+    t0 = time.time()
+    for i in range(tests):
+        config = Configuration(program=program, hash='%032x' % i,
+                               data={'x': i})
+        result = Result(configuration=config, tuning_run=tuning_run,
+                        time=float(i), state='OK')
+        session.add(DesiredResult(configuration=config, tuning_run=tuning_run,
+                                  state='COMPLETE', result=result))
+        if (i + 1) % commit_every == 0:
+            session.commit()
+    session.commit()
+    elapsed = time.time() - t0
+    session.close()
+    engine.dispose()
+    return elapsed
+
+
+def main(args):
+    directory = args.directory or tempfile.mkdtemp()
+    try:
+        for profile in args.profile or sorted(opentuner.resultsdb.CONNECTION_PROFILES):
+            path = os.path.join(directory, 'dbbench-%s.db' % profile)
+            elapsed = run_profile(path, profile, args.tests, args.commit_every)
+            print('%-8s %6.2fs %8.0f tests/s' % (profile, elapsed,
+                                                 args.tests / elapsed))
+    finally:
+        if args.directory is None:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    opentuner.tuningrunmain.init_logging()
+    main(argparser.parse_args())
@@ -0,0 +1,27 @@
+from opentuner.resultsdb.models import Configuration
+
+
+class FakeDriver(object):
+    """
+    stands in for a SearchDriver when testing techniques and plugins without
+    a database
+    """
+    best_result = None
+    generation = 0
+    tuning_run = None
+
+    def __init__(self, manipulator=None, objective=None):
+        self.manipulator = manipulator
+        self.objective = objective
+
+    def add_plugin(self, plugin):
+        pass
+
+    def register_result_callback(self, desired_result, callback):
+        pass
+
+    def get_configuration(self, cfg):
+        return self.get_configurations([cfg])[0]
+
+    def get_configurations(self, cfgs):
+        return [Configuration(hash=repr(cfg), data=cfg) for cfg in cfgs]
@@ -0,0 +1,170 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import opentuner
+from opentuner import Result
+from opentuner.measurement import MeasurementInterface
+from opentuner.measurement.artifacts import ArtifactCache
+from opentuner.search import manipulator
+from opentuner.tuningrunmain import TuningRunMain
+
+
+class ArtifactCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ArtifactCache(os.path.join(self.directory, 'cache'),
+                                   max_bytes=25)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as fd:
+            fd.write(data)
+        return path
+
+    def test_store_and_restore(self):
+        digest = self.cache.store(('a', 1), [self.write('bin', 'program a')],
+                                  'ok')
+        self.assertEqual(self.cache.lookup(('a', 1)), (digest, 'ok'))
+        self.assertIsNone(self.cache.lookup(('a', 2)))
+        target = os.path.join(self.directory, 'out', 'bin')
+        self.assertTrue(self.cache.restore(digest, [target]))
+        with open(target) as fd:
+            self.assertEqual(fd.read(), 'program a')
+        # a new cache object finds artifacts stored by an earlier one
+        reopened = ArtifactCache(self.cache.directory)
+        self.assertEqual(reopened.lookup(('a', 1)), (digest, 'ok'))
+
+    def test_identical_artifacts_are_shared(self):
+        first = self.cache.store('a', [self.write('bin', 'same')], 'ok')
+        second = self.cache.store('b', [self.write('bin', 'same')], 'ok')
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.shared, 1)
+        self.cache.add_result(first, 0, Result(time=2.0))
+        self.cache.add_result(first, 1, Result(state='TIMEOUT'))
+        shared = self.cache.shared_result(second, 0)
+        self.assertEqual(shared.time, 2.0)
+        self.assertTrue(shared.extra['artifact_shared'])
+        self.assertIsNone(self.cache.shared_result(second, 1))
+
+    def test_evicts_least_recently_used(self):
+        a = self.cache.store('a', [self.write('bin', 'a' * 10)], 'ok')
+        b = self.cache.store('b', [self.write('bin', 'b' * 10)], 'ok')
+        os.utime(self.cache.object_path(b), (1, 1))  # a was used after b
+        self.cache.store('c', [self.write('bin', 'c' * 10)], 'ok')
+        self.assertIsNotNone(self.cache.lookup('a'))
+        self.assertIsNone(self.cache.lookup('b'))
+        self.assertIsNotNone(self.cache.lookup('c'))
+
+    def test_size_cap_covers_every_process(self):
+        other = ArtifactCache(self.cache.directory, max_bytes=25)
+        self.cache.store('a', [self.write('bin', 'a' * 10)], 'ok')
+        other.store('b', [self.write('bin', 'b' * 10)], 'ok')
+        self.assertIsNotNone(self.cache.lookup('b'))  # stored by the other
+        other.store('c', [self.write('bin', 'c' * 10)], 'ok')
+        self.assertEqual(len(self.cache.scan()), 2)
+
+    def test_failed_compile_is_remembered(self):
+        missing = os.path.join(self.directory, 'missing')
+        self.assertIsNone(self.cache.store('bad', [missing], 'error',
+                                           failed=True))
+        self.assertEqual(self.cache.lookup('bad'), (None, 'error'))
+        # missing files of a compile not marked failed are not cached
+        self.assertIsNone(self.cache.store(
+            'partial', [self.write('bin', 'a'), missing], 'ok'))
+        self.assertIsNone(self.cache.lookup('partial'))
+
+
+class CompilingInterface(MeasurementInterface):
+    """
+    x compiles to a program printing x // 10, x < 0 fails and x >= 100 times
+    out
+    """
+
+    def __init__(self, *pargs, **kwargs):
+        super(CompilingInterface, self).__init__(*pargs, **kwargs)
+        self.parallel_compile = True
+        self.compiles = 0
+        self.runs = 0
+
+    def manipulator(self):
+        return manipulator.ConfigurationManipulator(
+            [manipulator.IntegerParameter('x', 0, 99)])
+
+    def artifact_paths(self, id):
+        return [os.path.join('build', str(id))]
+
+    def compile(self, config_data, id):
+        self.compiles += 1
+        if config_data['x'] < 0:
+            return 'error'  # writes nothing
+        if config_data['x'] >= 100:
+            return 'timeout'
+        if not os.path.isdir('build'):
+            os.mkdir('build')
+        with open(self.artifact_paths(id)[0], 'w') as fd:
+            fd.write(str(config_data['x'] // 10))
+
+    def compile_failed(self, compile_result):
+        return compile_result == 'error'
+
+    def run_precompiled(self, desired_result, input, limit, compile_result,
+                        id):
+        self.runs += 1
+        with open(self.artifact_paths(id)[0]) as fd:
+            return Result(time=float(fd.read()))
+
+
+class CachedCompileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # TuningRunMain logs to opentuner.log in the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.directory)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def run_tuning(self):
+        args = opentuner.default_argparser().parse_args(
+            ['--database', 'sqlite://', '--quiet', '--test-limit', '60',
+             '--no-dups', '--technique', 'UniformGreedyMutation10',
+             '--artifact-cache', 'cache'])
+        interface = CompilingInterface(args=args, project_name='test',
+                                       program_name='artifacts',
+                                       program_version='1')
+        TuningRunMain(interface, args).main()
+        return interface
+
+    def test_compiles_and_measures_each_artifact_once(self):
+        interface = self.run_tuning()
+        cache = interface.artifact_cache
+        self.assertEqual(interface.compiles, cache.misses)
+        # 10 distinct programs, and each is measured once
+        self.assertLessEqual(len(cache.scan()), 10)
+        self.assertEqual(interface.runs, len(cache.scan()))
+        self.assertGreater(cache.shared_measurements, 0)
+        # the next run finds the earlier configurations in the cache
+        interface = self.run_tuning()
+        self.assertGreater(interface.artifact_cache.hits, 0)
+
+    def test_failed_compiles_are_not_repeated(self):
+        args = opentuner.default_argparser().parse_args(
+            ['--artifact-cache', 'cache'])
+        interface = CompilingInterface(args=args)
+        for id in (1, 2):
+            self.assertEqual(interface.cached_compile({'x': -1}, id), 'error')
+        self.assertEqual(interface.compiles, 1)
+        self.assertEqual(interface.artifact_cache.hits, 1)
+        # timeouts may not recur, so they are compiled again
+        for id in (1, 2):
+            self.assertEqual(interface.cached_compile({'x': 100}, id),
+                             'timeout')
+        self.assertEqual(interface.compiles, 3)
@@ -1,7 +1,8 @@
 import math
 
 from opentuner.resultsdb.models import Result, Configuration, Program
-from opentuner.search.objective import MaximizeAttribute, MinimizeAttribute
+from opentuner.search.objective import (MaximizeAttribute, MinimizeAttribute,
+                                       MinimizeTime)
 
 
 def test_result_extra_persistence(tmp_path, Session=None):
@@ -26,4 +27,13 @@ def test_objective_with_custom_metric_compare():
     min_lat.set_driver(type('D', (), {})())
     r3 = Result(time=1.0).update_attributes({'latency_ms': 5.0})
     r4 = Result(time=1.0).update_attributes({'latency_ms': 10.0})
-    assert min_lat.result_compare(r3, r4) < 0  # r3 better (lower latency) 
\ No newline at end of file
+    assert min_lat.result_compare(r3, r4) < 0  # r3 better (lower latency) 
+
+
+def test_limit_basis_depends_on_objective():
+    r = Result(time=2.0).update_attributes({'qps': 100.0})
+    assert MinimizeTime().limit_basis(r) == 2.0
+    assert MinimizeAttribute('time').limit_basis(r) == 2.0
+    # run time does not decide these, so tests should not be cut short
+    assert MaximizeAttribute('qps').limit_basis(r) is None
+    assert MinimizeAttribute('latency_ms').limit_basis(r) is None
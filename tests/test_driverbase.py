@@ -0,0 +1,53 @@
+import unittest
+
+from opentuner.driverbase import ResultIndex
+from opentuner.resultsdb.models import Configuration, Result
+from opentuner.search.objective import MinimizeTime
+
+
+class ResultIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ResultIndex(MinimizeTime())
+        self.cfg_a = Configuration(hash='a', data={'x': 1})
+        self.cfg_b = Configuration(hash='b', data={'x': 2})
+
+    def add(self, config, time):
+        result = Result(configuration=config, time=time)
+        self.index.add(result)
+        return result
+
+    def test_lookup_by_configuration(self):
+        self.assertFalse(self.index.has_results(self.cfg_a))
+        r1 = self.add(self.cfg_a, 3.0)
+        r2 = self.add(self.cfg_a, 2.0)
+        self.assertTrue(self.index.has_results(self.cfg_a))
+        self.assertFalse(self.index.has_results(self.cfg_b))
+        self.assertEqual(self.index.results_for(self.cfg_a), [r1, r2])
+        self.assertEqual(self.index.results_for(self.cfg_b), [])
+        self.assertIs(self.index.best_for(self.cfg_a), r2)
+        self.assertIsNone(self.index.best_for(self.cfg_b))
+
+    def test_global_best_and_count(self):
+        self.add(self.cfg_a, 3.0)
+        r2 = self.add(self.cfg_b, 1.0)
+        self.add(self.cfg_a, 2.0)
+        self.assertIs(self.index.best, r2)
+        self.assertEqual(self.index.count(), 3)
+
+    def test_pop_new_results(self):
+        r1 = self.add(self.cfg_a, 3.0)
+        r2 = self.add(self.cfg_b, 1.0)
+        self.assertEqual(self.index.pop_new_results(), [r1, r2])
+        self.assertEqual(self.index.pop_new_results(), [])
+        r3 = self.add(self.cfg_b, 4.0)
+        self.assertEqual(self.index.pop_new_results(), [r3])
+
+    def test_recent_limit_percentile(self):
+        self.assertIsNone(self.index.recent_limit_percentile(50))
+        for i in range(10):
+            self.add(self.cfg_a, float(10 - i))
+        self.add(self.cfg_b, float('inf'))  # killed, not a good result
+        self.assertEqual(self.index.recent_limit_percentile(0), 1.0)
+        self.assertEqual(self.index.recent_limit_percentile(90), 9.0)
+        self.assertEqual(self.index.recent_limit_percentile(100), 10.0)
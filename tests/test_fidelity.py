@@ -0,0 +1,51 @@
+import unittest
+
+from opentuner.measurement.fidelity import SuccessiveHalving
+from opentuner.resultsdb.models import Result
+from opentuner.search.objective import MinimizeTime
+
+
+class SuccessiveHalvingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.halving = SuccessiveHalving(MinimizeTime(), rate=2, grace=2)
+        self.inputs = ['small', 'large']
+
+    def measure(self, time, desired_result=None):
+        measured = []
+
+        def measure_on(input):
+            measured.append(input)
+            return Result(time=time if input == 'small' else 10 * time)
+
+        desired_result = desired_result or object()
+        result = self.halving.measure(desired_result, self.inputs, measure_on)
+        return result, measured, self.halving.pop_stages(desired_result)
+
+    def test_grace(self):
+        for time in (5.0, 4.0):
+            result, measured, _ = self.measure(time)
+            self.assertEqual(measured, self.inputs)
+            self.assertEqual(result.time, 10 * time)
+
+    def test_promotes_top_fraction(self):
+        for time in (1.0, 2.0):
+            self.measure(time)
+        result, measured, (input, lower) = self.measure(3.0)
+        self.assertEqual(measured, ['small'])
+        self.assertEqual(result.state, 'TIMEOUT')
+        self.assertEqual(result.time, float('inf'))
+        self.assertEqual(result.get_attribute('fidelity_time'), 3.0)
+        self.assertEqual(input, 'small')
+        self.assertEqual([r.time for _, r in lower], [3.0])
+        result, measured, (input, lower) = self.measure(0.5)
+        self.assertEqual(result.time, 5.0)
+        self.assertEqual(input, 'large')
+        self.assertEqual(self.halving.stopped, 1)
+
+    def test_failures_are_reported(self):
+        result, measured, (input, lower) = self.measure(float('inf'))
+        self.assertEqual(measured, ['small'])
+        self.assertEqual(result.time, float('inf'))
+        self.assertEqual(lower, [])
+        self.assertEqual(self.halving.stopped, 0)
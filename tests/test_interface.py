@@ -0,0 +1,56 @@
+import sys
+import time
+import unittest
+
+import opentuner
+from opentuner.measurement.interface import DefaultMeasurementInterface
+
+HARNESS = [sys.executable, '-c', 'import os, time\n'
+           'from opentuner.measurement.harness import serve\n'
+           'serve(lambda config, limit: {"time": config["s"], "pid": os.getpid()}\n'
+           '      if not time.sleep(config["s"]) else None)']
+
+
+class CallProgramTests(unittest.TestCase):
+
+    def setUp(self):
+        args = opentuner.default_argparser().parse_args([])
+        self.interface = DefaultMeasurementInterface(args)
+
+    def tearDown(self):
+        self.interface.close_harnesses()
+
+    def test_output_and_returncode(self):
+        rv = self.interface.call_program('echo out; echo err >&2; exit 3')
+        self.assertEqual(rv['stdout'], b'out\n')
+        self.assertEqual(rv['stderr'], b'err\n')
+        self.assertEqual(rv['returncode'], 3)
+        self.assertFalse(rv['timeout'])
+
+    def test_limit(self):
+        t0 = time.time()
+        rv = self.interface.call_program('sleep 10', limit=0.2)
+        self.assertTrue(rv['timeout'])
+        self.assertEqual(rv['time'], float('inf'))
+        self.assertLess(time.time() - t0, 5)
+
+    def test_huge_limit(self):
+        rv = self.interface.call_program('true', limit=3600.0 * 24 * 365 * 10)
+        self.assertFalse(rv['timeout'])
+        rv = self.interface.call_harness(HARNESS, {'s': 0},
+                                         limit=3600.0 * 24 * 365 * 10)
+        self.assertFalse(rv['timeout'])
+
+    def test_harness_is_reused(self):
+        r1 = self.interface.call_harness(HARNESS, {'s': 0})
+        r2 = self.interface.call_harness(HARNESS, {'s': 0.01})
+        self.assertEqual(r1['pid'], r2['pid'])
+        self.assertEqual(r2['time'], 0.01)
+        self.assertEqual(len(self.interface.harnesses), 1)
+
+    def test_harness_restarted_after_timeout(self):
+        r1 = self.interface.call_harness(HARNESS, {'s': 0})
+        rv = self.interface.call_harness(HARNESS, {'s': 10}, limit=0.2)
+        self.assertTrue(rv['timeout'])
+        r2 = self.interface.call_harness(HARNESS, {'s': 0})
+        self.assertNotEqual(r1['pid'], r2['pid'])
@@ -1,3 +1,7 @@
+import os
+import random
+import subprocess
+import sys
 import unittest
 from builtins import next
 from builtins import range
@@ -259,3 +263,333 @@ class FloatArrayOperatorTests(unittest.TestCase):
         self.assertEqual(len(val), len(expected))
         for i in range(len(val)):
             self.assertAlmostEqual(val[i], expected[i])
+
+
+class VectorSpaceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.manipulator = manipulator.ConfigurationManipulator()
+        for param in [manipulator.IntegerParameter('i', -5, 5),
+                      manipulator.FloatParameter('f', 0.0, 2.0),
+                      manipulator.IntegerParameter('one', 3, 3),
+                      manipulator.LogIntegerParameter('li', 1, 1000),
+                      manipulator.LogFloatParameter('lf', 0.5, 100.0),
+                      manipulator.PowerOfTwoParameter('p2', 1, 1024),
+                      manipulator.EnumParameter('e', ['a', 'b', 'c'])]:
+            self.manipulator.add_parameter(param)
+        self.space = self.manipulator.vector_space()
+        self.numeric = [p for p in self.manipulator.params if p.is_primitive()]
+
+    def test_partition(self):
+        self.assertEqual(self.space.params, self.numeric)
+        self.assertEqual([p.name for p in self.space.other_params], ['e'])
+
+    def test_random_seed_reproduces_draws(self):
+        runs = []
+        for _ in range(2):
+            random.seed(3)
+            cfg = self.manipulator.random()
+            self.space.normal_mutation(cfg)
+            self.space.swarm(cfg, self.manipulator.random(),
+                             self.manipulator.random())
+            runs.append(cfg)
+        self.assertEqual(runs[0], runs[1])
+
+    def test_unit_matches_parameters(self):
+        for _ in range(20):
+            cfg = self.manipulator.random()
+            self.assertTrue(self.manipulator.validate(cfg))
+            unit = self.space.unit(cfg)
+            for p, u in zip(self.numeric, unit):
+                self.assertAlmostEqual(p.get_unit_value(cfg), u)
+
+            expected = self.manipulator.copy(cfg)
+            target = numpy.random.random(len(self.space))
+            for p, u in zip(self.numeric, target):
+                p.set_unit_value(expected, u)
+            self.space.set_unit(cfg, target)
+            self.assertEqual(cfg, expected)
+            self.assertEqual(type(cfg['i']), int)
+            self.assertEqual(type(cfg['f']), float)
+
+    def test_linear_config_matches_parameters(self):
+        cfgs = [self.manipulator.random() for _ in range(3)]
+        expected = self.manipulator.copy(cfgs[0])
+        for p in self.numeric:
+            p.op4_set_linear(expected, cfgs[0], cfgs[1], cfgs[2],
+                             1.0, 0.7, -0.7)
+        actual = self.manipulator.linear_config(1.0, cfgs[0], 0.7, cfgs[1],
+                                                -0.7, cfgs[2])
+        for p in self.numeric:
+            self.assertEqual(p.get_value(actual), p.get_value(expected))
+
+    def test_normal_mutation_mask(self):
+        cfg = self.manipulator.random()
+        before = self.manipulator.copy(cfg)
+        mask = numpy.zeros(len(self.space), dtype=bool)
+        mask[1] = True
+        self.space.normal_mutation(cfg, sigma=0.5, mask=mask)
+        self.assertTrue(self.manipulator.validate(cfg))
+        for p in self.numeric:
+            if p.name != 'f':
+                self.assertEqual(p.get_value(cfg), p.get_value(before))
+
+    def test_swarm_stays_in_range(self):
+        cfgs = [self.manipulator.random() for _ in range(3)]
+        velocity = numpy.zeros(len(self.space))
+        for _ in range(50):
+            velocity = self.space.swarm(cfgs[0], cfgs[1], cfgs[2],
+                                        velocity=velocity)
+            for p in self.numeric:
+                low, high = p.legal_range(cfgs[0])
+                self.assertTrue(low <= p.get_value(cfgs[0]) <= high)
+
+    def test_no_numeric_parameters(self):
+        m = manipulator.ConfigurationManipulator(
+            [manipulator.EnumParameter('e', ['a', 'b'])])
+        self.assertIsNone(m.vector_space())
+
+
+class CopyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.manipulator = manipulator.ConfigurationManipulator()
+        for param in [manipulator.IntegerParameter('i', 0, 10),
+                      manipulator.EnumParameter('e', [[1], [2]]),
+                      manipulator.PermutationParameter('p', [0, 1, 2, 3]),
+                      manipulator.FloatArray('a', 4, 1.0, 0.0),
+                      manipulator.SelectorParameter('s', ['x', 'y'], 8)]:
+            self.manipulator.add_parameter(param)
+
+    def test_copy_is_independent(self):
+        cfg = self.manipulator.random()
+        cfg['extra'] = {'k': [1]}
+        cfg2 = self.manipulator.copy(cfg)
+        self.assertEqual(sorted(cfg2), sorted(cfg))
+        for name in ('i', 'e', 'p', 's', 'extra'):
+            self.assertEqual(cfg2[name], cfg[name])
+        numpy.testing.assert_array_equal(cfg2['a'], cfg['a'])
+        for name in ('e', 'p', 'a', 's', 'extra'):
+            self.assertIsNot(cfg2[name], cfg[name])
+        cfg2['p'].reverse()
+        cfg2['a'] += 1
+        cfg2['s']['order'].reverse()
+        self.assertNotEqual(cfg2['p'], cfg['p'])
+        self.assertFalse(numpy.array_equal(cfg2['a'], cfg['a']))
+        self.assertNotEqual(cfg2['s'], cfg['s'])
+
+    def test_seed_config_is_copied(self):
+        m = manipulator.ConfigurationManipulator(
+            [manipulator.PermutationParameter('p', [0, 1, 2])],
+            seed_config={'p': [2, 1, 0]})
+        m.seed_config()['p'].reverse()
+        self.assertEqual(m.seed_config(), {'p': [2, 1, 0]})
+
+
+class HashConfigTests(unittest.TestCase):
+
+    def setUp(self):
+        self.manipulator = manipulator.ConfigurationManipulator()
+        for param in [manipulator.IntegerParameter('x', 0, 10),
+                      manipulator.EnumParameter('e', ['a', 'b']),
+                      manipulator.FloatArray('a', 2000, 1.0, 0.0)]:
+            self.manipulator.add_parameter(param)
+
+    def test_equal_configs_hash_equal(self):
+        cfg = self.manipulator.random()
+        self.assertEqual(self.manipulator.hash_config(cfg),
+                         self.manipulator.hash_config(self.manipulator.copy(cfg)))
+
+    def test_changes_change_hash(self):
+        cfg = self.manipulator.random()
+        hashes = set([self.manipulator.hash_config(cfg)])
+        cfg['x'] = (cfg['x'] + 1) % 11
+        hashes.add(self.manipulator.hash_config(cfg))
+        cfg['x'] = float(cfg['x'])
+        hashes.add(self.manipulator.hash_config(cfg))
+        cfg['a'] = cfg['a'].copy()
+        cfg['a'][0, 1000] += 0.5  # not shown by repr()
+        hashes.add(self.manipulator.hash_config(cfg))
+        cfg['e'] = object()  # not marshallable
+        hashes.add(self.manipulator.hash_config(cfg))
+        self.assertEqual(len(hashes), 5)
+
+    def test_legacy_hash(self):
+        m = manipulator.ConfigurationManipulator(
+            [manipulator.IntegerParameter('x', 0, 10),
+             manipulator.EnumParameter('e', ['a', 'b'])])
+        cfg = {'x': 3, 'e': 'b'}
+        expected = ('769f50e277b91bba1263beea40b9ceaa'
+                    '74eb70052849ac2f91b6fa94f733b53c')
+        self.assertNotEqual(m.hash_config(cfg), expected)
+        m.legacy_hash = True
+        self.assertEqual(m.hash_config(cfg), expected)
+
+
+class ConstraintTests(unittest.TestCase):
+
+    def setUp(self):
+        self.manipulator = manipulator.ConfigurationManipulator(
+            [manipulator.IntegerParameter('tile', 1, 64),
+             manipulator.IntegerParameter('n', 32, 64),
+             manipulator.BooleanParameter('unroll'),
+             manipulator.IntegerParameter('unroll-factor', 0, 16),
+             manipulator.EnumParameter('order', ['ij', 'ji'])],
+            constraints=[
+                manipulator.DivisibilityConstraint('tile', 'n'),
+                manipulator.Requires('unroll-factor', 'unroll',
+                                     inactive_value=0),
+                manipulator.ForbiddenCombination({'order': 'ji',
+                                                  'unroll': True}),
+                manipulator.LinearConstraint({'tile': 1, 'n': 1}, upper=100)])
+
+    def cfg(self, **values):
+        cfg = {'tile': 8, 'n': 64, 'unroll': False, 'unroll-factor': 0,
+               'order': 'ij'}
+        cfg.update(values)
+        return cfg
+
+    def test_feasible(self):
+        cfgs = [self.cfg(), self.cfg(tile=7), self.cfg(**{'unroll-factor': 4}),
+                self.cfg(unroll=True, order='ji'), self.cfg(tile=64, n=64),
+                self.cfg(unroll=True, **{'unroll-factor': 4})]
+        self.assertEqual(self.manipulator.feasible(cfgs).tolist(),
+                         [True, False, False, False, False, True])
+        self.assertTrue(self.manipulator.validate(cfgs[0]))
+        self.assertFalse(self.manipulator.validate(cfgs[1]))
+
+    def test_repair(self):
+        cfg = self.cfg(tile=7, n=60, **{'unroll-factor': 4})
+        self.assertTrue(self.manipulator.repair(cfg))
+        self.assertEqual(cfg['tile'], 6)  # the divisor of 60 closest to 7
+        self.assertEqual(cfg['unroll-factor'], 0)
+        for _ in range(50):
+            cfg = self.manipulator.random()
+            self.assertTrue(self.manipulator.repair(cfg))
+            self.assertTrue(self.manipulator.validate(cfg))
+
+    def test_requires_default_inactive_value(self):
+        m = manipulator.ConfigurationManipulator(
+            [manipulator.BooleanParameter('f'),
+             manipulator.IntegerParameter('k', 2, 9)],
+            constraints=[manipulator.Requires('k', 'f')])
+        self.assertEqual(m.feasible([{'f': False, 'k': 2}, {'f': False, 'k': 5},
+                                     {'f': True, 'k': 5}]).tolist(),
+                         [True, False, True])
+        cfg = {'f': False, 'k': 5}
+        self.assertTrue(m.repair(cfg))
+        self.assertEqual(cfg, {'f': False, 'k': 2})
+        m.add_constraint(manipulator.Requires('k', 'f', inactive_value=10))
+        self.assertRaises(ValueError, m.feasible, [cfg])
+
+    def test_log_scaled_parameters(self):
+        m = manipulator.ConfigurationManipulator(
+            [manipulator.LogIntegerParameter('t', 1, 64),
+             manipulator.BooleanParameter('f'),
+             manipulator.LogIntegerParameter('k', 1, 1024)],
+            constraints=[manipulator.DivisibilityConstraint('t', 48),
+                         manipulator.LinearConstraint({'t': 1}, upper=10),
+                         manipulator.Requires('k', 'f')])
+        self.assertEqual(m.feasible([{'t': 6, 'f': False, 'k': 1},
+                                     {'t': 5, 'f': False, 'k': 1},
+                                     {'t': 64, 'f': True, 'k': 7},
+                                     {'t': 8, 'f': False, 'k': 2}]).tolist(),
+                         [True, False, False, False])
+        cfg = {'t': 5, 'f': False, 'k': 300}
+        self.assertTrue(m.repair(cfg))
+        self.assertEqual(cfg['t'], 4)  # the divisor of 48 closest to 5
+        self.assertEqual(cfg['k'], 1)
+
+    def test_function_constraint(self):
+        m = manipulator.ConfigurationManipulator(
+            [manipulator.IntegerParameter('a', 0, 10),
+             manipulator.IntegerParameter('b', 0, 10)],
+            constraints=[manipulator.FunctionConstraint(
+                ['a', 'b'], lambda a, b: a < b)])
+        m.add_constraint(manipulator.FunctionConstraint(
+            ['a'], lambda a: a % 2 == 0, vectorized=True))
+        self.assertEqual(m.feasible([{'a': 2, 'b': 3}, {'a': 3, 'b': 2},
+                                     {'a': 1, 'b': 2}]).tolist(),
+                         [True, False, False])
+        self.assertEqual(len(m.violated_constraints({'a': 3, 'b': 2})), 2)
+
+
+class ConditionTests(unittest.TestCase):
+
+    def setUp(self):
+        # inline-limit and its sub-knob only matter when inlining is on
+        self.manipulator = manipulator.ConfigurationManipulator(
+            [manipulator.EnumParameter('inline', ['off', 'on', 'always']),
+             manipulator.FloatParameter('x', 0.0, 1.0)])
+        self.manipulator.add_parameter(
+            manipulator.IntegerParameter('inline-limit', 10, 1000),
+            condition=manipulator.Condition('inline', ['on', 'always']))
+        self.manipulator.add_parameter(
+            manipulator.BooleanParameter('inline-recursive'),
+            condition=manipulator.Condition('inline-limit', list(range(10, 20))))
+
+    def cfg(self, **values):
+        cfg = {'inline': 'on', 'x': 0.5, 'inline-limit': 15,
+               'inline-recursive': True}
+        cfg.update(values)
+        return cfg
+
+    def test_active_parameters(self):
+        m = self.manipulator
+        self.assertEqual(m.inactive_names(self.cfg()), set())
+        self.assertEqual(m.inactive_names(self.cfg(**{'inline-limit': 100})),
+                         {'inline-recursive'})
+        self.assertEqual(m.inactive_names(self.cfg(inline='off')),
+                         {'inline-limit', 'inline-recursive'})
+        self.assertEqual(
+            sorted(p.name for p in m.active_parameters(self.cfg(inline='off'))),
+            ['inline', 'x'])
+
+    def test_inactive_values_hash_the_same(self):
+        m = self.manipulator
+        cfg1 = self.cfg(inline='off', **{'inline-limit': 20})
+        cfg2 = self.cfg(inline='off', **{'inline-limit': 500,
+                                         'inline-recursive': False})
+        self.assertEqual(m.hash_config(cfg1), m.hash_config(cfg2))
+        self.assertNotEqual(m.hash_config(self.cfg()),
+                            m.hash_config(self.cfg(**{'inline-limit': 16})))
+        # inactive values equal the packing reference, so are not stored
+        _, reference = m.packing_schema()
+        self.assertEqual(cfg1['inline-limit'], reference['inline-limit'])
+        for _ in range(20):
+            cfg = m.random()
+            for name in m.inactive_names(cfg):
+                self.assertEqual(cfg[name], reference[name])
+
+    def test_inactive_values_same_in_every_process(self):
+        script = '\n'.join([
+            'import random, sys, numpy',
+            'from opentuner.search import manipulator as m',
+            'random.seed(int(sys.argv[1]))',
+            'numpy.random.seed(int(sys.argv[1]))',
+            'cm = m.ConfigurationManipulator([m.BooleanParameter(\'on\')])',
+            'for p in [m.BooleanArray(\'b\', 8), m.FloatArray(\'f\', 4, 2.0, 1.0),',
+            '          m.ScheduleParameter(\'s\', [1, 2, 3], {1: [2]})]:',
+            '    cm.add_parameter(p, condition=m.Condition(\'on\', True))',
+            'cfg = cm.random()',
+            'cfg[\'on\'] = False',
+            'print(cm.hash_config(cfg))'])
+        hashes = set(
+            subprocess.check_output([sys.executable, '-c', script, str(seed)],
+                                    cwd=os.path.dirname(os.path.dirname(
+                                        os.path.abspath(__file__))))
+            for seed in (1, 2))
+        self.assertEqual(len(hashes), 1)
+
+    def test_search_space_size(self):
+        # off, plus on/always times (10 limits with the boolean + 981 without)
+        self.assertEqual(self.manipulator.search_space_size(),
+                         2 ** 32 * (1 + 2 * (10 * 2 + 981)))
+
+    def test_mutation_skips_inactive(self):
+        cfg = self.cfg(inline='off')
+        m = self.manipulator
+        m.normalize(cfg)
+        for _ in range(20):
+            m.vector_space().normal_mutation(cfg, sigma=0.3)
+            self.assertEqual(cfg['inline-limit'], 10)
@@ -0,0 +1,184 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import opentuner
+from opentuner import Result
+from opentuner.measurement import MeasurementInterface
+from opentuner.measurement.driver import CpuSlots
+from opentuner.measurement.worker import TuningRunWorker
+from opentuner.resultsdb.models import DesiredResult
+from opentuner.search import manipulator
+from opentuner.tuningrunmain import TuningRunMain
+
+
+class SleepInterface(MeasurementInterface):
+    """x is the time, each test sleeps briefly and tracks how many overlap"""
+
+    def __init__(self, *pargs, **kwargs):
+        self.fail_at = kwargs.pop('fail_at', None)
+        super(SleepInterface, self).__init__(*pargs, **kwargs)
+        self.lock = threading.Lock()
+        self.started = 0
+        self.running = 0
+        self.max_running = 0
+        self.affinities = []
+
+    def manipulator(self):
+        return manipulator.ConfigurationManipulator(
+            [manipulator.IntegerParameter('x', 0, 1000)])
+
+    def run(self, desired_result, input, limit):
+        with self.lock:
+            self.started += 1
+            n = self.started
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            if hasattr(os, 'sched_getaffinity'):
+                self.affinities.append(os.sched_getaffinity(0))
+        try:
+            if n == self.fail_at:
+                time.sleep(0.5)  # let the other tests start
+                raise RuntimeError('measurement failed')
+            if self.fail_at is not None:
+                self.call_program('sleep 30')
+            else:
+                time.sleep(0.05)
+            return Result(time=float(desired_result.configuration.data['x']))
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+class MeasurementDriverTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # TuningRunMain logs to opentuner.log in the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.directory)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def main(self, argv, database='sqlite://', **kwargs):
+        args = opentuner.default_argparser().parse_args(
+            ['--database', database, '--quiet', '--no-dups',
+             '--technique', 'UniformGreedyMutation10'] + argv)
+        interface = SleepInterface(args=args, project_name='test',
+                                   program_name='sleep', program_version='1',
+                                   **kwargs)
+        return TuningRunMain(interface, args), interface
+
+    def test_async_measurement(self):
+        main, interface = self.main(['--async-measurement', '--parallelism', '3',
+                                     '--test-limit', '12'])
+        main.main()
+        self.assertGreater(interface.max_running, 1)
+        self.assertLessEqual(interface.max_running, 3)
+        # every test started was reported
+        self.assertEqual(main.measurement_driver.results_query().count(),
+                         interface.started)
+        self.assertIsNone(main.measurement_driver.async_pool)
+
+    def test_async_error_stops_tests_in_flight(self):
+        main, interface = self.main(['--async-measurement', '--parallelism', '3',
+                                     '--test-limit', '12'], fail_at=3)
+        t0 = time.time()
+        self.assertRaises(RuntimeError, main.main)
+        # the other tests were killed rather than left to sleep 30 seconds
+        self.assertLess(time.time() - t0, 20)
+        self.assertEqual(interface.running, 0)
+        self.assertIsNone(main.measurement_driver.async_pool)
+
+    def test_async_error_reports_completed_tests(self):
+        main, interface = self.main(['--async-measurement'])
+        main.init()
+        driver = main.measurement_driver
+        drs = [DesiredResult(
+            configuration=main.search_driver.get_configuration({'x': x}),
+            tuning_run=main.tuning_run, state='RUNNING') for x in (1, 2)]
+        main.session.add_all(drs)
+        main.session.flush()
+        for dr in drs:
+            driver.in_flight[dr.id] = dr
+        # the failed test completed before the other one
+        driver.async_completed.put((drs[0], driver.prepare_desired_result(
+            drs[0]), None, 0.0, RuntimeError('measurement failed')))
+        driver.async_completed.put((drs[1], driver.prepare_desired_result(
+            drs[1]), Result(time=2.0), 0.0, None))
+        self.assertRaises(RuntimeError, driver.process_async)
+        self.assertEqual(drs[1].state, 'COMPLETE')
+        self.assertEqual(drs[1].result.time, 2.0)
+        self.assertEqual(driver.in_flight, {})
+        driver.close()
+        main.session.close()
+
+    def test_parallel_run(self):
+        main, interface = self.main(['--parallel-run', '3', '--pin-cpus',
+                                     '--test-limit', '12'])
+        main.main()
+        self.assertGreater(interface.max_running, 1)
+        self.assertLessEqual(interface.max_running, 3)
+        self.assertEqual(main.measurement_driver.results_query().count(),
+                         interface.started)
+        if hasattr(os, 'sched_getaffinity'):
+            all_cpus = os.sched_getaffinity(0)
+            for cpus in interface.affinities:
+                self.assertTrue(cpus <= all_cpus)
+                self.assertLessEqual(len(cpus), max(1, len(all_cpus) // 3))
+
+    def test_claims_are_exclusive_between_workers(self):
+        database = 'sqlite:///' + os.path.join(self.directory, 'claims.db')
+        main, interface = self.main(['--remote-measurement'], database)
+        main.init()
+        for x in (1, 2):
+            main.session.add(DesiredResult(
+                configuration=main.search_driver.get_configuration({'x': x}),
+                tuning_run=main.tuning_run, state='REQUESTED'))
+        main.commit(force=True)
+        workers = [TuningRunWorker(interface, main.args, main.tuning_run.uuid)
+                   for _ in range(2)]
+        drivers = []
+        for worker in workers:
+            worker.init()
+            drivers.append(worker.measurement_driver)
+        # each worker loads the requests while both are still REQUESTED
+        a, b = [d.query_pending_desired_results().all() for d in drivers]
+        self.assertTrue(drivers[0].claim_desired_result(a[0]))
+        self.assertFalse(drivers[1].claim_desired_result(b[0]))
+        self.assertTrue(drivers[1].claim_desired_result(b[1]))
+        self.assertFalse(drivers[0].claim_desired_result(a[1]))
+        for worker in workers:
+            worker.session.close()
+        main.session.close()
+
+
+class CpuSlotsTests(unittest.TestCase):
+
+    def slots(self, count, cpus=8):
+        with mock.patch('os.sched_getaffinity', return_value=set(range(cpus)),
+                        create=True):
+            return CpuSlots(count)
+
+    def test_disjoint_slots(self):
+        slots = self.slots(3)
+        with mock.patch('os.sched_setaffinity', create=True) as setaffinity:
+            with slots.pinned() as a, slots.pinned() as b, slots.pinned() as c:
+                self.assertEqual([a, b, c], [{0, 1}, {2, 3}, {4, 5}])
+                setaffinity.assert_called_with(0, {4, 5})
+            # released slots restore the original affinity
+            setaffinity.assert_called_with(0, list(range(8)))
+        self.assertEqual(slots.free.qsize(), 3)
+
+    def test_more_slots_than_cpus(self):
+        slots = self.slots(5, cpus=2)
+        with mock.patch('os.sched_setaffinity', create=True):
+            held = [slots.pinned() for _ in range(5)]
+            self.assertEqual([h.__enter__() for h in held],
+                             [{0}, {1}, {0}, {1}, {0}])
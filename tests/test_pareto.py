@@ -0,0 +1,158 @@
+import itertools
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import opentuner
+from opentuner import Result
+from opentuner.api import TuningRunManager
+from opentuner.measurement.interface import DefaultMeasurementInterface
+from opentuner.search import manipulator
+from opentuner.search.objective import ParetoObjective
+from opentuner.search.pareto import ParetoFront, dominates, hypervolume
+
+
+def brute_force_front(points):
+    return {tuple(p) for p in points
+            if not any(dominates(q, p) for q in points)}
+
+
+def grid_hypervolume(points, reference, steps=40):
+    """hypervolume by counting grid cells, points on the grid"""
+    count = 0
+    axes = [numpy.arange(steps) for _ in reference]
+    for cell in itertools.product(*axes):
+        if any(all(p[j] <= cell[j] for j in range(len(cell))) for p in points):
+            count += 1
+    return count
+
+
+class ParetoFrontTests(unittest.TestCase):
+
+    def front_of(self, points, reference=None):
+        front = ParetoFront(lambda result: result, reference)
+        changes = sum(front.add(tuple(p)) for p in points)
+        return front, changes
+
+    def test_keeps_non_dominated(self):
+        random.seed(0)
+        points = [(random.randint(0, 20), random.randint(0, 20),
+                   random.randint(0, 20)) for _ in range(200)]
+        front, changes = self.front_of(points)
+        self.assertEqual(set(front), brute_force_front(points))
+        self.assertEqual(changes, front.added)
+        self.assertEqual(front.added + front.rejected, len(points))
+
+    def test_rejects_equal_and_infinite(self):
+        front, changes = self.front_of([(1, 2), (1, 2), (1, float('inf')),
+                                        (None, 0)])
+        self.assertEqual(changes, 1)
+        self.assertTrue(front.dominated((1, 2)))
+        self.assertFalse(front.dominated((0, 3)))
+
+    def test_hypervolume(self):
+        random.seed(1)
+        for d in (2, 3):
+            points = [tuple(random.randint(0, 39) for _ in range(d))
+                      for _ in range(15)]
+            self.assertEqual(hypervolume(points, [40] * d),
+                             grid_hypervolume(points, [40] * d))
+
+    def test_hypervolume_grows(self):
+        front, _ = self.front_of([(4.0, 4.0)])
+        self.assertEqual(front.hypervolume(), 16.0)  # reference (8, 8)
+        front.add((2.0, 6.0))
+        self.assertEqual(front.hypervolume(), 20.0)
+        front.add((1.0, 1.0))
+        self.assertEqual(len(front), 1)
+        self.assertEqual(front.hypervolume(), 49.0)
+
+    def test_select_prefers_extremes(self):
+        front, _ = self.front_of([(0, 10), (4, 5), (5, 4), (10, 0)])
+        self.assertEqual(list(front.crowding()),
+                         [float('inf'), 1.1, 1.1, float('inf')])
+        self.assertIn(front.select(), list(front))
+
+
+class ParetoObjectiveTests(unittest.TestCase):
+
+    def test_order_is_consistent_with_dominance(self):
+        objective = ParetoObjective(('time', 'energy'))
+        random.seed(2)
+        results = [Result(time=random.choice([0.5, 1.0, 2.0, 4.0]),
+                          energy=random.choice([None, 1.0, 3.0]))
+                   for _ in range(30)]
+        for a, b in itertools.permutations(results, 2):
+            if dominates(objective.values(a), objective.values(b)):
+                self.assertLess(objective.compare(a, b), 0)
+        self.assertAlmostEqual(objective.result_relative(
+            Result(time=1.0, energy=4.0), Result(time=2.0, energy=8.0)), 0.5)
+        self.assertIsNone(objective.limit_basis(Result(time=1.0)))
+
+    def test_order_with_zero_and_negative_values(self):
+        objective = ParetoObjective(('energy', 'size'))
+        results = [Result(energy=energy, size=size)
+                   for energy in (-2.0, -1.0, 0.0, 1e-15, 0.5, 3.0)
+                   for size in (-1.0, 0.0, 2.0)]
+        for a, b in itertools.permutations(results, 2):
+            if dominates(objective.values(a), objective.values(b)):
+                self.assertLess(objective.compare(a, b), 0)
+        self.assertIsNone(objective.result_relative(
+            Result(energy=0.0, size=1.0), Result(energy=1.0, size=1.0)))
+        self.assertEqual(objective.result_order_by_terms(), [])
+
+    def test_extra_attributes(self):
+        objective = ParetoObjective(('time', 'memory'))
+        result = Result(time=1.0).update_attributes({'memory': 3.0})
+        self.assertEqual(objective.values(result), (1.0, 3.0))
+        self.assertEqual(objective.values(Result(time=1.0)),
+                         (1.0, float('inf')))
+
+
+class ParetoSearchTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # TuningRunMain logs to opentuner.log in the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.directory)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def test_search_maintains_front(self):
+        args = opentuner.default_argparser().parse_args(
+            ['--database', 'sqlite://', '--quiet',
+             '--technique', 'NormalGreedyMutation20'])
+        fronts = []
+
+        class Recorder(opentuner.search.plugin.SearchPlugin):
+            def on_pareto_front_change(self, front):
+                fronts.append(front.hypervolume())
+
+        interface = DefaultMeasurementInterface(
+            args=args,
+            manipulator=manipulator.ConfigurationManipulator(
+                [manipulator.IntegerParameter('x', 1, 100)]),
+            objective=ParetoObjective(('time', 'energy')),
+            project_name='test', program_name='pareto', program_version='1')
+        api = TuningRunManager(interface, args)
+        api.search_driver.add_plugin(Recorder())
+        for _ in range(40):
+            dr = api.get_next_desired_result()
+            if dr is None:
+                continue  # only duplicates requested
+            x = dr.configuration.data['x']
+            api.report_result(dr, Result(time=x, energy=100.0 / x))
+        api.search_driver.process_new_results()
+        front = api.search_driver.pareto_front
+        api.finish()
+
+        self.assertGreater(len(front), 1)
+        self.assertEqual(fronts, sorted(fronts))
+        self.assertEqual(fronts[-1], front.hypervolume())
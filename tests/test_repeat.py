@@ -0,0 +1,53 @@
+import unittest
+
+from opentuner.measurement.repeat import RepeatedMeasurement, t_quantile
+from opentuner.resultsdb.models import Result
+from opentuner.search.objective import MinimizeTime
+
+
+class RepeatedMeasurementTests(unittest.TestCase):
+
+    def setUp(self):
+        self.objective = MinimizeTime()
+        self.repeats = RepeatedMeasurement(self.objective, min_repeats=2,
+                                           max_repeats=10,
+                                           target_precision=0.05)
+
+    def sampler(self, times):
+        times = iter(times)
+        return lambda: Result(time=next(times))
+
+    def test_t_quantile(self):
+        for df, expected in ((1, 12.706), (2, 4.303), (5, 2.571), (30, 2.042)):
+            self.assertAlmostEqual(t_quantile(0.975, df), expected, places=2)
+
+    def test_stops_when_precise(self):
+        result = self.repeats.measure(self.sampler([1.0, 1.01, 1.0, 5.0]))
+        self.assertEqual(result.get_attribute('samples'), [1.0, 1.01, 1.0])
+        self.assertAlmostEqual(result.time, 3.01 / 3)
+        self.assertLess(result.confidence, 0.05 * result.time)
+
+    def test_max_repeats(self):
+        times = [1.0, 2.0] * 10
+        result = self.repeats.measure(self.sampler(times))
+        self.assertEqual(len(result.get_attribute('samples')), 10)
+        self.assertAlmostEqual(result.time, 1.5)
+
+    def test_races_clearly_worse(self):
+        best = Result(time=1.0, confidence=0.1)
+        result = self.repeats.measure(self.sampler([3.0, 3.5, 3.2, 3.3]), best)
+        self.assertEqual(len(result.get_attribute('samples')), 3)
+        self.assertTrue(result.get_attribute('raced'))
+        self.assertTrue(self.objective.clearly_worse(result, best))
+
+    def test_failures_are_not_repeated(self):
+        result = self.repeats.measure(self.sampler([float('inf'), 1.0]))
+        self.assertEqual(result.time, float('inf'))
+        self.assertEqual(self.repeats.samples_taken, 1)
+
+    def test_compare_bound(self):
+        a = Result(time=1.0, confidence=0.5)
+        b = Result(time=1.2, confidence=0.01)
+        self.assertTrue(self.objective.lt(a, b))
+        self.objective.time_bound = 'upper'
+        self.assertTrue(self.objective.lt(b, a))
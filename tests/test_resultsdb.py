@@ -0,0 +1,125 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import zlib
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+
+from opentuner import resultsdb
+from opentuner.resultsdb.connect import DB_VERSION, migration_statements
+from opentuner.resultsdb.models import (
+    Configuration, ConfigurationSchema, Program, _Meta)
+from opentuner.resultsdb.packing import ConfigurationCodec
+from opentuner.search import manipulator
+
+
+class ConnectionProfileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def pragmas(self, profile):
+        path = os.path.join(self.tmpdir, profile + '.db')
+        engine, Session = resultsdb.connect('sqlite:///' + path, profile)
+        with engine.connect() as connection:
+            rv = [connection.execute(text('PRAGMA %s' % name)).scalar()
+                  for name in ('journal_mode', 'synchronous', 'busy_timeout')]
+        engine.dispose()
+        return rv
+
+    def test_default(self):
+        self.assertEqual(self.pragmas('default'), ['delete', 2, 30000])
+
+    def test_wal(self):
+        self.assertEqual(self.pragmas('wal'), ['wal', 1, 30000])
+
+
+class PackedConfigurationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'packed.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def manipulator(self):
+        m = manipulator.ConfigurationManipulator()
+        m.add_parameter(manipulator.IntegerParameter('i', 0, 100))
+        m.add_parameter(manipulator.FloatParameter('f', 0.0, 1.0))
+        m.add_parameter(manipulator.EnumParameter('e', ['a', 'b', 'c']))
+        m.add_parameter(manipulator.BooleanParameter('b'))
+        m.add_parameter(manipulator.PermutationParameter('p', list(range(20))))
+        m.add_parameter(manipulator.ScheduleParameter(
+            's', ['x', 'y', 'z'], {'z': ['x']}))
+        return m
+
+    def test_codec_round_trip(self):
+        m = self.manipulator()
+        codec = ConfigurationCodec(*m.packing_schema())
+        for config in [m.seed_config()] + [m.random() for _ in range(20)]:
+            packed = codec.encode(config)
+            self.assertEqual(codec.decode(packed), config)
+        # values outside the schema are pickled
+        config = dict(m.seed_config(), e='unknown', extra=[1, 2])
+        self.assertEqual(codec.decode(codec.encode(config)), config)
+        self.assertIsNone(codec.encode({'i': 1}))
+
+    def test_database_round_trip(self):
+        m = self.manipulator()
+        configs = [m.random() for _ in range(5)]
+        engine, Session = resultsdb.connect('sqlite:///' + self.path)
+        session = Session()
+        program = Program.get(session, 'test', 'packed')
+        schema = ConfigurationSchema.get(session, program, m.packing_schema())
+        for i, config in enumerate(configs):
+            Configuration.get(session, program, str(i), config, schema)
+        Configuration.get(session, program, 'legacy', {'x': 1})
+        session.commit()
+        Session.remove()
+        engine.dispose()
+
+        engine, Session = resultsdb.connect('sqlite:///' + self.path)
+        session = Session()
+        rows = dict((c.hash, c) for c in session.query(Configuration))
+        for i, config in enumerate(configs):
+            self.assertIsNotNone(rows[str(i)].packed)
+            self.assertEqual(rows[str(i)].data, config)
+        self.assertEqual(rows['legacy'].data, {'x': 1})
+        Session.remove()
+        engine.dispose()
+
+    def test_upgrade_from_0_1(self):
+        engine = create_engine('sqlite:///' + self.path)
+        with engine.begin() as connection:
+            connection.execute(text('CREATE TABLE _meta (id INTEGER PRIMARY KEY, '
+                                    'db_version VARCHAR(128))'))
+            connection.execute(text("INSERT INTO _meta VALUES (1, '0.1')"))
+            connection.execute(text('CREATE TABLE program (id INTEGER PRIMARY KEY, '
+                                    'project VARCHAR(128), name VARCHAR(128))'))
+            connection.execute(text('CREATE TABLE configuration ('
+                                    'id INTEGER PRIMARY KEY, program_id INTEGER, '
+                                    'hash VARCHAR(64), data BLOB)'))
+            connection.execute(text("INSERT INTO program VALUES (1, 'p', 'n')"))
+            connection.execute(text('INSERT INTO configuration VALUES '
+                                    "(1, 1, 'h', :data)"),
+                               {'data': zlib.compress(pickle.dumps({'x': 1}), 9)})
+        engine.dispose()
+
+        engine, Session = resultsdb.connect('sqlite:///' + self.path)
+        session = Session()
+        self.assertEqual(_Meta.get_version(session), DB_VERSION)
+        self.assertEqual(session.query(Configuration).one().data, {'x': 1})
+        Session.remove()
+        engine.dispose()
+
+    def test_migrations_use_dialect_types(self):
+        self.assertEqual(migration_statements('0.1', postgresql.dialect()), [
+            'ALTER TABLE configuration ADD COLUMN packed BYTEA',
+            'ALTER TABLE configuration ADD COLUMN schema_id INTEGER'])
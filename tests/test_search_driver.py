@@ -0,0 +1,193 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import opentuner
+from opentuner import resultsdb
+from opentuner.api import TuningRunManager
+from opentuner.measurement.interface import DefaultMeasurementInterface
+from opentuner.resultsdb.models import Configuration, DesiredResult, Program
+from opentuner.resultsdb.models import Result
+from opentuner.search import manipulator
+from opentuner.search.driver import ConfigurationCache
+from opentuner.search.objective import MinimizeTime
+from opentuner.search.prescreen import PreScreen
+
+from .helpers import FakeDriver
+
+
+class ConfigurationCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        engine, Session = resultsdb.connect('sqlite://')
+        self.session = Session()
+        self.program = Program.get(self.session, 'test', 'cache')
+        self.cache = ConfigurationCache(self.session, self.program, max_size=2)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_hit_returns_same_configuration(self):
+        c1 = self.cache.get('a', {'x': 1})
+        c2 = self.cache.get('a', {'x': 1})
+        self.assertIs(c1, c2)
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_evicts_least_recently_used(self):
+        ca = self.cache.get('a', {'x': 1})
+        self.cache.get('b', {'x': 2})
+        self.cache.get('a', {'x': 1})
+        self.cache.get('c', {'x': 3})
+        self.assertEqual(sorted(self.cache.cache), ['a', 'c'])
+        # evicted entries are still found in the database
+        self.cache.get('b', {'x': 2})
+        self.assertEqual(self.cache.misses, 4)
+        self.assertIs(self.cache.get('a', {'x': 1}), ca)
+
+    def test_get_many(self):
+        ca = self.cache.get('a', {'x': 1})
+        configs = self.cache.get_many([('a', {'x': 1}), ('d', {'x': 4}),
+                                       ('d', {'x': 4})])
+        self.assertIs(configs[0], ca)
+        self.assertIs(configs[1], configs[2])
+        self.assertEqual(configs[1].data, {'x': 4})
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 2, 'size': 2})
+        # found in the database after eviction
+        self.cache.cache.clear()
+        self.assertEqual(self.cache.get_many([('d', None)]), [configs[1]])
+
+
+class PreScreenTests(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        self.args = opentuner.default_argparser().parse_args(
+            ['--prescreen', '--prescreen-exploration', '0'])
+        self.driver = FakeDriver(
+            manipulator.ConfigurationManipulator([
+                manipulator.FloatParameter('x', 0.0, 1.0)]),
+            MinimizeTime())
+        self.prescreen = PreScreen(self.args)
+        self.prescreen.set_driver(self.driver)
+
+    def result(self, x, state='OK'):
+        cfg = {'x': x}
+        return Result(configuration=Configuration(hash=repr(cfg), data=cfg),
+                      time=1.0 + 10 * x, state=state)
+
+    def desired_result(self, x):
+        cfg = {'x': x}
+        return DesiredResult(
+            configuration=Configuration(hash=repr(cfg), data=cfg))
+
+    def test_waits_for_results(self):
+        dr = self.desired_result(0.9)
+        self.prescreen.screen([dr])
+        self.assertIsNone(dr.priority)
+
+    def test_limits_predicted_bad(self):
+        for i in range(self.args.prescreen_min_results):
+            self.prescreen.on_result(
+                self.result(i / float(self.args.prescreen_min_results - 1)))
+        self.driver.best_result = self.prescreen.observed[0][1]
+        good, bad = self.desired_result(0.05), self.desired_result(0.95)
+        self.prescreen.screen([good, bad])
+        self.assertGreater(good.priority, bad.priority)
+        self.assertIsNone(good.limit)
+        self.assertEqual(bad.limit, 1.0)
+        self.assertEqual(self.prescreen.predicted_bad, 1)
+        self.prescreen.on_result(self.result(0.95, state='TIMEOUT'))
+        self.assertEqual(self.prescreen.cut_short, 1)
+
+
+class WarmStartTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database = 'sqlite:///' + os.path.join(self.directory, 'test.db')
+        # TuningRunMain logs to opentuner.log in the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.directory)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def run_tuning(self, tests, *argv):
+        args = opentuner.default_argparser().parse_args(
+            ['--database', self.database, '--quiet',
+             '--technique', 'BayesianOptimization'] + list(argv))
+        interface = DefaultMeasurementInterface(
+            args=args,
+            manipulator=manipulator.ConfigurationManipulator(
+                [manipulator.IntegerParameter('x', -200, 200)]),
+            project_name='test', program_name='warm', program_version='1')
+        api = TuningRunManager(interface, args)
+        requested = []
+        for _ in range(tests):
+            dr = api.get_next_desired_result()
+            requested.append(dr.configuration.data['x'])
+            # no ties, so there is a single best configuration
+            x = requested[-1]
+            api.report_result(dr, Result(time=abs(x - 10) + 0.001 * x))
+        api.search_driver.process_new_results()
+        best = api.get_best_configuration()['x']
+        technique = api.search_driver.root_technique
+        api.finish()
+        return requested, best, technique
+
+    def test_seeds_best_of_earlier_runs(self):
+        _, best, _ = self.run_tuning(20)
+        requested, _, technique = self.run_tuning(
+            1, '--warm-start', '3', '--warm-start-history', '15')
+        self.assertEqual(requested, [best])
+        self.assertEqual(len(technique.observed), 15)
+
+
+class ConstraintPruningTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # TuningRunMain logs to opentuner.log in the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.directory)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def test_infeasible_configurations_are_never_requested(self):
+        args = opentuner.default_argparser().parse_args(
+            ['--database', 'sqlite://', '--quiet',
+             '--technique', 'UniformGreedyMutation10'])
+        m = manipulator.ConfigurationManipulator(
+            [manipulator.IntegerParameter('tile', 1, 64),
+             manipulator.IntegerParameter('a', 0, 9),
+             manipulator.IntegerParameter('b', 0, 9)],
+            constraints=[manipulator.DivisibilityConstraint('tile', 48),
+                         # hard to repair, so some are resampled
+                         manipulator.FunctionConstraint(
+                             ['a', 'b'], lambda a, b: a == b)])
+        interface = DefaultMeasurementInterface(
+            args=args, manipulator=m, project_name='test',
+            program_name='constraints', program_version='1')
+        api = TuningRunManager(interface, args)
+        for _ in range(30):
+            dr = api.get_next_desired_result()
+            if dr is None:
+                continue  # only duplicates requested
+            api.report_result(dr, Result(time=float(dr.configuration.data['tile'])))
+        driver = api.search_driver
+        requested = driver.session.query(DesiredResult).filter_by(
+            tuning_run=driver.tuning_run).all()
+        self.assertTrue(requested)
+        self.assertTrue(all(m.feasible([dr.configuration.data
+                                        for dr in requested])))
+        self.assertGreater(driver.infeasible_count, 0)
+        self.assertEqual(driver.unrepaired_count, 0)
+        with self.assertLogs('opentuner.search.driver', 'INFO') as logs:
+            api.finish()
+        self.assertIn('pruned %d infeasible' % driver.infeasible_count,
+                      '\n'.join(logs.output))
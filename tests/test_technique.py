@@ -1,9 +1,23 @@
+import random
 import unittest
 from builtins import next
 from unittest import mock
 
+import numpy
+
+from opentuner.resultsdb.models import Configuration, Result
 from opentuner.search import manipulator
+from opentuner.search.bandittechniques import AUCBanditMetaTechnique
+from opentuner.search.bandittechniques import AUCBanditQueue
+from opentuner.search.bayesopt import BayesianOptimization
 from opentuner.search.composableevolutionarytechniques import ComposableEvolutionaryTechnique
+from opentuner.search.differentialevolution import DifferentialEvolution
+from opentuner.search.metatechniques import RoundRobinMetaSearchTechnique
+from opentuner.search.objective import MinimizeTime
+from opentuner.search.surrogate import GaussianProcess
+from opentuner.search.technique import SearchTechnique
+
+from .helpers import FakeDriver
 
 
 def faked_random(nums):
@@ -81,3 +95,147 @@ class ComposableSearchTechniqueTests(unittest.TestCase):
         op3_cross_func.assert_called_once_with('p1', 'p2', 'p3', xchoice='op3_cross_CX')
 
 # TODO tests for RandomThreeParentsComposableTechnique
+
+
+class Counting(SearchTechnique):
+    def __init__(self, batch=None, *pargs, **kwargs):
+        super(Counting, self).__init__(*pargs, **kwargs)
+        self.batch = batch
+        self.count = 0
+
+    def desired_configuration(self):
+        self.count += 1
+        return {'n': self.count}
+
+    def desired_configurations(self, count):
+        if self.batch is None:
+            return None
+        return self.next_configurations(min(count, self.batch))
+
+
+class Batched(Counting):
+    batch_requests = True
+
+
+class DesiredResultsTests(unittest.TestCase):
+
+    def technique(self, technique):
+        technique.set_driver(FakeDriver())
+        return technique
+
+    def test_default_adapter(self):
+        t = self.technique(Counting())
+        drs = t.desired_results(3)
+        self.assertEqual([dr.configuration.data['n'] for dr in drs], [1, 2, 3])
+        self.assertEqual(t.request_count, 3)
+
+    def test_meta_round_robin(self):
+        a = Counting(name='a')
+        b = Batched(batch=10, name='b')
+        meta = self.technique(RoundRobinMetaSearchTechnique([a, b]))
+        drs = meta.desired_results(8)
+        # b is asked for the rest of the batch, a for one at a time
+        self.assertEqual([dr.requestor for dr in drs], ['a'] + ['b'] * 7)
+        drs = meta.desired_results(4)
+        self.assertEqual([dr.requestor for dr in drs], ['a', 'b', 'b', 'b'])
+        self.assertEqual(meta.request_count, 12)
+
+
+class BayesianOptimizationTests(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        numpy.random.seed(0)
+        driver = FakeDriver(
+            manipulator.ConfigurationManipulator([
+                manipulator.FloatParameter('x', 0.0, 1.0),
+                manipulator.FloatParameter('y', 0.0, 1.0)]),
+            MinimizeTime())
+        self.technique = BayesianOptimization()
+        self.technique.set_driver(driver)
+
+    @staticmethod
+    def cost(cfg):
+        return (cfg['x'] - 0.3) ** 2 + (cfg['y'] - 0.7) ** 2
+
+    def test_gaussian_process(self):
+        x = numpy.linspace(0.0, 1.0, 8)[:, None]
+        gp = GaussianProcess().fit(x, numpy.sin(4 * x[:, 0]))
+        mu, sigma = gp.predict(numpy.array([[0.5], [3.0]]))
+        self.assertAlmostEqual(mu[0], numpy.sin(2.0), places=1)
+        self.assertLess(sigma[0], sigma[1])
+
+    def test_improves_on_initial_samples(self):
+        t = self.technique
+        costs = []
+        for _ in range(t.initial_samples):
+            cfg = t.desired_configuration()
+            costs.append(self.cost(cfg))
+            t.handle_requested_result(Result(
+                configuration=Configuration(hash=repr(cfg), data=cfg),
+                time=costs[-1]))
+        proposed = [t.desired_configuration() for _ in range(5)]
+        self.assertEqual(len(t.pending), 5)
+        self.assertLess(min(map(self.cost, proposed)), numpy.median(costs))
+
+
+class RandomSeedTests(unittest.TestCase):
+
+    def technique(self, technique):
+        technique.set_driver(FakeDriver(manipulator.ConfigurationManipulator(
+            [manipulator.FloatParameter(i, 0.0, 1.0) for i in range(8)])))
+        return technique
+
+    def draws(self, draw):
+        """configurations drawn twice after random.seed(), numpy reseeded"""
+        runs = []
+        for numpy_seed in (1, 2):
+            random.seed(4)
+            numpy.random.seed(numpy_seed)
+            runs.append(draw())
+        return runs
+
+    def test_differential_evolution(self):
+        t = self.technique(DifferentialEvolution(cr=0.5))
+
+        def draw():
+            m = t.manipulator
+            cfg, x1, x2, x3 = [m.random() for _ in range(4)]
+            t.vector_crossover(m.vector_space(), cfg, x1, x2, x3, 0.5)
+            return cfg
+        first, second = self.draws(draw)
+        self.assertEqual(first, second)
+
+    def test_bayesian_optimization(self):
+        t = self.technique(BayesianOptimization())
+
+        def draw():
+            cfg = t.manipulator.random()
+            t.mutate(cfg, sigma=0.1)
+            return cfg
+        first, second = self.draws(draw)
+        self.assertEqual(first, second)
+
+
+class AUCBanditTests(unittest.TestCase):
+
+    def test_incremental_order(self):
+        random.seed(0)
+        keys = ['k%d' % i for i in range(20)]
+        bandit = AUCBanditQueue(keys, window=50, debug=True)
+        for i in range(300):
+            order = list(bandit.ordered_keys())
+            self.assertEqual(sorted(order), sorted(keys))
+            scores = [bandit.bandit_score(k) for k in order]
+            self.assertEqual(scores, sorted(scores, reverse=True))
+            key = order[0] if random.random() < 0.7 else random.choice(keys)
+            bandit.on_result(key, random.random() < int(key[1:]) / 40.0)
+
+    def test_cost_aware_credit(self):
+        bandit = AUCBanditMetaTechnique([Counting(name='a')], cost_aware=True)
+        cheap = Result(collection_cost=1.0, was_new_best=True)
+        slow = Result(collection_cost=10.0, was_new_best=True)
+        self.assertEqual(bandit.credit(cheap), 1.0)
+        self.assertLess(bandit.credit(slow), 0.2)
+        self.assertEqual(bandit.credit(Result(collection_cost=1.0,
+                                              was_new_best=False)), 0)
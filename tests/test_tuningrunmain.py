@@ -0,0 +1,52 @@
+import argparse
+import time
+import unittest
+
+from opentuner.tuningrunmain import TuningRunMain
+
+
+class CountingSession(object):
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+
+class CommitPolicyTests(unittest.TestCase):
+
+    def main(self, **kwargs):
+        main = TuningRunMain.__new__(TuningRunMain)
+        main.args = argparse.Namespace(**dict(dict(commit_every=None,
+                                                   commit_interval=30.0),
+                                              **kwargs))
+        main.session = CountingSession()
+        main.fake_commit = True
+        main.last_commit_time = time.time()
+        main.uncommitted_results = 0
+        return main
+
+    def test_commit_every(self):
+        main = self.main(commit_every=3)
+        for _ in range(7):
+            main.commit(results=1)
+        main.commit()
+        self.assertEqual(main.session.commits, 2)
+        self.assertEqual(main.uncommitted_results, 1)
+
+    def test_commit_interval(self):
+        main = self.main(commit_interval=10.0)
+        main.commit(results=1)
+        self.assertEqual(main.session.commits, 0)
+        main.last_commit_time -= 11
+        main.commit(results=1)
+        self.assertEqual(main.session.commits, 1)
+
+    def test_only_on_shutdown(self):
+        main = self.main(commit_interval=0)
+        main.last_commit_time -= 3600
+        for _ in range(100):
+            main.commit(results=1)
+        self.assertEqual(main.session.commits, 0)
+        main.commit(force=True)
+        self.assertEqual(main.session.commits, 1)
@@ -0,0 +1,102 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import opentuner
+from opentuner import ConfigurationManipulator, FloatParameter, Result
+from opentuner.measurement import MeasurementInterface
+from opentuner.resultsdb.models import DesiredResult
+from opentuner.tuningrunmain import TuningRunMain
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class SquareInterface(MeasurementInterface):
+
+    def __init__(self, *pargs, **kwargs):
+        kwargs.setdefault('program_name', 'worker-test')
+        super(SquareInterface, self).__init__(*pargs, **kwargs)
+
+    def manipulator(self):
+        m = ConfigurationManipulator()
+        m.add_parameter(FloatParameter('x', -10, 10))
+        return m
+
+    def run(self, desired_result, input, limit):
+        return Result(time=desired_result.configuration.data['x'] ** 2)
+
+
+class WorkerTests(unittest.TestCase):
+
+    def setUp(self):
+        # TuningRunMain and the workers write opentuner.log to the cwd
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        self.database = os.path.join(self.tmpdir, 'worker.db')
+        os.chdir(self.tmpdir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def start_worker(self, uuid):
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        return subprocess.Popen(
+            [sys.executable, '-m', 'opentuner.measurement.worker',
+             '--database', self.database, '--tuning-run', uuid,
+             '--interface', '%s:SquareInterface' % os.path.abspath(__file__),
+             '--poll-interval', '0.1', '--idle-timeout', '1'],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def test_requeues_claims_of_dead_workers(self):
+        args = opentuner.default_argparser().parse_args(
+            ['--database', self.database, '--remote-measurement',
+             '--poll-interval', '0.05', '--remote-lease', '60'])
+        main = TuningRunMain(SquareInterface(args=args), args)
+        main.init()
+        for i, state in enumerate(['REQUESTED', 'RUNNING']):
+            config = main.search_driver.get_configuration({'x': float(i)})
+            main.session.add(DesiredResult(
+                configuration=config, tuning_run=main.tuning_run, state=state,
+                start_date=datetime.now() - timedelta(hours=1)))
+        main.commit(force=True)
+
+        worker = self.start_worker(main.tuning_run.uuid)
+        with self.assertLogs('opentuner.measurement.driver', 'WARNING') as logs:
+            main.measurement_driver.process_remote()
+        self.assertEqual(worker.wait(timeout=120), 0)
+        self.assertIn('requeued 1 tests', '\n'.join(logs.output))
+        main.session.expire_all()
+        states = [dr.state for dr in main.measurement_driver.requests_query()]
+        self.assertEqual(states, ['COMPLETE', 'COMPLETE'])
+        main.session.close()
+
+    def test_workers_share_requests(self):
+        args = opentuner.default_argparser().parse_args(
+            ['--database', self.database, '--remote-measurement'])
+        interface = SquareInterface(args=args)
+        main = TuningRunMain(interface, args)
+        main.init()
+        for i in range(12):
+            config = main.search_driver.get_configuration({'x': float(i)})
+            main.session.add(DesiredResult(configuration=config,
+                                           tuning_run=main.tuning_run,
+                                           state='REQUESTED'))
+        main.commit(force=True)
+
+        workers = [self.start_worker(main.tuning_run.uuid) for _ in range(3)]
+        for worker in workers:
+            self.assertEqual(worker.wait(timeout=120), 0)
+
+        main.session.expire_all()
+        requests = main.measurement_driver.requests_query().all()
+        self.assertEqual(len(requests), 12)
+        for dr in requests:
+            self.assertEqual(dr.state, 'COMPLETE')
+            self.assertEqual(dr.result.time, dr.configuration.data['x'] ** 2)
+        self.assertEqual(main.measurement_driver.results_query().count(), 12)
+        main.session.close()